@@ -0,0 +1,206 @@
+"""Admin API endpoints.
+
+Operational endpoints that must not be public. Every request needs an
+X-Admin-Token header matching settings.admin_token; with no token
+configured the admin API is disabled.
+"""
+
+import asyncio
+import hmac
+import os
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse
+from app.core import profiling
+from app.core.config import settings
+from app.core.profiling import ProfilerBusyError
+from app.models.manager import predictor_manager
+from app.models.registry import model_registry
+from app.models.shadow import shadow_scorer
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Reject requests without the configured admin token.
+
+    Raises:
+        HTTPException: 403 if the admin API is disabled or the token is wrong
+    """
+    if not settings.admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API disabled (set ADMIN_TOKEN to enable)"
+        )
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token"
+        )
+
+
+# Create API router (all routes require the admin token)
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post(
+    "/admin/reload",
+    summary="Reload model artifacts",
+    description="Load the model and scaler from disk again and swap them in without dropping "
+                "in-flight requests. The current model keeps serving if loading fails."
+)
+async def reload_model():
+    """Hot-reload the model and scaler."""
+    result = await predictor_manager.reload("api")
+    if result["last_error"] is not None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Reload failed, still serving {result['model_version']}: {result['last_error']}"
+        )
+    return result
+
+
+@router.get(
+    "/admin/model",
+    summary="Serving model",
+    description="Version, engine and reload counters of the model currently serving requests"
+)
+async def model_info():
+    """Return the serving model version and reload status."""
+    return predictor_manager.stats()
+
+
+def _profile_duration(seconds: float) -> float:
+    """Validate a requested profile duration against settings.profile_max_seconds."""
+    if not 0 <= seconds <= settings.profile_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"seconds must be between 0 and {settings.profile_max_seconds:g}"
+        )
+    return seconds
+
+
+def _profiler_busy(e: ProfilerBusyError) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.post(
+    "/admin/profile/cpu",
+    summary="Sample a CPU profile",
+    description="Sample the Python stacks of this worker's threads for a bounded time, while it "
+                "keeps serving. Returns collapsed stacks (flamegraph.pl, speedscope) or a pstats "
+                "file (python -m pstats, snakeviz) with times estimated from sample counts. "
+                "Only one profile runs at a time per worker.",
+    responses={409: {"description": "Another profile is running"}}
+)
+async def profile_cpu(
+    seconds: float = Query(default=5.0, gt=0, description="Sampling duration"),
+    interval_ms: float = Query(default=5.0, ge=0.5, le=1000.0, description="Time between samples"),
+    format: Literal["collapsed", "pstats"] = Query(default="collapsed"),
+    include_idle: bool = Query(default=False, description="Keep threads waiting for work")
+):
+    """Sample a CPU profile of this worker."""
+    _profile_duration(seconds)
+    loop = asyncio.get_running_loop()
+    try:
+        profile = await loop.run_in_executor(
+            None, profiling.sample_stacks, seconds, interval_ms / 1000.0, include_idle
+        )
+    except ProfilerBusyError as e:
+        raise _profiler_busy(e)
+    headers = {"X-Profile-Samples": str(profile["samples"]), "X-Worker-PID": str(os.getpid())}
+    if format == "pstats":
+        return Response(
+            profiling.pstats_dump(profile), media_type="application/octet-stream",
+            headers={**headers, "Content-Disposition": 'attachment; filename="profile.pstats"'}
+        )
+    return PlainTextResponse(profiling.collapsed_stacks(profile), headers=headers)
+
+
+@router.post(
+    "/admin/profile/memory",
+    summary="Allocation diff around predict",
+    description="Take tracemalloc snapshots before and after synthetic "
+                "HeartDiseasePredictor.predict calls (plus an optional window of live traffic) "
+                "and return the largest allocation growth. Tracing runs only during the "
+                "measurement and slows this worker while it does.",
+    responses={409: {"description": "Another profile is running"}}
+)
+async def profile_memory(
+    predictions: int = Query(default=100, ge=0, le=10_000, description="Synthetic predict calls"),
+    seconds: float = Query(default=0.0, ge=0, description="Extra live traffic window"),
+    top: int = Query(default=25, ge=1, le=500),
+    group_by: Literal["lineno", "filename", "traceback"] = Query(default="lineno"),
+    scope: Literal["predict", "all"] = Query(
+        default="predict", description="predict: allocations made below predictor.py only"
+    )
+):
+    """Report allocation growth over predictions in this worker."""
+    _profile_duration(seconds)
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            None, profiling.memory_diff, predictor_manager.current,
+            predictions, seconds, top, group_by, scope
+        )
+    except ProfilerBusyError as e:
+        raise _profiler_busy(e)
+    return {**result, "worker_pid": os.getpid()}
+
+
+@router.get(
+    "/admin/profile/slow-requests",
+    summary="Slow request log",
+    description="Most recent requests (this worker) at least SLOW_REQUEST_THRESHOLD_MS slow, "
+                "with per-stage timings and the feature vector"
+)
+async def slow_requests():
+    """Return the slow request log, most recent first."""
+    return {**profiling.slow_request_log.stats(), "worker_pid": os.getpid(),
+            "requests": profiling.slow_request_log.entries()}
+
+
+@router.delete(
+    "/admin/profile/slow-requests",
+    summary="Clear the slow request log",
+    status_code=status.HTTP_204_NO_CONTENT
+)
+async def clear_slow_requests():
+    """Empty the slow request log."""
+    profiling.slow_request_log.clear()
+
+
+@router.get(
+    "/admin/models",
+    summary="Model registry",
+    description="Primary and candidate models with their versions, traffic weights, shadow "
+                "flags and requests routed to each (this worker)"
+)
+async def registry_info():
+    """Return the registered models and routing counters."""
+    return {**model_registry.stats(), "worker_pid": os.getpid()}
+
+
+@router.get(
+    "/admin/shadow",
+    summary="Shadow scoring statistics",
+    description="Shadow queue counters (submitted, dropped under load or with a full queue) "
+                "and agreement of each shadow model with the served predictions: this "
+                "worker's in memory, and all workers' from the SQLite sink"
+)
+async def shadow_stats():
+    """Return shadow scoring counters and agreement statistics."""
+    sink = shadow_scorer.sink
+    loop = asyncio.get_running_loop()
+    summary = await loop.run_in_executor(None, sink.summary) if sink is not None else None
+    return {**shadow_scorer.stats(), "worker_pid": os.getpid(), "sink_summary": summary}
+
+
+@router.delete(
+    "/admin/shadow",
+    summary="Reset shadow scoring statistics",
+    description="Clear this worker's counters and every result in the shadow sink",
+    status_code=status.HTTP_204_NO_CONTENT
+)
+async def reset_shadow_stats():
+    """Clear the shadow statistics and sink."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, shadow_scorer.reset)
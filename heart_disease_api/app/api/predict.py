@@ -1,25 +1,389 @@
-"""Prediction API endpoint.
+"""Prediction API endpoints.
 
-Handles POST /predict requests for heart disease prediction.
+Handles POST /predict, POST /predict/batch and POST /predict/stream requests
+for heart disease prediction.
 """
 
-from fastapi import APIRouter, HTTPException, status
-from app.schemas.heart import HeartDiseaseInput, HeartDiseasePrediction
-from app.models.predictor import HeartDiseasePredictor
+import asyncio
+from collections import Counter
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from app.core import metrics, profiling
+from app.core.config import settings
+from app.core.admission import admission, charge_rows, client_of
+from app.core.executor import InferenceOverloadedError, inference_executor
+from app.core.http_cache import (
+    MAX_KEY_LENGTH,
+    StoredResponse,
+    etag_matches,
+    hash_request,
+    idempotency_store,
+    is_wildcard,
+    make_etag,
+)
+from app.engine import RISK_LEVELS, risk_codes
+from app.schemas.heart import (
+    HeartDiseaseBatchInput,
+    HeartDiseaseBatchItem,
+    HeartDiseaseBatchPrediction,
+    HeartDiseaseInput,
+    HeartDiseasePrediction,
+)
+from app.models.batcher import create_batcher
+from app.models.cache import cache_for, candidate_caches, prediction_cache
+from app.models.shared_cache import shared_cache
+from app.models.manager import predictor_manager
+from app.models.registry import UnknownModelError, model_registry
+from app.models.shadow import shadow_scorer
+from app.utils import columnar
+from app.utils.columnar import FormatUnavailableError
+from app.utils.preprocessing import (
+    build_feature_matrix,
+    build_feature_matrix_from_columns,
+    extract_features,
+)
+from app.utils.streaming import (
+    MEDIA_TYPES,
+    DuplexStreamingResponse,
+    LineSplitter,
+    csv_result_header,
+    format_from_content_type,
+    format_results,
+    format_stream_error,
+    parse_csv_header,
+    parse_lines,
+    validate_records,
+)
 
 # Create API router
 router = APIRouter()
 
-# Initialize predictor (model loaded at module level)
-predictor = HeartDiseasePredictor()
+# Upper bound on the bytes of a typical batch row, by body format: a body
+# is charged len(body) // this many rows before it is parsed
+_ROW_BYTES = {"json": 512, "msgpack": 256, "arrow": 256}
 
+# Micro-batcher for concurrent single predictions (used when enabled);
+# always scores with the predictor that is serving at flush time
+batcher = create_batcher(lambda: predictor_manager.current)
 
-@router.post(
+
+def _overloaded(error: InferenceOverloadedError) -> HTTPException:
+    """Build the 503 response for a rejected inference call."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Server overloaded: {str(error)}",
+        headers={"Retry-After": "1"}
+    )
+
+
+def _requested_model(request: Request) -> Optional[str]:
+    """Model named by the request's settings.model_header header, if any."""
+    return request.headers.get(settings.model_header) if settings.model_header else None
+
+
+def _route(requested: Optional[str]):
+    """Pick the model serving a request (see app.models.registry).
+    
+    Args:
+        requested: Model named by the request, if any
+        
+    Returns:
+        Tuple of (model, predictor): the candidate's registry name and
+        predictor, or None and the serving primary predictor
+        
+    Raises:
+        HTTPException: 400 if requested is not a registered model
+    """
+    try:
+        candidate = model_registry.route(requested)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if candidate is None:
+        # Pin the serving predictor: a hot reload mid-request does not affect it
+        return None, predictor_manager.current
+    return candidate.name, candidate.predictor
+
+
+def _count_predictions(route: str, predictor, risk_levels: list):
+    """Count served predictions by risk level."""
+    if settings.metrics_enabled:
+        for risk_level, count in Counter(risk_levels).items():
+            metrics.PREDICTIONS.labels(route, risk_level, predictor.version).inc(count)
+
+
+def _record(route: str, predictor, risk_levels: list):
+    """Count served predictions by risk level and mark the handler as done."""
+    if settings.metrics_enabled:
+        _count_predictions(route, predictor, risk_levels)
+        metrics.handler_finished()
+
+
+def _prediction_response(result: HeartDiseasePrediction, predictor, name: str,
+                         etag: Optional[str]) -> Response:
+    """Serialize a prediction exactly as FastAPI's JSONResponse would.
+    
+    The result was built by the predictor, so response-model validation
+    and jsonable_encoder are skipped.
+    """
+    body = b'{"prediction":%s,"probability":%s,"risk_level":"%s"}' % (
+        b"true" if result.prediction else b"false",
+        repr(result.probability).encode(),
+        result.risk_level.encode()
+    )
+    headers = {"X-Model": name, "X-Model-Version": predictor.version}
+    if etag is not None:
+        headers["ETag"] = etag
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def _predict(data: HeartDiseaseInput, if_none_match: Optional[str] = None,
+                   requested_model: Optional[str] = None) -> Response:
+    """Score one validated request (shared by both request paths).
+    
+    Args:
+        data: Validated patient health metrics
+        if_none_match: If-None-Match request header, if any
+        requested_model: Model named by the request's model header, if any
+        
+    Returns:
+        Pre-serialized HeartDiseasePrediction response, or 304 Not Modified
+        when if_none_match matches the prediction's ETag
+        
+    Raises:
+        HTTPException: If the model is unknown, if_none_match is "*" (every
+            input has a prediction), prediction fails or the server is
+            overloaded
+    """
+    if settings.etag_enabled and is_wildcard(if_none_match):
+        raise _precondition_failed()
+    model, predictor = _route(requested_model)
+    name = model or model_registry.primary_name
+    metrics.handler_started(predictor.version)
+    
+    try:
+        features = extract_features(data)
+        key = tuple(features.tolist())  # Same key as cache.make_key(data)
+        profiling.note_features(features)
+        profiling.mark("validation")
+        
+        # The client already has this prediction from this model
+        etag = make_etag(features, predictor.fingerprint) if settings.etag_enabled else None
+        if etag is not None and etag_matches(if_none_match, etag):
+            metrics.handler_finished()
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                            headers={"ETag": etag, "X-Model": name,
+                                     "X-Model-Version": predictor.version})
+        
+        # Serve repeated inputs from this worker's cache, then the shared one
+        cache = cache_for(model)
+        cached = None
+        if settings.prediction_cache_enabled:
+            cached = cache.get(key, predictor.fingerprint)
+        if cached is None and settings.shared_cache_enabled:
+            cached = shared_cache.get(features, predictor.fingerprint)
+            if cached is not None and settings.prediction_cache_enabled:
+                cache.put(key, predictor.fingerprint, cached)
+        profiling.mark("cache")
+        if cached is not None:
+            shadow_scorer.submit(name, predictor.version, features[None],
+                                 (cached.prediction,), (cached.probability,))
+            _record(f"{settings.api_prefix}/predict", predictor, [cached.risk_level])
+            return _prediction_response(cached, predictor, name, etag)
+        
+        # Make prediction on the inference executor (off the event loop),
+        # micro-batched with other in-flight requests when enabled
+        # (the micro-batcher always scores with the primary model)
+        if settings.micro_batch_enabled and model is None:
+            has_disease, probability, scored_by = await batcher.submit(features)
+            result = scored_by.build_result(has_disease, probability)
+            if scored_by is not predictor:
+                # A hot reload landed while the request waited for its batch:
+                # label, tag and cache the result as the new model's (the
+                # cache drops it until a lookup switched it to that model)
+                predictor = scored_by
+                if etag is not None:
+                    etag = make_etag(features, predictor.fingerprint)
+        else:
+            result = await inference_executor.run(predictor, "predict_features", features,
+                                                  model=model)
+        profiling.mark("inference")
+        
+        if settings.prediction_cache_enabled:
+            cache.put(key, predictor.fingerprint, result)
+        if settings.shared_cache_enabled:
+            shared_cache.put(features, predictor.fingerprint, result)
+        shadow_scorer.submit(name, predictor.version, features[None],
+                             (result.prediction,), (result.probability,))
+        _record(f"{settings.api_prefix}/predict", predictor, [result.risk_level])
+        return _prediction_response(result, predictor, name, etag)
+        
+    except InferenceOverloadedError as e:
+        raise _overloaded(e)
+    except ValueError as e:
+        # Handle preprocessing or prediction errors
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Prediction error: {str(e)}"
+        )
+    except Exception as e:
+        # Handle unexpected errors
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Unexpected error: {str(e)}"
+        )
+
+
+def _precondition_failed() -> HTTPException:
+    """Build the 412 response for "If-None-Match: *"."""
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail='If-None-Match: * fails: a prediction exists for every input'
+    )
+
+
+async def _idempotency_call(method, *args):
+    """Call an idempotency store method, in a thread if it blocks on I/O."""
+    if idempotency_store.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+def _replay(stored: StoredResponse, if_none_match: Optional[str]) -> Response:
+    """Rebuild a response stored under an Idempotency-Key."""
+    if settings.etag_enabled and is_wildcard(if_none_match):
+        raise _precondition_failed()
+    headers = {**stored.headers, "Idempotent-Replayed": "true"}
+    etag = stored.headers.get("etag")
+    if etag is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers={name: value for name, value in headers.items()
+                                 if name != "content-type"})
+    return Response(stored.body, status_code=stored.status_code, headers=headers)
+
+
+class FastPredictRoute(APIRoute):
+    """Route class for POST /predict with a fast path for valid requests.
+    
+    The raw JSON body is validated in one step by HeartDiseaseInput's
+    compiled pydantic-core validator (same bounds, no intermediate dict),
+    skipping FastAPI's JSON decoding and dependency solving. Requests that
+    fail there go through the regular FastAPI handler, so the OpenAPI
+    schema and the 422 error format do not change.
+    
+    Retries carrying an Idempotency-Key that is already stored are
+    answered from the idempotency store before any validation; a retry
+    that arrives while the first request is still running gets 409.
+    """
+    
+    def get_route_handler(self):
+        validated_handler = super().get_route_handler()
+        
+        async def handle(request: Request) -> Response:
+            if request.headers.get("content-type", "").startswith("application/json"):
+                try:
+                    data = HeartDiseaseInput.model_validate_json(await request.body())
+                except ValidationError:
+                    data = None
+                if data is not None:
+                    return await _predict(data, request.headers.get("if-none-match"),
+                                          _requested_model(request))
+            # Invalid or unusual request: FastAPI validates it again and
+            # builds the error response (the body is only read once)
+            return await validated_handler(request)
+        
+        async def handler(request: Request) -> Response:
+            idempotency_key = request.headers.get("idempotency-key")
+            if idempotency_key is None or idempotency_store is None:
+                return await handle(request)
+            
+            if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+                return JSONResponse(
+                    {"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"},
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+            request_hash = hash_request(await request.body())
+            stored = await _idempotency_call(idempotency_store.begin, idempotency_key,
+                                             request_hash)
+            if stored is not None:
+                if stored.request_hash != request_hash:
+                    return JSONResponse(
+                        {"detail": "Idempotency-Key was already used for a different request"},
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                if stored.in_progress:
+                    return JSONResponse(
+                        {"detail": "A request with this Idempotency-Key is still in progress"},
+                        status_code=status.HTTP_409_CONFLICT,
+                        headers={"Retry-After": "1"}
+                    )
+                return _replay(stored, request.headers.get("if-none-match"))
+            
+            # Only successful predictions are stored; errors can be retried
+            try:
+                response = await handle(request)
+            except BaseException:
+                await _idempotency_call(idempotency_store.release, idempotency_key)
+                raise
+            if response.status_code == status.HTTP_200_OK:
+                await _idempotency_call(idempotency_store.put, idempotency_key, StoredResponse(
+                    request_hash, response.status_code,
+                    {name: value for name, value in response.headers.items()
+                     if name in ("content-type", "etag", "x-model", "x-model-version")},
+                    bytes(response.body)
+                ))
+            else:
+                await _idempotency_call(idempotency_store.release, idempotency_key)
+            return response
+        
+        return handler
+
+
+async def predict_heart_disease(data: HeartDiseaseInput, request: Request):
+    """Predict heart disease based on patient health data.
+    
+    Accepts 13 health metrics and returns:
+    - Boolean prediction (true/false)
+    - Probability score (0.0 to 1.0)
+    - Risk level (Low/Medium/High)
+    
+    Typical requests are answered by FastPredictRoute without calling this
+    function; it handles the rest after FastAPI has validated them.
+    
+    Args:
+        data: Patient health metrics (validated by Pydantic)
+        request: Incoming request (for the If-None-Match and model headers)
+        
+    Returns:
+        JSON response with the HeartDiseasePrediction fields and
+        X-Model, X-Model-Version and ETag headers, or 304 Not Modified
+        
+    Raises:
+        HTTPException: If the model is unknown, prediction fails or the
+            server is overloaded
+    """
+    return await _predict(data, request.headers.get("if-none-match"),
+                          _requested_model(request))
+
+
+router.add_api_route(
     "/predict",
+    predict_heart_disease,
+    methods=["POST"],
+    route_class_override=FastPredictRoute,
     response_model=HeartDiseasePrediction,
     status_code=status.HTTP_200_OK,
     summary="Predict heart disease",
-    description="Predict heart disease probability based on patient health metrics",
+    description="Predict heart disease probability based on patient health metrics. "
+                "Responses carry an ETag derived from the input and the model version: "
+                "send it back in If-None-Match to get 304 Not Modified instead of a new "
+                "prediction. Requests with an Idempotency-Key header are stored, and a "
+                "retry with the same key and body replays the stored response. "
+                "With a model registry, the X-Model header selects a registered model; "
+                "the X-Model response header names the model that answered.",
     responses={
         200: {
             "description": "Successful prediction",
@@ -33,45 +397,539 @@ predictor = HeartDiseasePredictor()
                 }
             }
         },
+        304: {
+            "description": "Not modified - If-None-Match matches the prediction's ETag"
+        },
+        400: {
+            "description": "Invalid Idempotency-Key, or X-Model names an unknown model"
+        },
+        409: {
+            "description": "A request with the same Idempotency-Key is still in progress, "
+                           "retry later"
+        },
+        412: {
+            "description": "If-None-Match: * - a prediction exists for every input"
+        },
         422: {
-            "description": "Validation error - invalid input data"
+            "description": "Validation error - invalid input data, or an Idempotency-Key "
+                           "reused for a different request"
         },
         500: {
             "description": "Server error - prediction failed"
+        },
+        503: {
+            "description": "Server overloaded - inference queue full, retry later"
         }
     }
 )
-async def predict_heart_disease(data: HeartDiseaseInput):
-    """Predict heart disease based on patient health data.
-    
-    Accepts 13 health metrics and returns:
-    - Boolean prediction (true/false)
-    - Probability score (0.0 to 1.0)
-    - Risk level (Low/Medium/High)
+
+
+def _rate_limited(n_rows: int, retry_after: float) -> Response:
+    """Build the 429 response for a batch the client cannot afford."""
+    return admission.reject(
+        "rate_limited", retry_after,
+        f"Rate limit exceeded: a {n_rows}-row batch costs {n_rows} tokens"
+    )
+
+
+def _batch_payload(data: HeartDiseaseBatchInput):
+    """Row count and validator of a JSON batch payload (see columnar.read_batch)."""
+    if data.records is not None:
+        return len(data.records), lambda: build_feature_matrix(data.records)
+    n_rows = max((len(values) for values in data.columns.values()), default=0)
+    return n_rows, lambda: build_feature_matrix_from_columns(data.columns)
+
+
+async def _score_batch(request: Request, n_rows: int, validate):
+    """Route, admit, validate and score a batch (shared by every batch format).
     
     Args:
-        data: Patient health metrics (validated by Pydantic)
+        request: Incoming request (for admission control and the model header)
+        n_rows: Rows in the batch
+        validate: Returns (features, row_indices, errors), see build_feature_matrix
         
     Returns:
-        HeartDiseasePrediction with result
+        Tuple of (name, predictor, row_indices, predictions, probabilities,
+        errors) where name is the serving model's, or a 429 response if the
+        client cannot afford the batch's rows
         
     Raises:
-        HTTPException: If prediction fails
+        HTTPException: If the model is unknown, the batch is too large or
+            malformed, prediction fails, or the server is overloaded
     """
+    model, predictor = _route(_requested_model(request))
+    name = model or model_registry.primary_name
     try:
-        # Make prediction
-        result = predictor.predict(data)
-        return result
+        if n_rows > settings.batch_max_rows:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Batch too large: {n_rows} rows (max {settings.batch_max_rows})"
+            )
+        
+        # One token per row (less any estimate charged before parsing)
+        retry_after = await charge_rows(request, n_rows)
+        if retry_after:
+            return _rate_limited(n_rows, retry_after)
         
+        # Step 1: Validate rows and build the raw feature matrix (off the event loop)
+        features, row_indices, errors = await inference_executor.run_local(validate)
+        profiling.note_rows(n_rows)
+        profiling.mark("validation")
+    except InferenceOverloadedError as e:
+        raise _overloaded(e)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
+    try:
+        # Step 2: Score all valid rows
+        predictions, probabilities = await inference_executor.run(
+            predictor, "predict_batch", features, model=model
+        )
+        profiling.mark("inference")
+        shadow_scorer.submit(name, predictor.version, features, predictions, probabilities)
+        return name, predictor, row_indices, predictions, probabilities, errors
+        
+    except InferenceOverloadedError as e:
+        raise _overloaded(e)
     except ValueError as e:
-        # Handle preprocessing or prediction errors
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Prediction error: {str(e)}"
         )
     except Exception as e:
-        # Handle unexpected errors
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Unexpected error: {str(e)}"
         )
+
+
+def _batch_results(predictor, n_rows: int, row_indices, predictions, probabilities,
+                   errors) -> HeartDiseaseBatchPrediction:
+    """Assemble per-row JSON results in input order and count them."""
+    results = [None] * n_rows
+    for index, row_errors in errors.items():
+        results[index] = HeartDiseaseBatchItem(index=index, errors=row_errors)
+    for index, has_disease, probability in zip(
+        row_indices.tolist(), predictions.tolist(), probabilities.tolist()
+    ):
+        results[index] = HeartDiseaseBatchItem(
+            index=index,
+            prediction=has_disease,
+            probability=round(probability, 4),
+            risk_level=predictor._get_risk_level(probability)
+        )
+    
+    _count_predictions(f"{settings.api_prefix}/predict/batch", predictor,
+                       [item.risk_level for item in results if item.errors is None])
+    return HeartDiseaseBatchPrediction(
+        total=n_rows,
+        succeeded=len(row_indices),
+        failed=len(errors),
+        results=results
+    )
+
+
+class ColumnarBatchRoute(APIRoute):
+    """Route class for POST /predict/batch adding binary columnar formats.
+    
+    Arrow IPC and MessagePack bodies (by Content-Type) are decoded by
+    app.utils.columnar on the inference executor, without building
+    per-row Python objects, and
+    results are returned in the format named by Accept: a binary format,
+    JSON, or by default the request's own format. JSON requests may ask
+    for a binary response too.
+    
+    JSON bodies are parsed by HeartDiseaseBatchInput's compiled validator
+    on the inference executor, so a large batch does not stall the event
+    loop. Invalid JSON bodies and other content types go through the
+    regular FastAPI handler (and its 422 error format).
+    
+    Before a body is parsed, the client is charged the rows its size
+    implies (see _ROW_BYTES), so a client out of tokens is turned away
+    without paying for the parse.
+    """
+    
+    def get_route_handler(self):
+        json_handler = super().get_route_handler()
+        
+        async def handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "")
+            input_format = columnar.format_from_media_type(content_type)
+            accept = request.headers.get("accept", "")
+            output_format = columnar.format_from_media_type(accept)
+            if input_format is None and not content_type.startswith("application/json"):
+                return await json_handler(request)
+            if output_format is None and "json" not in accept.lower():
+                output_format = input_format
+            
+            body = await request.body()
+            estimate = min(len(body) // _ROW_BYTES[input_format or "json"],
+                           settings.batch_max_rows)
+            retry_after = await charge_rows(request, max(1, estimate))
+            if retry_after:
+                return _rate_limited(estimate, retry_after)
+            
+            try:
+                if output_format is not None:
+                    columnar.require(output_format)
+                if input_format is None:
+                    try:
+                        data = await inference_executor.run_local(
+                            HeartDiseaseBatchInput.model_validate_json, body
+                        )
+                    except ValidationError:
+                        # FastAPI validates it again and builds the 422 response
+                        return await json_handler(request)
+                    n_rows, validate = _batch_payload(data)
+                else:
+                    n_rows, validate = await inference_executor.run_local(
+                        columnar.read_batch, input_format, body
+                    )
+            except InferenceOverloadedError as e:
+                raise _overloaded(e)
+            except FormatUnavailableError as e:
+                return JSONResponse({"detail": str(e)},
+                                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+            except ValueError as e:
+                return JSONResponse({"detail": str(e)},
+                                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            
+            scored = await _score_batch(request, n_rows, validate)
+            if isinstance(scored, Response):
+                return scored
+            name, predictor, row_indices, predictions, probabilities, errors = scored
+            headers = {"X-Model": name, "X-Model-Version": predictor.version}
+            if output_format is None:
+                result = _batch_results(predictor, n_rows, row_indices, predictions,
+                                        probabilities, errors)
+                return Response(result.model_dump_json(), media_type="application/json",
+                                headers=headers)
+            
+            # Step 3: Encode the result columns
+            body = columnar.write_results(output_format, n_rows, row_indices, predictions,
+                                          probabilities, errors)
+            if settings.metrics_enabled:
+                levels = [RISK_LEVELS[code] for code in risk_codes(probabilities).tolist()]
+                _count_predictions(f"{settings.api_prefix}/predict/batch", predictor, levels)
+            return Response(body, media_type=columnar.MEDIA_TYPES[output_format],
+                            headers=headers)
+        
+        return handler
+
+
+async def predict_heart_disease_batch(data: HeartDiseaseBatchInput, request: Request,
+                                      response: Response):
+    """Predict heart disease for a batch of patients.
+    
+    Builds one (N, 13) feature matrix, scores it in chunks and returns
+    results in input order. Rows that fail validation get an "errors"
+    entry instead of a prediction. Valid JSON, Arrow IPC and MessagePack
+    requests are answered by ColumnarBatchRoute without calling this
+    function; it handles the rest after FastAPI has validated them.
+    
+    Args:
+        data: Batch payload with either records or columns
+        request: Incoming request (for admission control and the model header)
+        response: Outgoing response (carries the X-Model and X-Model-Version headers)
+        
+    Returns:
+        HeartDiseaseBatchPrediction with per-row results, or 429 if the
+        client cannot afford the batch's rows
+        
+    Raises:
+        HTTPException: If the model is unknown, the batch is too large or
+            malformed, prediction fails, or the server is overloaded
+    """
+    n_rows, validate = _batch_payload(data)
+    scored = await _score_batch(request, n_rows, validate)
+    if isinstance(scored, Response):
+        return scored
+    name, predictor, row_indices, predictions, probabilities, errors = scored
+    response.headers["X-Model"] = name
+    response.headers["X-Model-Version"] = predictor.version
+    
+    # Step 3: Assemble per-row results in input order
+    return _batch_results(predictor, n_rows, row_indices, predictions, probabilities, errors)
+
+
+router.add_api_route(
+    "/predict/batch",
+    predict_heart_disease_batch,
+    methods=["POST"],
+    route_class_override=ColumnarBatchRoute,
+    response_model=HeartDiseaseBatchPrediction,
+    status_code=status.HTTP_200_OK,
+    summary="Predict heart disease for many patients",
+    description="Score a list of records (or a columnar payload) in one request. "
+                "Invalid rows are reported individually and do not fail the batch. "
+                "Besides JSON, the request body may be an Arrow IPC stream "
+                "(application/vnd.apache.arrow.stream) or MessagePack (application/msgpack); "
+                "Accept selects the response format (default: the request's). "
+                "The X-Model header selects a registered model, as for POST /predict.",
+    responses={
+        200: {
+            "description": "Per-row results (JSON), or prediction, probability, risk_code "
+                           "and errors columns (Arrow IPC, MessagePack)",
+            "content": {
+                columnar.MEDIA_TYPES["arrow"]: {},
+                columnar.MEDIA_TYPES["msgpack"]: {}
+            }
+        },
+        400: {
+            "description": "X-Model names an unknown model"
+        },
+        413: {
+            "description": "Batch exceeds the configured maximum number of rows"
+        },
+        415: {
+            "description": "Binary format requested but its package (pyarrow, msgpack) "
+                           "is not installed"
+        },
+        422: {
+            "description": "Validation error - malformed batch payload"
+        },
+        429: {
+            "description": "Rate limit exceeded - batches cost one token per row"
+        },
+        500: {
+            "description": "Server error - prediction failed"
+        },
+        503: {
+            "description": "Server overloaded - inference queue full, retry later"
+        }
+    }
+)
+
+
+@router.post(
+    "/predict/stream",
+    response_class=DuplexStreamingResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Stream bulk predictions",
+    description="Score an NDJSON or CSV request body of any size. The body is parsed "
+                "incrementally, scored in fixed-size chunks and results are streamed back "
+                "(NDJSON or CSV, chosen by the Accept header) in input order, with error "
+                "records for invalid rows.",
+    responses={
+        200: {
+            "description": "One result line per input row",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"index": 0, "prediction": true, "probability": 0.8523, '
+                               '"risk_level": "High"}\n'
+                },
+                "text/csv": {
+                    "example": "index,prediction,probability,risk_level,errors\n"
+                               "0,true,0.8523,High,\n"
+                }
+            }
+        },
+        415: {
+            "description": "Content-Type is not NDJSON or CSV"
+        },
+        422: {
+            "description": "CSV header is missing feature columns or too long"
+        },
+        503: {
+            "description": "Server overloaded - inference queue full, retry later"
+        }
+    }
+)
+async def predict_heart_disease_stream(request: Request):
+    """Score a streamed NDJSON or CSV body.
+    
+    Memory use is bounded by the chunk size (settings.batch_chunk_size)
+    and the line length limit (settings.stream_max_line_length), not by
+    the size of the upload: each chunk of rows is validated, scored and
+    written out before the next one is read, and longer lines are
+    skipped as they arrive and answered with an error record.
+    
+    Args:
+        request: Incoming request; Content-Type selects the input format
+            and Accept the output format (defaults to the input format)
+        
+    Returns:
+        DuplexStreamingResponse with one result line per input row
+        
+    Raises:
+        HTTPException: If the format is unsupported, the CSV header is invalid
+            or the server is overloaded (checked before the response starts)
+    """
+    input_format = format_from_content_type(request.headers.get("content-type"))
+    if input_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Type must be application/x-ndjson or text/csv"
+        )
+    output_format = format_from_content_type(request.headers.get("accept")) or input_format
+    try:
+        inference_executor.check_capacity()
+    except InferenceOverloadedError as e:
+        raise _overloaded(e)
+    
+    predictor = predictor_manager.current
+    body = request.stream()
+    splitter = LineSplitter(max_line_length=settings.stream_max_line_length)
+    lines = []
+    header = None
+    
+    # Read up to the CSV header first, so a bad header is a 422 instead of
+    # a broken stream
+    if input_format == "csv":
+        async for chunk in body:
+            lines.extend(splitter.feed(chunk))
+            if any(line is None or line.strip() for line in lines):
+                break
+        else:
+            lines.extend(splitter.close())
+        while lines and lines[0] is not None and not lines[0].strip():
+            lines.pop(0)
+        if not lines:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="CSV body is empty (a header row is required)"
+            )
+        if lines[0] is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"CSV header is longer than {settings.stream_max_line_length} characters"
+            )
+        try:
+            header = parse_csv_header(lines.pop(0))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=str(e)
+            )
+    
+    return DuplexStreamingResponse(
+        _stream_predictions(body, splitter, lines, input_format, output_format, header, predictor,
+                            client_of(request)),
+        media_type=MEDIA_TYPES[output_format],
+        headers={"X-Model-Version": predictor.version}
+    )
+
+
+async def _stream_predictions(body, splitter: LineSplitter, lines: list, input_format: str,
+                              output_format: str, header, predictor, client: Optional[str]):
+    """Read, score and format the body chunk by chunk (see predict_heart_disease_stream).
+    
+    Rows are charged to the client's rate limit as they are scored; the
+    response has already started, so they put the bucket into debt
+    instead of failing the stream. For the same reason a chunk waits for
+    inference capacity, up to settings.stream_overload_wait_seconds,
+    before the stream ends with an error record.
+    """
+    chunk_size = max(1, settings.batch_chunk_size)
+    route = f"{settings.api_prefix}/predict/stream"
+    loop = asyncio.get_running_loop()
+    offset = 0
+    
+    def prepare(chunk_lines: list):
+        records, parse_errors = parse_lines(chunk_lines, input_format, header)
+        return len(records), validate_records(records, parse_errors)
+    
+    async def queued(run, *args):
+        # Bulk work waits for capacity instead of failing, up to a deadline
+        deadline = loop.time() + settings.stream_overload_wait_seconds
+        while True:
+            try:
+                return await run(*args)
+            except InferenceOverloadedError:
+                if loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0.05)
+    
+    async def score(chunk_lines: list) -> str:
+        nonlocal offset
+        # Step 1: Parse and validate off the event loop
+        n_rows, (features, row_indices, errors) = await queued(
+            inference_executor.run_local, prepare, chunk_lines
+        )
+        # Admission paid for the first row
+        await admission.take_async(client, n_rows - (1 if offset == 0 else 0), enforce=False)
+        
+        # Step 2: Score
+        predictions, probabilities = await queued(
+            inference_executor.run, predictor, "predict_batch", features
+        )
+        
+        # Step 3: Format the chunk's result lines in input order
+        risk_levels = [predictor._get_risk_level(p) for p in probabilities.tolist()]
+        _count_predictions(route, predictor, risk_levels)
+        text = format_results(output_format, offset, n_rows, row_indices, predictions,
+                              probabilities, risk_levels, errors)
+        offset += n_rows
+        return text
+    
+    if output_format == "csv":
+        yield csv_result_header()
+    try:
+        async for chunk in body:
+            lines.extend(splitter.feed(chunk))
+            while len(lines) >= chunk_size:
+                chunk_lines, lines[:] = lines[:chunk_size], lines[chunk_size:]
+                yield await score(chunk_lines)
+        lines.extend(splitter.close())
+        if lines:
+            yield await score(lines)
+    except ClientDisconnect:
+        print(f"✗ Client disconnected from streaming prediction after {offset} rows")
+    except InferenceOverloadedError as e:
+        print(f"✗ Streaming prediction overloaded after {offset} rows: {e}")
+        yield format_stream_error(output_format, f"Server overloaded after {offset} rows: {e}")
+    except Exception as e:
+        # Headers are already sent: report the failure as a final record
+        print(f"✗ Streaming prediction failed after {offset} rows: {e}")
+        yield format_stream_error(output_format, f"Prediction failed after {offset} rows: {e}")
+
+
+@router.get(
+    "/predict/batcher",
+    summary="Micro-batcher statistics",
+    description="Batch size and wait-time configuration and counters for single-prediction micro-batching"
+)
+async def batcher_stats():
+    """Return micro-batching configuration and metrics."""
+    return batcher.stats()
+
+
+@router.get(
+    "/predict/cache",
+    summary="Prediction cache statistics",
+    description="Size, hit/miss/eviction counters and artifact fingerprint of the prediction "
+                "cache; `candidates` reports the caches of registry candidates and "
+                "`shared` the cross-worker tier (occupancy is shared, counters are this "
+                "worker's)"
+)
+async def cache_stats():
+    """Return prediction cache configuration and metrics."""
+    return {**prediction_cache.stats(),
+            "candidates": {name: cache.stats() for name, cache in candidate_caches.items()},
+            "shared": shared_cache.stats()}
+
+
+@router.get(
+    "/predict/idempotency",
+    summary="Idempotency store statistics",
+    description="Size and hit/miss counters of the Idempotency-Key response store"
+)
+async def idempotency_stats():
+    """Return idempotency store configuration and metrics."""
+    if idempotency_store is None:
+        return {"store": "none"}
+    return idempotency_store.stats()
+
+
+@router.get(
+    "/predict/admission",
+    summary="Admission control statistics",
+    description="Rate limit and concurrency limit configuration, current load and "
+                "rejection counters of the worker that answers"
+)
+async def admission_stats():
+    """Return admission control configuration and metrics."""
+    return admission.stats()
@@ -0,0 +1,389 @@
+"""Admission control for the inference endpoints (POST /predict*).
+
+Two checks run before a request reaches its handler:
+
+- Per-client token bucket: a client may spend rate_limit_per_second tokens
+  per second with bursts of up to rate_limit_burst. Every request costs
+  one token, and batch and streaming requests are charged one more token
+  per additional row: batches by an estimate from the body size before
+  parsing, corrected once the row count is known. A client out of tokens
+  gets 429 Too Many Requests with Retry-After.
+- Global concurrency limit: at most admission_max_concurrency inference
+  requests (default: the inference worker count) run at once; up to
+  admission_max_queue more may wait admission_queue_timeout_ms for a
+  slot. Anything beyond that gets 503 Service Unavailable with
+  Retry-After.
+
+A request that costs more than the burst is admitted when the client's
+bucket is full and leaves it in debt, so one large batch is allowed but
+the client then waits until the debt is repaid.
+
+Bucket state lives in this process (rate_limit_backend=memory) or in a
+SQLite file shared by all workers on the host (sqlite), so a client
+cannot multiply its rate by landing on different workers. Concurrency is
+limited per process, since every worker has its own inference pool.
+SQLite charges run in a thread, off the event loop.
+"""
+
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from starlette.responses import JSONResponse
+from app.core import metrics
+from app.core.config import settings
+
+# Key under which the middleware leaves the client id in request.state
+CLIENT_STATE_KEY = "admission_client"
+
+# Key for the tokens a request has paid so far
+PAID_STATE_KEY = "admission_paid"
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryRateLimitBackend:
+    """Token buckets in this process, bounded by LRU over idle clients."""
+
+    kind = "memory"
+    blocking = False
+
+    def __init__(self, max_clients: int):
+        """Initialize the backend.
+
+        Args:
+            max_clients: Buckets kept; the least recently seen client is
+                forgotten first (it starts again with a full bucket)
+        """
+        self.max_clients = max(1, max_clients)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str, cost: float, rate: float, burst: float,
+             enforce: bool = True, paid: float = 0.0) -> float:
+        """Charge a client cost tokens.
+
+        Args:
+            client: Client id
+            cost: Tokens to charge
+            rate: Refill rate in tokens per second
+            burst: Bucket capacity
+            enforce: False charges unconditionally (the bucket may go into debt)
+            paid: Tokens already charged for the same request; a request
+                costing more than the burst needs a full bucket, not more
+
+        Returns:
+            0.0 if charged, otherwise seconds until the client can afford it
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            needed = min(cost, burst - paid)
+            if enforce and tokens < needed:
+                self._buckets[client] = (tokens, now)
+                self._buckets.move_to_end(client)
+                return (needed - tokens) / rate
+            self._buckets[client] = (tokens - cost, now)
+            self._buckets.move_to_end(client)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return 0.0
+
+    def clear(self):
+        """Forget every client."""
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.kind, "clients": len(self._buckets),
+                    "max_clients": self.max_clients}
+
+
+class SQLiteRateLimitBackend:
+    """Token buckets in a SQLite file shared by all worker processes.
+
+    Each charge is one short write transaction. Rows of clients whose
+    buckets have refilled completely are pruned every _PRUNE_INTERVAL
+    charges (a missing row means a full bucket).
+    """
+
+    kind = "sqlite"
+    blocking = True  # File I/O: AdmissionController.take_async uses a thread
+    _PRUNE_INTERVAL = 1000
+
+    def __init__(self, path: Path):
+        """Initialize the backend (the file is created on first use).
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self._connection_pid = None
+        self._connection = None
+        self._lock = threading.Lock()
+        self._charges = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection for this process (lock must be held)."""
+        if self._connection_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False,
+                                         isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "client TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+    def take(self, client: str, cost: float, rate: float, burst: float,
+             enforce: bool = True, paid: float = 0.0) -> float:
+        """Charge a client cost tokens (see MemoryRateLimitBackend.take)."""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT tokens, updated FROM buckets WHERE client = ?", (client,)
+                ).fetchone()
+                tokens = _refill(*row, now, rate, burst) if row else burst
+                needed = min(cost, burst - paid)
+                retry_after = (needed - tokens) / rate if enforce and tokens < needed else 0.0
+                if not retry_after:
+                    tokens -= cost
+                connection.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                                   (client, tokens, now))
+                self._charges += 1
+                if self._charges % self._PRUNE_INTERVAL == 0:
+                    # Refilled to the brim: same as no row at all
+                    connection.execute("DELETE FROM buckets WHERE tokens + (? - updated) * ? >= ?",
+                                       (now, rate, burst))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return retry_after
+
+    def clear(self):
+        """Forget every client."""
+        with self._lock:
+            self._connect().execute("DELETE FROM buckets")
+
+    def stats(self) -> dict:
+        with self._lock:
+            clients = self._connect().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+            return {"backend": self.kind, "path": str(self.path), "clients": clients}
+
+
+class ConcurrencyLimiter:
+    """Bounded number of requests in flight, with a short bounded wait queue."""
+
+    def __init__(self, limit: int, max_queue: int, timeout_s: float):
+        """Initialize the limiter.
+
+        Args:
+            limit: Requests allowed in flight
+            max_queue: Requests allowed to wait for a slot
+            timeout_s: Longest wait for a slot
+        """
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.timeout_s = max(0.0, timeout_s)
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting if allowed; False if the request must be rejected."""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        elif self.waiting >= self.max_queue or self.timeout_s == 0:
+            return False
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout_s)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+
+class AdmissionController:
+    """Rate limiter and concurrency limiter applied by AdmissionMiddleware."""
+
+    def __init__(self):
+        self.rate = settings.rate_limit_per_second
+        self.burst = max(1.0, settings.rate_limit_burst)
+        if settings.rate_limit_backend == "sqlite":
+            self.backend = SQLiteRateLimitBackend(settings.rate_limit_sqlite_path)
+        else:
+            self.backend = MemoryRateLimitBackend(settings.rate_limit_max_clients)
+        self.limiter = ConcurrencyLimiter(
+            settings.admission_max_concurrency or settings.inference_workers,
+            settings.admission_max_queue,
+            settings.admission_queue_timeout_ms / 1000.0
+        )
+
+        # Metrics
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+
+    def client_id(self, scope) -> str:
+        """Client a request is accounted to: the configured header, else its address.
+
+        Behind a reverse proxy, run uvicorn with --proxy-headers so the
+        address is the real client's.
+        """
+        if settings.rate_limit_key_header:
+            name = settings.rate_limit_key_header.lower().encode("latin-1")
+            for header, value in scope["headers"]:
+                if header == name and value:
+                    return "key:" + value.decode("latin-1")
+        client = scope.get("client")
+        return "addr:" + (client[0] if client else "unknown")
+
+    def take(self, client: Optional[str], cost: float, enforce: bool = True,
+             paid: float = 0.0) -> float:
+        """Charge a client cost tokens (paid: already charged for this request).
+
+        Returns:
+            0.0 if charged (or rate limiting is off), otherwise seconds
+            until the client can afford the request
+        """
+        if client is None or self.rate <= 0 or cost == 0:
+            return 0.0
+        return self.backend.take(client, cost, self.rate, self.burst, enforce, paid)
+
+    async def take_async(self, client: Optional[str], cost: float, enforce: bool = True,
+                         paid: float = 0.0) -> float:
+        """take, run in a thread if the backend blocks on file I/O."""
+        if self.backend.blocking and client is not None and self.rate > 0 and cost != 0:
+            return await asyncio.to_thread(self.take, client, cost, enforce, paid)
+        return self.take(client, cost, enforce, paid)
+
+    def reject(self, reason: str, retry_after: float, detail: str) -> JSONResponse:
+        """Count a rejection and build its 429/503 response."""
+        if reason == "rate_limited":
+            self.rate_limited += 1
+            status_code = 429
+        else:
+            self.overloaded += 1
+            status_code = 503
+        if settings.metrics_enabled:
+            metrics.ADMISSION_REJECTIONS.labels(reason).inc()
+        return JSONResponse(
+            {"detail": detail}, status_code=status_code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def stats(self) -> dict:
+        """Return admission configuration and counters (this worker)."""
+        return {
+            "enabled": settings.admission_enabled,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "key_header": settings.rate_limit_key_header or None,
+            **self.backend.stats(),
+            "max_concurrency": self.limiter.limit,
+            "max_queue": self.limiter.max_queue,
+            "queue_timeout_ms": self.limiter.timeout_s * 1000.0,
+            "active": self.limiter.active,
+            "waiting": self.limiter.waiting,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "overloaded": self.overloaded
+        }
+
+
+def client_of(request) -> Optional[str]:
+    """Client id the middleware assigned to a request (None if not admitted by it)."""
+    return request.scope.get("state", {}).get(CLIENT_STATE_KEY)
+
+
+async def charge_rows(request, rows: int) -> float:
+    """Bring what a request's client paid up (or down) to one token per row.
+
+    Admission paid for one row. A batch may be charged an estimate before
+    it is parsed and the actual row count afterwards; an estimate above
+    the actual count is refunded.
+
+    Args:
+        request: Request admitted by AdmissionMiddleware
+        rows: Rows the request costs in total
+
+    Returns:
+        0.0 if charged, otherwise seconds until the client can afford it
+    """
+    state = request.scope.get("state", {})
+    paid = state.get(PAID_STATE_KEY, 1.0)
+    cost = rows - paid
+    retry_after = await admission.take_async(client_of(request), cost, cost > 0, paid)
+    if not retry_after and CLIENT_STATE_KEY in state:
+        state[PAID_STATE_KEY] = float(rows)
+    return retry_after
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control to POST /predict* requests."""
+
+    def __init__(self, app):
+        self.app = app
+        self.prefix = f"{settings.api_prefix}/predict"
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not scope["path"].startswith(self.prefix)):
+            await self.app(scope, receive, send)
+            return
+
+        client = admission.client_id(scope)
+        retry_after = await admission.take_async(client, 1.0)
+        if retry_after:
+            response = admission.reject(
+                "rate_limited", retry_after,
+                f"Rate limit exceeded: {admission.rate:g} requests/s "
+                f"(burst {admission.burst:g}) per client"
+            )
+            await response(scope, receive, send)
+            return
+
+        if not await admission.limiter.acquire():
+            response = admission.reject(
+                "overloaded", admission.limiter.timeout_s,
+                f"Server overloaded: {admission.limiter.limit} requests in flight "
+                f"and {admission.limiter.waiting} waiting"
+            )
+            await response(scope, receive, send)
+            return
+
+        admission.admitted += 1
+        state = scope.setdefault("state", {})
+        state[CLIENT_STATE_KEY], state[PAID_STATE_KEY] = client, 1.0
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.limiter.release()
+
+
+# Singleton instance
+admission = AdmissionController()
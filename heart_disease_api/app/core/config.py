@@ -5,6 +5,7 @@ Manages paths, constants, and environment variables.
 
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -22,9 +23,108 @@ class Settings(BaseSettings):
     base_dir: Path = Path(__file__).parent.parent.parent
     model_path: Path = base_dir / "artifacts" / "heart-disease-prediction-knn-model.pkl"
     scaler_path: Path = base_dir / "artifacts" / "scaler.pkl"
+    artifact_format: Literal["joblib", "exported"] = "joblib"  # "exported" = mmap, no pickle
+    exported_artifacts_dir: Path = base_dir / "artifacts" / "exported"
     
     # Model Configuration
     prediction_threshold: float = 0.5  # Not currently used, but available
+    single_pass_inference: bool = True  # Derive label from predict_proba (one model call)
+    inference_engine: Literal["sklearn", "compiled"] = "sklearn"  # "compiled" = plain NumPy
+    knn_precision: Literal["float64", "float32", "int16", "int8"] = "float64"  # Compiled KNN matrix
+    knn_precision_check: bool = False  # Compare the compact KNN with float64 at startup (~1 s)
+    
+    # Lookup Table Configuration (built with `python -m app.materialize`)
+    lookup_table_enabled: bool = False
+    lookup_table_dir: Path = base_dir / "artifacts" / "lookup"
+    
+    # Neighbor Index Configuration (KNN models; built with `python -m app.index`)
+    neighbor_index_enabled: bool = False
+    neighbor_index_dir: Path = base_dir / "artifacts" / "neighbors"
+    neighbor_index_n_probe: int = 8  # Lists scanned by the ivf index (recall vs latency)
+    
+    # Batch Prediction Configuration
+    batch_max_rows: int = 100_000  # Reject larger batches with 413
+    batch_chunk_size: int = 4096  # Rows per scaler/model call
+    stream_max_line_length: int = 65_536  # POST /predict/stream: longer lines become error rows
+    stream_overload_wait_seconds: float = 30.0  # POST /predict/stream: a chunk waits this long for inference capacity, then the stream ends with an error record
+    
+    # Inference Executor Configuration
+    inference_executor: Literal["thread", "process"] = "thread"
+    inference_workers: int = 4
+    inference_max_queue: int = 64  # Waiting calls allowed before 503
+    
+    # Micro-batching Configuration (concurrent single predictions)
+    micro_batch_enabled: bool = False
+    micro_batch_max_size: int = 64  # Flush when this many requests are waiting
+    micro_batch_max_wait_ms: float = 2.0  # Max time the first request waits
+    
+    # Prediction Cache Configuration
+    prediction_cache_enabled: bool = True
+    prediction_cache_max_size: int = 10_000  # Entries before LRU eviction
+    prediction_cache_ttl_seconds: float = 0.0  # 0 = entries never expire
+    
+    # Admission Control Configuration (POST /predict*)
+    admission_enabled: bool = False
+    rate_limit_per_second: float = 20.0  # Tokens per client per second (0 = no per-client limit)
+    rate_limit_burst: float = 40.0  # Bucket capacity; batches cost one token per row
+    rate_limit_key_header: str = ""  # e.g. "X-API-Key"; empty = client address
+    rate_limit_backend: Literal["memory", "sqlite"] = "memory"  # sqlite = shared by all workers
+    rate_limit_max_clients: int = 100_000  # memory backend: buckets kept (LRU)
+    rate_limit_sqlite_path: Path = base_dir / "data" / "rate_limits.sqlite3"
+    admission_max_concurrency: int = 0  # Inference requests in flight; 0 = inference_workers
+    admission_max_queue: int = 32  # Requests allowed to wait for a slot before 503
+    admission_queue_timeout_ms: float = 250.0  # Longest wait for a slot before 503
+    
+    # Shared Prediction Cache Configuration (all workers on the host)
+    shared_cache_enabled: bool = False
+    shared_cache_path: Path = (
+        Path("/dev/shm/heart_api_prediction_cache") if Path("/dev/shm").is_dir()
+        else base_dir / "data" / "prediction_cache.bin"
+    )
+    shared_cache_slots: int = 65_536  # 128 bytes each
+    
+    # HTTP Response Caching Configuration (POST /predict)
+    etag_enabled: bool = True  # ETag header; If-None-Match answered with 304
+    idempotency_store: Literal["none", "memory", "sqlite"] = "memory"  # Idempotency-Key replays
+    idempotency_max_entries: int = 10_000
+    idempotency_ttl_seconds: float = 86_400.0  # 0 = stored responses never expire
+    idempotency_sqlite_path: Path = base_dir / "data" / "idempotency.sqlite3"
+    
+    # Metrics Configuration (Prometheus text format at GET /metrics)
+    metrics_enabled: bool = True
+    
+    # Profiling Configuration (admin API, /api/admin/profile/*)
+    slow_request_threshold_ms: float = 0.0  # Log requests at least this slow; 0 = off
+    slow_request_log_size: int = 100  # Slow requests kept per worker
+    profile_max_seconds: float = 60.0  # Longest CPU/memory profile an admin may request
+    
+    # Startup Configuration
+    warmup_predictions: int = 8  # Synthetic predictions before ready (and after reload)
+    
+    # Hot Reload Configuration
+    model_watch_interval_seconds: float = 0.0  # Poll artifact files; 0 = no watcher
+    model_reload_on_sighup: bool = True
+    admin_token: str = ""  # X-Admin-Token for /api/admin; empty = admin API disabled
+    
+    # Model Registry Configuration (candidate models; see app.models.registry)
+    model_registry_path: Path = base_dir / "artifacts" / "registry.json"  # Missing = primary only
+    model_header: str = "X-Model"  # Request header selecting a registered model; empty = ignored
+    
+    # Shadow Scoring Configuration (candidates flagged "shadow" in the registry)
+    shadow_workers: int = 1  # Background threads scoring shadow models
+    shadow_max_queue: int = 256  # Jobs waiting for a shadow worker; more are dropped
+    shadow_sample_rate: float = 1.0  # Fraction of served requests shadowed
+    shadow_max_rows: int = 1024  # Rows of a batch request shadowed (the first ones)
+    shadow_batch_wait_ms: float = 50.0  # Jobs gathered into one shadow scoring call
+    shadow_sink: Literal["none", "jsonl", "sqlite"] = "sqlite"
+    shadow_sink_path: Path = base_dir / "data" / "shadow.sqlite3"  # JSON Lines file for "jsonl"
+    
+    # Production Server Configuration (python run.py --production)
+    server_workers: int = 0  # Worker processes; 0 = one per CPU
+    server_cpu_affinity: bool = False  # Pin each worker to one CPU (Linux)
+    server_blas_threads: int = 1  # BLAS/OpenMP threads per worker; 0 = library default
+    server_preload: bool = True  # Load artifacts before forking (pages shared copy-on-write)
+    server_graceful_timeout_seconds: float = 30.0  # Drain time for in-flight requests
     
     # API Configuration
     api_prefix: str = "/api"  # Changed from "/api" - now endpoint is just /predict
@@ -0,0 +1,206 @@
+"""Inference executor.
+
+Runs blocking model inference off the asyncio event loop on a bounded
+thread or process pool, so /health and other requests are not stalled
+behind in-flight predictions.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from app.core.config import settings
+
+
+class InferenceOverloadedError(RuntimeError):
+    """Raised when the inference queue is full and the request is rejected."""
+
+
+# Per-process predictor used by process pool workers
+_worker_predictor = None
+
+
+def _init_worker(registry_snapshot):
+    """Process pool initializer: load the predictor once per worker.
+
+    The candidates come from the parent's registry (registry_snapshot)
+    instead of the registry file, so every worker serves the models the
+    parent routes to, and a registry file that fails to load cannot break
+    the pool.
+    """
+    global _worker_predictor
+    from app.models.predictor import HeartDiseasePredictor
+    from app.models.registry import model_registry
+    _worker_predictor = HeartDiseasePredictor()
+    model_registry.activate(registry_snapshot)
+
+
+def _call_worker_predictor(model: Optional[str], method: str, *args):
+    """Call a predictor method inside a process pool worker.
+
+    Returns:
+        Tuple of (result, stage timings measured by the call); the parent
+        reports the timings, since a worker's own metrics are never scraped
+    """
+    if model is None:
+        predictor = _worker_predictor
+    else:
+        from app.models.registry import model_registry
+        predictor = model_registry.get(model)
+    stages = predictor.stage_sink = []
+    try:
+        return getattr(predictor, method)(*args), stages
+    finally:
+        predictor.stage_sink = None
+
+
+class InferenceExecutor:
+    """Bounded executor for predictor calls.
+
+    At most max_workers calls run at once and at most max_queue more may
+    wait. Anything beyond that is rejected immediately with
+    InferenceOverloadedError instead of adding latency for everyone.
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int):
+        """Configure the executor (the pool itself is created on first use).
+
+        Args:
+            kind: "thread" or "process"
+            max_workers: Number of pool workers
+            max_queue: Pending calls allowed beyond the busy workers
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of calls currently running or waiting."""
+        return self._pending
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                from app.models.registry import model_registry
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(model_registry.snapshot,)
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference"
+                )
+        return self._pool
+
+    async def run(self, predictor, method: str, *args, model: Optional[str] = None):
+        """Run predictor.<method>(*args) on the pool and await the result.
+
+        In process mode the call goes to the worker's own predictor, so
+        only the arguments, result and stage timings cross the process
+        boundary; the timings are reported through predictor here.
+
+        Args:
+            predictor: Predictor used in thread mode
+            method: Name of the predictor method to call
+            *args: Positional arguments for the method
+            model: Registry name of the candidate model predictor belongs
+                to (process workers use their own copy); None = the primary
+
+        Returns:
+            The method's return value
+
+        Raises:
+            InferenceOverloadedError: If the queue is full
+        """
+        self._reserve()
+        try:
+            loop = asyncio.get_running_loop()
+            if self.kind == "process":
+                result, stages = await loop.run_in_executor(
+                    self._get_pool(), _call_worker_predictor, model, method, *args
+                )
+                for timings in stages:
+                    predictor.observe_stages(timings)
+                return result
+            call = getattr(predictor, method)
+            if settings.slow_request_threshold_ms > 0:
+                # Let the predictor report its stages to the slow request log
+                return await loop.run_in_executor(
+                    self._get_pool(), contextvars.copy_context().run, call, *args
+                )
+            return await loop.run_in_executor(self._get_pool(), call, *args)
+        finally:
+            self._pending -= 1
+
+    async def run_local(self, fn, *args):
+        """Run a blocking function of this process (e.g. request validation) off the loop.
+
+        Counts against the same queue bound as run(). In thread mode it
+        runs on the inference pool; in process mode on the event loop's
+        default thread pool, since its arguments and result (request
+        bodies, feature matrices) are not worth shipping to a worker.
+
+        Args:
+            fn: Function to call
+            *args: Positional arguments for fn
+
+        Returns:
+            fn's return value
+
+        Raises:
+            InferenceOverloadedError: If the queue is full
+        """
+        self._reserve()
+        try:
+            pool = None if self.kind == "process" else self._get_pool()
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        finally:
+            self._pending -= 1
+
+    def check_capacity(self):
+        """Raise InferenceOverloadedError if a call now would be rejected.
+
+        Lets a request fail with 503 before it commits to a response that
+        will need queue slots later (e.g. a streamed body).
+        """
+        if self._pending >= self.max_workers + self.max_queue:
+            raise InferenceOverloadedError(
+                f"Inference queue full ({self._pending} pending)"
+            )
+
+    def _reserve(self):
+        """Take a queue slot or raise InferenceOverloadedError."""
+        # Only touched from the event loop thread, so no lock is needed
+        self.check_capacity()
+        self._pending += 1
+
+    def restart(self):
+        """Replace the pool so process workers load the current artifacts.
+
+        Calls already running finish on the old pool; new calls go to a
+        fresh pool created on first use.
+        """
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def shutdown(self):
+        """Shut down the pool, waiting for running calls to finish."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+# Singleton instance
+inference_executor = InferenceExecutor(
+    kind=settings.inference_executor,
+    max_workers=settings.inference_workers,
+    max_queue=settings.inference_max_queue
+)
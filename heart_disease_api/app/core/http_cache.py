@@ -0,0 +1,366 @@
+"""Response-level HTTP caching for POST /predict.
+
+ETag: a prediction is a pure function of the canonical input (the float64
+feature vector in FEATURE_ORDER) and the model artifacts, so the ETag is
+a hash of both. A client that sends the ETag back in If-None-Match gets
+304 Not Modified without any inference. "If-None-Match: *" fails with 412,
+since every request has a current prediction.
+
+Idempotency-Key: the first request with a key claims it with an
+in-progress placeholder, and its successful response then replaces the
+placeholder together with a hash of the request body. A retry with the
+same key and body replays the stored response byte for byte (or is told
+to retry later while the first request is still running); the same key
+with a different body is rejected.
+
+Stores:
+    memory - bounded LRU in this process (default)
+    sqlite - file shared by every worker on the host (run.py --production)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+import numpy as np
+from app.core.config import settings
+
+# Longest Idempotency-Key accepted
+MAX_KEY_LENGTH = 255
+
+# Lifetime of an in-progress placeholder (frees the key if its worker dies)
+_PENDING_TTL_S = 60.0
+
+
+class StoredResponse(NamedTuple):
+    """A response kept for Idempotency-Key replays."""
+
+    request_hash: str
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def in_progress(self) -> bool:
+        """Whether this is the placeholder of a request that is still being scored."""
+        return self.status_code == 0
+
+
+def _placeholder(request_hash: str) -> StoredResponse:
+    return StoredResponse(request_hash, 0, {}, b"")
+
+
+def make_etag(features: np.ndarray, fingerprint: str) -> str:
+    """Strong ETag for a prediction.
+
+    Args:
+        features: Raw float64 feature vector in FEATURE_ORDER
+        fingerprint: Fingerprint of the serving model and scaler
+
+    Returns:
+        Quoted entity tag, e.g. "3f2a..."
+    """
+    digest = hashlib.blake2b(fingerprint.encode(), digest_size=16)
+    digest.update(np.ascontiguousarray(features, dtype=np.float64).tobytes())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value lists an ETag (weak comparison).
+
+    "*" is not a match here; see is_wildcard.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        if candidate.strip().removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def is_wildcard(if_none_match: Optional[str]) -> bool:
+    """Whether an If-None-Match header value is "*" (any current representation)."""
+    return if_none_match is not None and if_none_match.strip() == "*"
+
+
+def hash_request(body: bytes) -> str:
+    """Hash of a request body, to detect an Idempotency-Key reused for another request."""
+    return hashlib.sha256(body).hexdigest()
+
+
+class MemoryIdempotencyStore:
+    """Thread-safe LRU of stored responses in this process."""
+
+    kind = "memory"
+    blocking = False  # Cheap enough to call on the event loop
+
+    def __init__(self, max_entries: int, ttl_seconds: float = 0.0):
+        """Initialize the store.
+
+        Args:
+            max_entries: Maximum number of responses before LRU eviction
+            ttl_seconds: Entry lifetime in seconds (0 disables expiry)
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key: str) -> Optional[StoredResponse]:
+        """Unexpired entry under key, marked recently used (lock must be held)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _insert(self, key: str, response: StoredResponse, expires_at: Optional[float]):
+        """Add an entry, evicting the least recently used ones if full (lock must be held)."""
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        """Return the response stored under key, or None."""
+        with self._lock:
+            response = self._lookup(key)
+            if response is None or response.in_progress:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return response
+
+    def begin(self, key: str, request_hash: str) -> Optional[StoredResponse]:
+        """Claim key for a new request.
+
+        Returns:
+            None if the caller now owns key (an in-progress placeholder is
+            kept until put or release), else the entry already under key:
+            a stored response or another request's placeholder
+        """
+        with self._lock:
+            response = self._lookup(key)
+            if response is not None:
+                if not response.in_progress:
+                    self.hits += 1
+                return response
+            self.misses += 1
+            self._insert(key, _placeholder(request_hash), time.monotonic() + _PENDING_TTL_S)
+            return None
+
+    def put(self, key: str, response: StoredResponse):
+        """Store a response, evicting the least recently used one if full."""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._insert(key, response, expires_at)
+
+    def release(self, key: str):
+        """Drop the in-progress placeholder under key (the request failed)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0].in_progress:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove all stored responses."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return store configuration and counters."""
+        with self._lock:
+            return {
+                "store": self.kind,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+class SQLiteIdempotencyStore:
+    """Stored responses in a SQLite file shared by all worker processes.
+
+    Each process opens its own connection on first use (after any fork).
+    The database runs in WAL mode, so readers in other workers do not
+    block on a writer. Expired and excess rows are pruned every
+    _PRUNE_INTERVAL writes, oldest first. Calls block on file I/O, so the
+    API runs them in a thread.
+    """
+
+    kind = "sqlite"
+    blocking = True
+    _PRUNE_INTERVAL = 100
+
+    def __init__(self, path: Path, max_entries: int, ttl_seconds: float = 0.0):
+        """Initialize the store (the file is created on first use).
+
+        Args:
+            path: SQLite database file
+            max_entries: Rows kept after pruning
+            ttl_seconds: Entry lifetime in seconds (0 disables expiry)
+        """
+        self.path = Path(path)
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self._connection_pid = None
+        self._connection = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        # Metrics (this process only)
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection for this process (lock must be held)."""
+        if self._connection_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False,
+                                         isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, request_hash TEXT NOT NULL, status_code INTEGER NOT NULL, "
+                "headers TEXT NOT NULL, body BLOB NOT NULL, created_at REAL NOT NULL, "
+                "expires_at REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)"
+            )
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        """Return the response stored under key, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT request_hash, status_code, headers, body FROM responses "
+                "WHERE key = ? AND status_code > 0 AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return StoredResponse(row[0], row[1], json.loads(row[2]), bytes(row[3]))
+
+    def begin(self, key: str, request_hash: str) -> Optional[StoredResponse]:
+        """Claim key for a new request (atomic across worker processes).
+
+        Returns:
+            None if the caller now owns key (an in-progress placeholder is
+            kept until put or release), else the entry already under key:
+            a stored response or another request's placeholder
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT request_hash, status_code, headers, body FROM responses "
+                    "WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, now)
+                ).fetchone()
+                if row is None:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, 0, '{}', x'', ?, ?)",
+                        (key, request_hash, now, now + _PENDING_TTL_S)
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            if row is None:
+                self.misses += 1
+                return None
+            stored = StoredResponse(row[0], row[1], json.loads(row[2]), bytes(row[3]))
+            if not stored.in_progress:
+                self.hits += 1
+            return stored
+
+    def put(self, key: str, response: StoredResponse):
+        """Store a response (replacing any previous one under key)."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, response.request_hash, response.status_code,
+                 json.dumps(response.headers), response.body, now, expires_at)
+            )
+            self._writes += 1
+            if self._writes % self._PRUNE_INTERVAL == 0:
+                self._prune(connection, now)
+
+    def release(self, key: str):
+        """Drop the in-progress placeholder under key (the request failed)."""
+        with self._lock:
+            self._connect().execute(
+                "DELETE FROM responses WHERE key = ? AND status_code = 0", (key,)
+            )
+
+    def _prune(self, connection: sqlite3.Connection, now: float):
+        connection.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                           (now,))
+        connection.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+            "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        """Remove all stored responses."""
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        """Return store configuration and counters."""
+        with self._lock:
+            size = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "store": self.kind,
+                "path": str(self.path),
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def create_idempotency_store():
+    """Build the store selected by settings.idempotency_store (None = disabled)."""
+    if settings.idempotency_store == "sqlite":
+        return SQLiteIdempotencyStore(settings.idempotency_sqlite_path,
+                                      settings.idempotency_max_entries,
+                                      settings.idempotency_ttl_seconds)
+    if settings.idempotency_store == "memory":
+        return MemoryIdempotencyStore(settings.idempotency_max_entries,
+                                      settings.idempotency_ttl_seconds)
+    return None
+
+
+# Singleton instance
+idempotency_store = create_idempotency_store()
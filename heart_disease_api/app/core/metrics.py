@@ -0,0 +1,346 @@
+"""Prometheus-style metrics.
+
+A small dependency-free registry (counters, gauges, histograms) rendered
+in the Prometheus text exposition format at GET /metrics, plus an ASGI
+middleware that counts requests per route and measures latency.
+
+Recording a value costs a dict lookup, a lock and (for histograms) a
+bisect, i.e. well under a microsecond. With settings.metrics_enabled set
+to False the middleware and endpoint are not installed and the predictor
+skips its stage timings entirely.
+
+Per-request stage timings (validation, serialization) are handed between
+the middleware and the endpoint through a context variable.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from app.core.executor import inference_executor
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds: 25 us .. 10 s
+LATENCY_BUCKETS = (
+    0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    """Base class: a named metric family with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Return the child for these label values (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """Create the value holder for one label combination."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} "
+                f"{_format_value(child.value)}"]
+
+
+class _Value:
+    """Single float value guarded by a lock."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _Value()
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                    f"{self.name} {_format_value(self.callback())}"]
+        return super().render()
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count for one label combination."""
+
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _render_child(self, values, child) -> List[str]:
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} "
+                         f"{cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metric families rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "heart_api_requests_total", "HTTP requests by route, method and status code",
+    ("route", "method", "status")
+))
+REQUEST_ERRORS = registry.register(Counter(
+    "heart_api_request_errors_total", "HTTP requests answered with status >= 400",
+    ("route", "status")
+))
+REQUEST_LATENCY = registry.register(Histogram(
+    "heart_api_request_duration_seconds", "End-to-end HTTP request latency",
+    ("route",)
+))
+IN_FLIGHT = registry.register(Gauge(
+    "heart_api_requests_in_flight", "HTTP requests currently being handled"
+))
+STAGE_LATENCY = registry.register(Histogram(
+    "heart_api_stage_duration_seconds",
+    "Latency of each stage of the single prediction path",
+    ("stage", "model_version")
+))
+PREDICTIONS = registry.register(Counter(
+    "heart_api_predictions_total", "Predictions served by risk level",
+    ("route", "risk_level", "model_version")
+))
+ADMISSION_REJECTIONS = registry.register(Counter(
+    "heart_api_admission_rejections_total",
+    "Requests rejected by admission control (rate_limited = 429, overloaded = 503)",
+    ("reason",)
+))
+SHADOW_JOBS = registry.register(Counter(
+    "heart_api_shadow_jobs_total",
+    "Shadow scoring jobs by outcome (scored, dropped_load, dropped_queue_full, failed)",
+    ("outcome",)
+))
+INFERENCE_PENDING = registry.register(Gauge(
+    "heart_api_inference_pending", "Inference calls running or waiting for a pool worker",
+    callback=lambda: inference_executor.pending
+))
+MODEL_INFO = registry.register(Gauge(
+    "heart_api_model_info", "Serving model (value is always 1)",
+    ("model_version", "engine")
+))
+
+# Request timing handed from the middleware to the endpoint
+_request_timing: ContextVar[Optional[dict]] = ContextVar("request_timing", default=None)
+
+
+def observe_stages(model_version: str, stages: Dict[str, float]):
+    """Record stage latencies (seconds) of one prediction."""
+    for stage, seconds in stages.items():
+        STAGE_LATENCY.labels(stage, model_version).observe(seconds)
+
+
+def handler_started(model_version: str):
+    """Record request parsing and validation time up to the endpoint body."""
+    timing = _request_timing.get()
+    if timing is not None:
+        now = time.perf_counter()
+        STAGE_LATENCY.labels("validation", model_version).observe(now - timing["started"])
+        timing["model_version"] = model_version
+
+
+def handler_finished():
+    """Mark the end of the endpoint body (serialization is timed from here)."""
+    timing = _request_timing.get()
+    if timing is not None:
+        timing["handler_finished"] = time.perf_counter()
+
+
+def set_model_info(model_version: str, engine: str):
+    """Expose the serving model version (replacing any previous one)."""
+    with MODEL_INFO._lock:
+        MODEL_INFO._children.clear()
+    MODEL_INFO.labels(model_version, engine).set(1)
+
+
+# Router prefix per matched route (routes included with a prefix only know
+# their own path), found once by matching the route against path suffixes
+_route_prefixes: Dict[int, str] = {}
+
+
+def _route_template(scope) -> str:
+    """Route template of a handled request, e.g. /api/predict, or "unmatched"."""
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    prefix = _route_prefixes.get(id(route))
+    if prefix is None:
+        path = scope["path"]
+        prefix = ""
+        regex = getattr(route, "path_regex", None)
+        if regex is not None and not regex.match(path):
+            for i in range(1, len(path)):
+                if path[i] == "/" and regex.match(path[i:]):
+                    prefix = path[:i]
+                    break
+        _route_prefixes[id(route)] = prefix
+    return prefix + path_format
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing HTTP requests per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timing = {"started": started}
+        token = _request_timing.set(timing)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                finished = timing.get("handler_finished")
+                if finished is not None:
+                    STAGE_LATENCY.labels(
+                        "serialization", timing["model_version"]
+                    ).observe(time.perf_counter() - finished)
+            await send(message)
+
+        IN_FLIGHT.labels().inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.labels().dec()
+            _request_timing.reset(token)
+            # Route template (not the raw path) keeps label cardinality bounded
+            route = _route_template(scope)
+            status = str(status_code)
+            REQUESTS.labels(route, scope["method"], status).inc()
+            if status_code >= 400:
+                REQUEST_ERRORS.labels(route, status).inc()
+            REQUEST_LATENCY.labels(route).observe(time.perf_counter() - started)
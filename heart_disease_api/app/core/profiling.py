@@ -0,0 +1,378 @@
+"""On-demand profiling of a live worker (served by the admin API).
+
+- CPU: a background thread samples the Python stack of every other thread
+  at a fixed interval for a bounded time. The result is returned as
+  collapsed stacks (one "frame;frame;frame count" line per stack, for
+  flamegraph.pl or speedscope) or as a pstats file (python -m pstats,
+  snakeviz) whose times are estimated from sample counts.
+- Memory: tracemalloc snapshots taken before and after a run of synthetic
+  HeartDiseasePredictor.predict calls (and optionally a window of live
+  traffic), compared by line or traceback.
+- Slow requests: with SLOW_REQUEST_THRESHOLD_MS set, SlowRequestMiddleware
+  keeps the per-stage timings and the feature vector of every request
+  over the threshold in a bounded in-memory log.
+
+Profiles only run while an admin request asks for one, and the slow
+request middleware is installed only when a threshold is set, so nothing
+here costs anything otherwise.
+"""
+
+import copy
+import gc
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.utils.preprocessing import FEATURE_ORDER
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+# Leaf frames of threads that are waiting, not working (excluded by default)
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+}
+
+# Switch interval while other threads' frames are walked (seconds)
+_WALK_SWITCH_INTERVAL_S = 1.0
+
+_profile_lock = threading.Lock()
+
+
+def _frame_label(filename: str, lineno: int, name: str) -> str:
+    """Readable frame name: function (parent/file.py:line)."""
+    parent, base = os.path.split(filename)
+    return f"{name} ({os.path.basename(parent)}/{base}:{lineno})"
+
+
+def sample_stacks(seconds: float, interval_s: float, include_idle: bool = False) -> dict:
+    """Sample the stacks of all other threads of this process.
+
+    Args:
+        seconds: Sampling duration
+        interval_s: Time between samples
+        include_idle: Keep samples of threads waiting for work
+
+    Returns:
+        Dict with "stacks" (Counter of (thread name, frames root first)),
+        "samples" (sampling rounds) and "interval_s" (measured interval)
+
+    Raises:
+        ProfilerBusyError: If another profile is running
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Another profile is running")
+    try:
+        own = threading.get_ident()
+        stacks = Counter()
+        rounds = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            # Keep the other threads from running while their frames are
+            # walked, so no frame is released mid-walk
+            switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(_WALK_SWITCH_INTERVAL_S)
+            try:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    code = frame.f_code
+                    if (not include_idle and
+                            (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES):
+                        continue
+                    frames = []
+                    while frame is not None:
+                        code = frame.f_code
+                        frames.append((code.co_filename, code.co_firstlineno, code.co_name))
+                        frame = frame.f_back
+                    frames.reverse()
+                    stacks[(names.get(ident, str(ident)), tuple(frames))] += 1
+            finally:
+                sys.setswitchinterval(switch_interval)
+            rounds += 1
+            time.sleep(interval_s)
+        elapsed = time.perf_counter() - started
+    finally:
+        _profile_lock.release()
+    return {"stacks": stacks, "samples": rounds,
+            "interval_s": elapsed / rounds if rounds else interval_s}
+
+
+def collapsed_stacks(profile: dict) -> str:
+    """Render sampled stacks in the collapsed format ("a;b;c 12" per line)."""
+    lines = []
+    for (thread, frames), count in profile["stacks"].most_common():
+        labels = [thread] + [_frame_label(*frame).replace(";", ":") for frame in frames]
+        lines.append(f"{';'.join(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def pstats_dump(profile: dict) -> bytes:
+    """Convert sampled stacks to the marshal format read by pstats.Stats.
+
+    Call counts are sample counts; tottime and cumtime are samples times
+    the measured sampling interval.
+    """
+    interval = profile["interval_s"]
+    # function -> [cc, nc, tt, ct, callers]
+    entries: Dict[tuple, list] = {}
+    for (_, frames), count in profile["stacks"].items():
+        seconds = count * interval
+        seen = set()
+        for depth, function in enumerate(frames):
+            entry = entries.setdefault(function, [0, 0, 0.0, 0.0, {}])
+            if function not in seen:
+                seen.add(function)
+                entry[0] += count
+                entry[1] += count
+                entry[3] += seconds
+            if depth > 0:
+                caller = frames[depth - 1]
+                nc, cc, tt, ct = entry[4].get(caller, (0, 0, 0.0, 0.0))
+                leaf = depth == len(frames) - 1
+                entry[4][caller] = (nc + count, cc + count,
+                                    tt + (seconds if leaf else 0.0), ct + seconds)
+        if frames:
+            entries[frames[-1]][2] += seconds
+    return marshal.dumps({function: (cc, nc, tt, ct, callers)
+                          for function, (cc, nc, tt, ct, callers) in entries.items()})
+
+
+def memory_diff(predictor, predictions: int, seconds: float = 0.0, top: int = 25,
+                group_by: str = "lineno", scope: str = "predict") -> dict:
+    """Allocation growth over synthetic predictions (and live traffic).
+
+    Takes a tracemalloc snapshot, runs `predictions` calls of
+    HeartDiseasePredictor.predict on synthetic inputs, waits `seconds`
+    while live traffic continues, then takes a second snapshot. Tracing
+    is started for the measurement and stopped afterwards, unless it was
+    already on.
+
+    Args:
+        predictor: Serving predictor (a shallow copy makes the calls, so
+            they are not counted in the stage metrics)
+        predictions: Synthetic predict calls between the snapshots
+        seconds: Extra time between the snapshots for live traffic
+        top: Number of entries returned
+        group_by: "lineno", "filename" or "traceback"
+        scope: "predict" keeps allocations made below predictor.py,
+            "all" keeps everything
+
+    Returns:
+        Dict with totals and the top entries by size growth
+
+    Raises:
+        ProfilerBusyError: If another profile is running
+    """
+    from app.models import predictor as predictor_module
+    from app.models.manager import synthetic_inputs
+
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Another profile is running")
+    started_here = not tracemalloc.is_tracing()
+    try:
+        caller = copy.copy(predictor)
+        caller.record_metrics = caller.record_stages = False
+        inputs = synthetic_inputs(max(1, predictions))
+        if started_here:
+            tracemalloc.start(25)
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        for data in inputs[:predictions]:
+            caller.predict(data)
+        if seconds > 0:
+            time.sleep(seconds)
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        traced, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _profile_lock.release()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    if scope == "predict":
+        filters.append(tracemalloc.Filter(True, predictor_module.__file__, all_frames=True))
+    differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), group_by)
+    growth = sum(difference.size_diff for difference in differences)
+    return {
+        "predictions": predictions,
+        "seconds": round(elapsed, 3),
+        "scope": scope,
+        "group_by": group_by,
+        "size_diff_bytes": growth,
+        "size_diff_per_prediction_bytes": round(growth / predictions, 1) if predictions else None,
+        "traced_bytes": traced,
+        "peak_traced_bytes": peak,
+        "top": [
+            {
+                "location": [f"{frame.filename}:{frame.lineno}" for frame in difference.traceback]
+                if group_by == "traceback" else
+                f"{difference.traceback[0].filename}:{difference.traceback[0].lineno}",
+                "size_diff_bytes": difference.size_diff,
+                "count_diff": difference.count_diff,
+                "size_bytes": difference.size,
+                "count": difference.count
+            }
+            for difference in differences[:top]
+        ]
+    }
+
+
+# Timings of the request being handled (set by SlowRequestMiddleware)
+_current_request: ContextVar[Optional[dict]] = ContextVar("slow_request", default=None)
+
+
+def mark(stage: str) -> None:
+    """Charge the time since the previous mark to a stage of the current request.
+
+    Stages marked in order partition the request's wall time; marking a
+    stage again adds to it. No-op outside SlowRequestMiddleware.
+    """
+    entry = _current_request.get()
+    if entry is not None:
+        now = time.perf_counter()
+        stages = entry["stages"]
+        stages[stage] = stages.get(stage, 0.0) + now - entry["last"]
+        entry["last"] = now
+
+
+def note_features(features) -> None:
+    """Attach the validated feature vector to the current request's slow log entry."""
+    entry = _current_request.get()
+    if entry is not None:
+        entry["features"] = dict(zip(FEATURE_ORDER, features.tolist()))
+
+
+def note_rows(rows: int) -> None:
+    """Attach the row count of a batch to the current request's slow log entry."""
+    entry = _current_request.get()
+    if entry is not None:
+        entry["rows"] = rows
+
+
+def record_stages(stages: Dict[str, float]) -> None:
+    """Attach predictor stage timings (seconds) to the current request's slow log entry.
+
+    Reached from inference threads in thread executor mode (the executor
+    copies the request context to the thread) and from the request itself
+    in process mode (timings come back with the result); micro-batched
+    requests have no per-request model stages.
+    """
+    entry = _current_request.get()
+    if entry is not None:
+        entry["model_stages"] = stages
+
+
+class SlowRequestLog:
+    """Bounded log of the most recent requests over the latency threshold."""
+
+    def __init__(self, threshold_ms: float, max_entries: int):
+        """Initialize the log.
+
+        Args:
+            threshold_ms: Requests at least this slow are kept (0 = off)
+            max_entries: Entries kept (oldest dropped first)
+        """
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=max(1, max_entries))
+        self._lock = threading.Lock()
+        self.logged = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def add(self, entry: dict):
+        with self._lock:
+            self._entries.append(entry)
+            self.logged += 1
+        stages = ", ".join(f"{name} {ms:.2f}" for name, ms in entry["stages_ms"].items())
+        print(f"🐢 Slow request: {entry['method']} {entry['path']} -> {entry['status']} "
+              f"in {entry['total_ms']:.1f} ms ({stages or 'no stages'})")
+
+    def entries(self) -> List[dict]:
+        """Logged requests, most recent first."""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"threshold_ms": self.threshold_ms, "max_entries": self._entries.maxlen,
+                    "size": len(self._entries), "logged": self.logged}
+
+
+class SlowRequestMiddleware:
+    """ASGI middleware timing every request and logging those over the threshold."""
+
+    def __init__(self, app):
+        self.app = app
+        self.excluded = f"{settings.api_prefix}/admin/"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.excluded):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        entry = {"started": started, "last": started, "stages": {}}
+        token = _current_request.set(entry)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            now = time.perf_counter()
+            total = now - started
+            if total * 1000.0 >= slow_request_log.threshold_ms:
+                stages = entry["stages"]
+                if now > entry["last"] and stages:
+                    stages["response"] = stages.get("response", 0.0) + now - entry["last"]
+                slow_request_log.add({
+                    "time": time.time(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "total_ms": round(total * 1000.0, 3),
+                    "stages_ms": {name: round(seconds * 1000.0, 3)
+                                  for name, seconds in stages.items()},
+                    "model_stages_ms": {name: round(seconds * 1000.0, 3)
+                                        for name, seconds in entry.get("model_stages", {}).items()},
+                    "features": entry.get("features"),
+                    "rows": entry.get("rows"),
+                    "worker_pid": os.getpid()
+                })
+
+
+# Singleton instance
+slow_request_log = SlowRequestLog(
+    threshold_ms=settings.slow_request_threshold_ms,
+    max_entries=settings.slow_request_log_size
+)
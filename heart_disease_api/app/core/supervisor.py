@@ -0,0 +1,350 @@
+"""Multi-worker production server (python run.py --production).
+
+The supervisor binds the listening socket, loads the artifacts once and
+then forks the uvicorn workers, so every worker shares the unpickled
+model and scaler copy-on-write instead of loading its own copy
+(uvicorn's own --workers spawns fresh interpreters). Each worker still
+builds its own HeartDiseasePredictor at startup: compiled arrays, a
+compact KNN matrix and the loaded lookup table or neighbor index are
+per worker (the exported artifacts, lookup table and index files are
+memory-mapped, so their pages are shared through the page cache). It
+then:
+
+- caps BLAS/OpenMP threads per worker, so N workers do not start N x
+  cores threads
+- optionally pins worker i to one CPU
+- restarts workers that crash
+- on SIGHUP, reloads the artifacts and replaces the workers one
+  generation at a time: new workers are started and ready before the old
+  ones are asked to drain their in-flight requests and exit
+- on SIGTERM / SIGINT, drains all workers and exits
+
+Requires os.fork (Linux, macOS). Nothing here imports NumPy at module
+level: BLAS thread limits only apply if set before NumPy is imported.
+"""
+
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Environment variables read by the BLAS / OpenMP runtimes NumPy and
+# scikit-learn may load
+BLAS_THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+# A worker that exits sooner than this after starting counts as a crash loop
+_MIN_WORKER_LIFETIME_S = 1.0
+
+
+def limit_blas_threads(threads: int):
+    """Cap BLAS/OpenMP threads for this process and its children.
+
+    Sets the runtimes' environment variables (effective for libraries not
+    loaded yet) and, if threadpoolctl is installed, also limits runtimes
+    that are already loaded.
+
+    Args:
+        threads: Threads per process (0 = leave the library defaults)
+    """
+    if threads <= 0:
+        return
+    for variable in BLAS_THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+
+def _worker_cpus(count: int) -> List[Optional[int]]:
+    """CPU for each worker index (None = not pinned)."""
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * count
+    cpus = sorted(os.sched_getaffinity(0))
+    return [cpus[i % len(cpus)] for i in range(count)]
+
+
+class _Worker:
+    """Supervisor-side record of one worker process."""
+
+    def __init__(self, index: int, pid: int, ready_fd: int, generation: int):
+        self.index = index
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.generation = generation
+        self.started = time.monotonic()
+        self.ready = False
+        self.retiring = False
+
+
+class Supervisor:
+    """Pre-forking supervisor for uvicorn workers."""
+
+    def __init__(self, host: str, port: int, workers: int, cpu_affinity: bool,
+                 blas_threads: int, preload: bool, graceful_timeout: float):
+        """Configure the supervisor.
+
+        Args:
+            host: Address to bind
+            port: Port to bind
+            workers: Worker processes (0 = one per CPU)
+            cpu_affinity: Pin each worker to one CPU (Linux only)
+            blas_threads: BLAS/OpenMP threads per worker (0 = library default)
+            preload: Load the artifacts before forking the workers
+            graceful_timeout: Seconds workers get to finish in-flight requests
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.cpu_affinity = cpu_affinity and hasattr(os, "sched_setaffinity")
+        self.blas_threads = blas_threads
+        self.preload = preload
+        self.graceful_timeout = graceful_timeout
+        self._cpus = _worker_cpus(self.workers)
+        self._socket: Optional[socket.socket] = None
+        self._app = None
+        self._children: Dict[int, _Worker] = {}
+        self._crashed: List[_Worker] = []  # Reaped while waiting for new workers
+        self._generation = 0
+        self._stopping = False
+        self._restart_requested = False
+
+    # ------------------------------------------------------------------
+    # Supervisor side
+    # ------------------------------------------------------------------
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _load_app(self):
+        """Import the app and (optionally) load the artifacts, before forking."""
+        started = time.perf_counter()
+        from app.main import app
+        from app.models import ml_model
+        if self.preload:
+            # Reload so a restart picks up new artifact files
+            if self._app is None:
+                ml_model.get_model()
+            else:
+                ml_model.reload_artifacts()
+        self._app = app
+        print(f"✓ {'Preloaded' if self.preload else 'Imported'} app "
+              f"in {time.perf_counter() - started:.2f}s")
+
+    def _spawn(self, index: int) -> _Worker:
+        """Fork one worker for slot `index`."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 1
+            try:
+                self._run_worker(index, write_fd)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException as e:
+                print(f"✗ Worker {index} failed: {e}", file=sys.stderr)
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        worker = _Worker(index, pid, read_fd, self._generation)
+        self._children[pid] = worker
+        cpu = self._cpus[index]
+        pinned = f" on CPU {cpu}" if self.cpu_affinity and cpu is not None else ""
+        print(f"✓ Worker {index} started (pid {pid}{pinned})")
+        return worker
+
+    def _wait_ready(self, workers: List[_Worker], timeout: float) -> bool:
+        """Wait until the workers finished their startup; False on failure."""
+        deadline = time.monotonic() + timeout
+        waiting = {worker.pid for worker in workers}
+        pending = {worker.ready_fd: worker for worker in workers if not worker.ready}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select(list(pending), [], [], min(remaining, 0.5))
+            for fd in readable:
+                worker = pending.pop(fd)
+                if os.read(fd, 1) != b"1":
+                    return False  # Worker exited before becoming ready
+                worker.ready = True
+                os.close(fd)
+            # Other workers that crash meanwhile are respawned by the supervise loop
+            self._crashed.extend(worker for worker in self._reap() if worker.pid not in waiting)
+            if any(worker.pid not in self._children for worker in pending.values()):
+                return False
+        return True
+
+    def _signal_workers(self, workers: List[_Worker], sig: int):
+        for worker in workers:
+            worker.retiring = True
+            try:
+                os.kill(worker.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self) -> List[_Worker]:
+        """Collect exited workers; returns the ones that exited unexpectedly."""
+        crashed = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            worker = self._children.pop(pid, None)
+            if worker is None:
+                continue
+            if not worker.ready:
+                try:
+                    os.close(worker.ready_fd)
+                except OSError:
+                    pass
+            if not worker.retiring and not self._stopping:
+                print(f"✗ Worker {worker.index} (pid {pid}) exited unexpectedly "
+                      f"(status {status})")
+                crashed.append(worker)
+        return crashed
+
+    def _restart(self):
+        """Replace all workers without dropping requests."""
+        print("🔄 Graceful restart: loading artifacts...")
+        try:
+            self._load_app()
+        except Exception as e:
+            print(f"✗ Restart aborted, keeping the current workers: {e}")
+            return
+
+        old = list(self._children.values())
+        self._generation += 1
+        new = [self._spawn(index) for index in range(self.workers)]
+        if not self._wait_ready(new, timeout=self.graceful_timeout + 60):
+            print("✗ New workers failed to start, keeping the current workers")
+            self._signal_workers([worker for worker in new if worker.pid in self._children],
+                                 signal.SIGTERM)
+            return
+        self._signal_workers(old, signal.SIGTERM)
+        print(f"✓ Graceful restart complete: generation {self._generation}, "
+              f"{len(old)} old worker(s) draining")
+
+    def _respawn_crashed(self):
+        """Replace crashed workers, unless a newer worker already serves their slot."""
+        crashed, self._crashed = self._crashed + self._reap(), []
+        for worker in crashed:
+            if any(child.index == worker.index and not child.retiring
+                   for child in self._children.values()):
+                continue  # Replaced by a graceful restart
+            if time.monotonic() - worker.started < _MIN_WORKER_LIFETIME_S:
+                time.sleep(_MIN_WORKER_LIFETIME_S)  # Avoid a tight crash loop
+            self._spawn(worker.index)
+
+    def _stop(self):
+        """Drain all workers, then kill whatever is left after the timeout."""
+        print("\n👋 Stopping workers...")
+        self._signal_workers(list(self._children.values()), signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        self._signal_workers(list(self._children.values()), signal.SIGKILL)
+        self._reap()
+
+    def run(self) -> int:
+        """Start the workers and supervise them until stopped.
+
+        Returns:
+            Process exit code
+        """
+        if not hasattr(os, "fork"):
+            print("✗ Production mode needs os.fork; use `uvicorn app.main:app --workers N`")
+            return 1
+
+        # Step 1: Limit BLAS threads before NumPy is imported, bind, preload
+        limit_blas_threads(self.blas_threads)
+        self._socket = self._bind()
+        self._load_app()
+
+        def request_stop(sig, frame):
+            self._stopping = True
+
+        def request_restart(sig, frame):
+            self._restart_requested = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, request_restart)
+
+        # Step 2: Start the first generation and wait until it serves
+        print(f"Starting {self.workers} worker(s) on {self.host}:{self.port} "
+              f"(BLAS threads: {self.blas_threads or 'default'}, "
+              f"CPU affinity: {'on' if self.cpu_affinity else 'off'})")
+        workers = [self._spawn(index) for index in range(self.workers)]
+        if not self._wait_ready(workers, timeout=self.graceful_timeout + 60):
+            print("✗ Workers failed to start")
+            self._stopping = True
+            self._stop()
+            return 1
+        print(f"✓ All {self.workers} worker(s) ready (pid {os.getpid()}); "
+              f"SIGHUP = graceful restart, SIGTERM = stop")
+
+        # Step 3: Supervise
+        try:
+            while not self._stopping:
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self._restart()
+                self._respawn_crashed()
+                time.sleep(0.2)
+        finally:
+            self._stop()
+            self._socket.close()
+        return 0
+
+    # ------------------------------------------------------------------
+    # Worker side (runs in the forked child)
+    # ------------------------------------------------------------------
+
+    def _run_worker(self, index: int, ready_fd: int):
+        """Configure the forked process and serve until told to stop."""
+        import uvicorn
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        cpu = self._cpus[index]
+        if self.cpu_affinity and cpu is not None:
+            os.sched_setaffinity(0, {cpu})
+        limit_blas_threads(self.blas_threads)
+
+        class WorkerServer(uvicorn.Server):
+            async def startup(self, sockets=None):
+                await super().startup(sockets=sockets)
+                # Tell the supervisor this worker has finished its startup
+                if self.started:
+                    os.write(ready_fd, b"1")
+                    os.close(ready_fd)
+
+        config = uvicorn.Config(self._app, timeout_graceful_shutdown=self.graceful_timeout)
+        WorkerServer(config).run(sockets=[self._socket])
@@ -0,0 +1,184 @@
+"""Slim scoring engine: the API's exact scoring logic with NumPy alone.
+
+For batch jobs and pandas/Spark UDFs that score rows in their own
+process. Importing this module pulls in NumPy and the compiled engine
+(app.models.compiled, app.models.exported), but not FastAPI, pydantic,
+joblib or sklearn, so it starts fast and stays small in every worker.
+
+It loads the pickle-free exported artifacts (python -m app.export);
+predictions are bit-for-bit those of the API's compiled engine (see
+app.models.compiled for how that compares to sklearn). Inputs are not range-checked the way the API validates
+requests.
+
+Usage:
+    from app.engine import ScoringEngine
+
+    engine = ScoringEngine.load()               # artifacts/exported/
+    proba = engine.predict_proba(df)            # DataFrame with FEATURE_ORDER columns
+    labels = engine.predict(matrix)             # float array of shape (n, 13)
+    risk = risk_levels(proba[:, 1])             # "Low" / "Medium" / "High"
+
+Keep this module free of pydantic, FastAPI and sklearn imports;
+test_predictor.py checks that it stays that way.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from app.models.exported import load_exported
+
+
+# CRITICAL: Feature order MUST match the training data order
+# Do NOT change this order or predictions will be incorrect
+FEATURE_ORDER = [
+    'age',
+    'sex',
+    'cp',
+    'trestbps',
+    'chol',
+    'fbs',
+    'restecg',
+    'thalach',
+    'exang',
+    'oldpeak',
+    'slope',
+    'ca',
+    'thal'
+]
+
+# Risk level thresholds on the probability of heart disease
+HIGH_RISK_THRESHOLD = 0.7
+MEDIUM_RISK_THRESHOLD = 0.4
+RISK_LEVELS = ("Low", "Medium", "High")  # Indexed by risk code
+
+# Same default as settings.exported_artifacts_dir (without importing the settings)
+DEFAULT_EXPORTED_DIR = Path(__file__).parent.parent / "artifacts" / "exported"
+
+
+def risk_codes(probabilities) -> np.ndarray:
+    """Vectorized risk codes: 0 Low, 1 Medium, 2 High (indexes into RISK_LEVELS).
+
+    Same thresholds as HeartDiseasePredictor._get_risk_level.
+
+    Args:
+        probabilities: Probabilities of heart disease, any shape
+
+    Returns:
+        int8 array with the same shape
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    return ((probabilities >= MEDIUM_RISK_THRESHOLD).astype(np.int8)
+            + (probabilities >= HIGH_RISK_THRESHOLD))
+
+
+def risk_levels(probabilities) -> np.ndarray:
+    """Vectorized risk levels, same thresholds as HeartDiseasePredictor._get_risk_level.
+
+    Args:
+        probabilities: Probabilities of heart disease, any shape
+
+    Returns:
+        Array of "Low", "Medium" or "High" with the same shape
+    """
+    return np.asarray(RISK_LEVELS).take(risk_codes(probabilities))
+
+
+def as_feature_matrix(features) -> np.ndarray:
+    """Raw float64 feature matrix from a NumPy array or pandas DataFrame.
+
+    Args:
+        features: Array of shape (n, 13) or (13,) in FEATURE_ORDER, or a
+            DataFrame with (at least) the FEATURE_ORDER columns, selected
+            by name
+
+    Returns:
+        float64 array of shape (n, 13)
+
+    Raises:
+        ValueError: If columns are missing or the shape is wrong
+    """
+    if hasattr(features, "columns"):
+        missing = [feature for feature in FEATURE_ORDER if feature not in features.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+        features = features[FEATURE_ORDER].to_numpy(dtype=np.float64)
+    matrix = np.asarray(features, dtype=np.float64)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.ndim != 2 or matrix.shape[1] != len(FEATURE_ORDER):
+        raise ValueError(
+            f"Expected shape (n, {len(FEATURE_ORDER)}) in FEATURE_ORDER, got {matrix.shape}"
+        )
+    return matrix
+
+
+class ScoringEngine:
+    """Exported scaler and model behind a NumPy-only predict API."""
+
+    def __init__(self, model, scaler, fingerprint: str, chunk_size: int = 4096):
+        """Initialize the engine.
+
+        Args:
+            model: Compiled model (app.models.compiled)
+            scaler: Compiled scaler
+            fingerprint: Fingerprint of the source artifacts
+            chunk_size: Rows per scaler/model call (bounds KNN distance
+                matrices, like settings.batch_chunk_size)
+        """
+        self.model = model
+        self.scaler = scaler
+        self.fingerprint = fingerprint
+        self.version = fingerprint[:12]
+        self.classes_ = model.classes_
+        self.chunk_size = max(1, chunk_size)
+
+    @classmethod
+    def load(cls, directory: Optional[Path] = None, mmap: bool = True,
+             chunk_size: int = 4096) -> "ScoringEngine":
+        """Load exported artifacts.
+
+        Args:
+            directory: Export directory (default: $EXPORTED_ARTIFACTS_DIR,
+                else artifacts/exported/)
+            mmap: Memory-map the arrays, shared by every process on the host
+            chunk_size: Rows per scaler/model call
+
+        Raises:
+            FileNotFoundError: If there is no export (run python -m app.export)
+            ValueError: If the export format is not supported
+        """
+        if directory is None:
+            directory = os.environ.get("EXPORTED_ARTIFACTS_DIR") or DEFAULT_EXPORTED_DIR
+        model, scaler, fingerprint = load_exported(Path(directory), mmap=mmap)
+        return cls(model, scaler, fingerprint, chunk_size)
+
+    def predict_proba(self, features) -> np.ndarray:
+        """Class probabilities, shape (n, n_classes) ordered like classes_.
+
+        Args:
+            features: Raw (unscaled) rows, see as_feature_matrix
+        """
+        X = as_feature_matrix(features)
+        if X.shape[0] <= self.chunk_size:
+            return self.model.predict_proba(self.scaler.transform(X))
+        return np.concatenate([
+            self.model.predict_proba(self.scaler.transform(X[start:start + self.chunk_size]))
+            for start in range(0, X.shape[0], self.chunk_size)
+        ])
+
+    def predict(self, features) -> np.ndarray:
+        """Class labels (argmax of predict_proba, as the API's single-pass inference)."""
+        return self.classes_.take(np.argmax(self.predict_proba(features), axis=1))
+
+    def score(self, features):
+        """Predictions, positive-class probabilities and risk levels.
+
+        Returns:
+            Tuple of (predictions, probabilities, risk_levels), each of
+            shape (n,): bool, float64 (unrounded) and str
+        """
+        proba = self.predict_proba(features)
+        labels = self.classes_.take(np.argmax(proba, axis=1))
+        probabilities = proba[:, 1]
+        return labels == 1, probabilities, risk_levels(probabilities)
@@ -0,0 +1,133 @@
+"""Export artifacts to the pickle-free, memory-mappable format.
+
+Usage:
+    python -m app.export                         # write artifacts/exported/
+    python -m app.export --out /srv/model/v2     # custom directory
+    python -m app.export --benchmark --workers 4 # compare joblib vs exported
+
+Serve the export with ARTIFACT_FORMAT=exported (joblib remains the
+fallback if the export is missing or stale).
+
+The benchmark starts worker processes for each format and reports
+time-to-first-prediction and memory per worker. On Linux, private memory
+(RssAnon) is reported separately from file-backed memory (RssFile), which
+memory-mapped arrays share through the page cache.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def _memory_kb() -> dict:
+    """Resident memory of this process in kB (Linux /proc, else ru_maxrss)."""
+    fields = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile"):
+                    fields[key] = int(value.split()[0])
+    except OSError:
+        import resource
+        fields["VmRSS"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return fields
+
+
+def probe() -> dict:
+    """Load artifacts and make one prediction; report timings and memory."""
+    started = time.perf_counter()
+    from app.models.predictor import HeartDiseasePredictor
+    from app.schemas.heart import HeartDiseaseInput
+    loaded = time.perf_counter()
+
+    predictor = HeartDiseasePredictor()
+    predictor.predict(HeartDiseaseInput.model_validate(
+        HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+    ))
+    first_prediction = time.perf_counter()
+
+    return {
+        "engine": predictor.engine,
+        "load_s": round(loaded - started, 4),
+        "time_to_first_prediction_s": round(first_prediction - started, 4),
+        **_memory_kb()
+    }
+
+
+def benchmark(workers: int, out: Path) -> dict:
+    """Run probe workers for each artifact format and summarize."""
+    results = {}
+    for artifact_format in ("joblib", "exported"):
+        env = {**os.environ, "ARTIFACT_FORMAT": artifact_format,
+               "EXPORTED_ARTIFACTS_DIR": str(out)}
+        started = time.perf_counter()
+        processes = [
+            subprocess.Popen([sys.executable, "-m", "app.export", "--probe"], env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            for _ in range(workers)
+        ]
+        probes = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in processes]
+        wall = time.perf_counter() - started
+
+        def mean(key):
+            values = [p[key] for p in probes if key in p]
+            return round(sum(values) / len(values), 4) if values else None
+
+        results[artifact_format] = {
+            "workers": workers,
+            "engine": probes[0]["engine"],
+            "mean_time_to_first_prediction_s": mean("time_to_first_prediction_s"),
+            "mean_load_s": mean("load_s"),
+            "mean_rss_kb": mean("VmRSS"),
+            "mean_private_rss_kb": mean("RssAnon"),
+            "mean_file_rss_kb": mean("RssFile"),
+            "wall_s": round(wall, 4)
+        }
+    return results
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Export model artifacts without pickle")
+    parser.add_argument("--out", type=Path, default=None, help="Output directory")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare joblib and exported loading (exports first)")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes per format")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        print(json.dumps(probe()))
+        return 0
+
+    # Always export from the .pkl files
+    os.environ["ARTIFACT_FORMAT"] = "joblib"
+    from app.core.config import settings
+    settings.artifact_format = "joblib"
+    from app.models import ml_model
+    from app.models.exported import export_artifacts
+
+    out = args.out or settings.exported_artifacts_dir
+    try:
+        manifest = export_artifacts(
+            ml_model.get_model(), ml_model.get_scaler(), out, ml_model.get_fingerprint()
+        )
+    except ValueError as e:
+        print(f"✗ Cannot export these artifacts: {e}")
+        return 1
+
+    size = sum(path.stat().st_size for path in Path(out).iterdir())
+    print(f"✓ Exported {manifest['source_model']} to {out} ({size / 1e3:.1f} kB)")
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.workers, Path(out)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
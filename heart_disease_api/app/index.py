@@ -0,0 +1,63 @@
+"""Build a neighbor index for a KNN model.
+
+Builds the index over the loaded KNN model's scaled training matrix and
+writes it next to the artifacts; serve it with NEIGHBOR_INDEX_ENABLED=true
+(see app.models.neighbors for the index kinds).
+
+Usage:
+    python -m app.index                           # exact KD-tree
+    python -m app.index --kind ball_tree
+    python -m app.index --kind ivf --n-lists 2048 # approximate
+    python -m app.index --kind ivf --out /srv/model/v2/neighbors
+
+The ivf index scans NEIGHBOR_INDEX_N_PROBE lists per query at serving
+time; `python -m benchmarks neighbors` measures recall and latency for a
+range of values.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from app.core.config import settings
+from app.models.neighbors import INDEX_KINDS, build_index, save_index
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Build a neighbor index for a KNN model")
+    parser.add_argument("--kind", choices=INDEX_KINDS, default="kd_tree", help="Index type")
+    parser.add_argument("--out", type=Path, default=settings.neighbor_index_dir,
+                        help="Output directory")
+    parser.add_argument("--leaf-size", type=int, default=40,
+                        help="kd_tree / ball_tree: rows per leaf")
+    parser.add_argument("--n-lists", type=int, default=None,
+                        help="ivf: number of partitions (default about sqrt(rows))")
+    parser.add_argument("--iterations", type=int, default=10, help="ivf: k-means iterations")
+    parser.add_argument("--seed", type=int, default=0, help="ivf: random seed")
+    args = parser.parse_args(argv)
+
+    from app.models import ml_model
+    model = ml_model.get_model()
+    if args.kind == "ivf":
+        params = {"n_lists": args.n_lists, "iterations": args.iterations, "seed": args.seed}
+    else:
+        params = {"leaf_size": args.leaf_size}
+
+    started = time.perf_counter()
+    try:
+        index = build_index(model, args.kind, **params)
+    except ValueError as e:
+        print(f"✗ Cannot build a neighbor index: {e}")
+        return 1
+    elapsed = time.perf_counter() - started
+
+    save_index(index, args.out, ml_model.get_fingerprint(), elapsed)
+    size = sum(path.stat().st_size for path in Path(args.out).iterdir())
+    print(f"✓ Built {args.kind} index over {index.n_rows:,} rows in {elapsed:.2f}s: "
+          f"{args.out} ({size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
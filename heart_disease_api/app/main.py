@@ -4,10 +4,59 @@ Heart Disease Prediction API
 Provides ML-based predictions for heart disease risk assessment.
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from app.core import metrics
+from app.core.admission import AdmissionMiddleware
 from app.core.config import settings
-from app.api import predict, test
+from app.core.profiling import SlowRequestMiddleware
+from app.core.executor import inference_executor
+from app.api import admin, predict, test
+from app.models.manager import predictor_manager
+from app.models.registry import model_registry
+from app.models.shadow import shadow_scorer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown.
+    
+    Startup imports the inference dependencies, loads the artifacts and
+    runs warm-up predictions; the service is ready only after that.
+    """
+    print("=" * 60)
+    print(f"🚀 {settings.app_name} v{settings.version}")
+    print("=" * 60)
+    timings = await predictor_manager.startup()
+    predictor = predictor_manager.current
+    print(f"📊 Model loaded from: {settings.model_path}")
+    print(f"📐 Scaler loaded from: {settings.scaler_path}")
+    print(f"🧮 Inference engine: {predictor.engine} (model {predictor.version})")
+    if model_registry.models:
+        print(f"🧪 Model registry: {model_registry.primary_name} + "
+              f"{', '.join(model_registry.models)} "
+              f"({len(model_registry.shadows())} shadowed) from {settings.model_registry_path}")
+    print(f"⚙️  Inference executor: {settings.inference_executor} "
+          f"x{settings.inference_workers} (queue {settings.inference_max_queue})")
+    print(f"⏱️  Startup: import {timings['import']:.3f}s, load {timings['load']:.3f}s, "
+          f"warm-up {timings['warmup']:.3f}s ({settings.warmup_predictions} predictions), "
+          f"total {timings['total']:.3f}s")
+    print(f"📝 Documentation: http://localhost:8000/docs")
+    print("=" * 60)
+    
+    # Hot reload triggers: SIGHUP and (optionally) the artifact file watcher
+    predictor_manager.start()
+    
+    yield
+    
+    print("\n👋 Shutting down API...")
+    predictor_manager.ready = False
+    predictor_manager.stop()
+    inference_executor.shutdown()
+    shadow_scorer.shutdown()
+
 
 # Initialize FastAPI application
 app = FastAPI(
@@ -15,9 +64,15 @@ app = FastAPI(
     description=settings.description,
     version=settings.version,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# Per-client rate limits and the inference concurrency limit (inside CORS,
+# so 429/503 responses carry CORS headers)
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS (Cross-Origin Resource Sharing)
 # Allows Flutter app to make requests to this API
 app.add_middleware(
@@ -28,6 +83,15 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Per-stage timings of requests over the slow request threshold
+# (GET /api/admin/profile/slow-requests)
+if settings.slow_request_threshold_ms > 0:
+    app.add_middleware(SlowRequestMiddleware)
+
+# Count and time every request (GET /metrics)
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include API routers
 app.include_router(
     predict.router,
@@ -41,6 +105,12 @@ app.include_router(
     tags=["Health"]
 )
 
+app.include_router(
+    admin.router,
+    prefix=settings.api_prefix,
+    tags=["Admin"]
+)
+
 
 @app.get(
     "/",
@@ -78,21 +148,39 @@ async def health_check():
     }
 
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    """Actions to perform on application startup."""
-    print("=" * 60)
-    print(f"🚀 {settings.app_name} v{settings.version}")
-    print("=" * 60)
-    print(f"📊 Model loaded from: {settings.model_path}")
-    print(f"📐 Scaler loaded from: {settings.scaler_path}")
-    print(f"📝 Documentation: http://localhost:8000/docs")
-    print("=" * 60)
+if settings.metrics_enabled:
+    @app.get(
+        "/metrics",
+        tags=["Health"],
+        summary="Prometheus metrics",
+        description="Request counters and latency, per-stage prediction latency, "
+                    "risk level distribution and serving model version",
+        response_class=Response
+    )
+    async def metrics_endpoint():
+        """Metrics endpoint - Prometheus text exposition format."""
+        return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 
-# Shutdown event
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Actions to perform on application shutdown."""
-    print("\n👋 Shutting down API...")
+@app.get(
+    "/ready",
+    tags=["Health"],
+    summary="Readiness check",
+    description="503 until the model is loaded and warmed up; then the serving model "
+                "version and the startup-time breakdown",
+    responses={503: {"description": "Still starting up (or shutting down)"}}
+)
+async def readiness_check():
+    """Readiness endpoint - only 200 once the model can serve predictions."""
+    if not predictor_manager.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "starting", "service": settings.app_name}
+        )
+    return {
+        "status": "ready",
+        "service": settings.app_name,
+        "model_version": predictor_manager.current.version,
+        "engine": predictor_manager.current.engine,
+        "startup_timings": predictor_manager.startup_timings
+    }
@@ -0,0 +1,190 @@
+"""Materialize a prediction lookup table.
+
+Evaluates the loaded model over a grid of inputs (or over the distinct
+inputs seen in a traffic log) and writes a memory-mappable lookup table
+that the API can serve from with LOOKUP_TABLE_ENABLED=true.
+
+Usage:
+    python -m app.materialize --grid grid.json
+    python -m app.materialize --from-log traffic.ndjson --top 1000000
+    python -m app.materialize --grid grid.json --out artifacts/lookup
+
+Grid file (JSON): feature name -> list of values, or
+{"start": ..., "stop": ..., "step": ...} (stop inclusive). Features left
+out cover their full validated range, e.g.:
+    {"age": {"start": 29, "stop": 77, "step": 1},
+     "trestbps": [120, 130, 140],
+     "chol": [200, 240],
+     "thalach": {"start": 120, "stop": 180, "step": 10},
+     "oldpeak": {"start": 0, "stop": 4, "step": 0.1}}
+
+Traffic log: CSV with a header row, or NDJSON (one JSON object per line),
+with the 13 feature columns. Rows are validated like /predict/batch.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+import numpy as np
+from app.core.config import settings
+from app.models.lookup import QUANT_SIZE, QUANT_STEP, LookupTable, decode, encode, grid_values
+from app.utils.preprocessing import FEATURE_LOWER, FEATURE_ORDER, build_feature_matrix
+from app.utils.streaming import parse_number
+
+
+def load_grid(path: Path) -> list:
+    """Read a grid file into one sorted array of step indices per feature.
+
+    Raises:
+        ValueError: If a feature is unknown or a value is off the grid
+    """
+    with open(path) as f:
+        spec = json.load(f)
+
+    unknown = set(spec) - set(FEATURE_ORDER)
+    if unknown:
+        raise ValueError(f"Unknown features in grid: {sorted(unknown)}")
+
+    axes = []
+    for j, feature in enumerate(FEATURE_ORDER):
+        axis = spec.get(feature)
+        if axis is None:
+            axes.append(np.arange(QUANT_SIZE[j]))
+            continue
+        if isinstance(axis, dict):
+            count = int(round((axis["stop"] - axis["start"]) / axis["step"])) + 1
+            values = axis["start"] + np.arange(count) * axis["step"]
+        else:
+            values = np.asarray(axis, dtype=np.float64)
+
+        positions = (values - FEATURE_LOWER[j]) / QUANT_STEP[j]
+        steps = np.round(positions).astype(np.int64)
+        if (steps < 0).any() or (steps >= QUANT_SIZE[j]).any():
+            raise ValueError(f"Grid values for '{feature}' are outside the validated range")
+        # Up to float rounding (e.g. 0.1 steps built from start + i * step)
+        if np.abs(positions - steps).max() > 1e-6:
+            raise ValueError(f"Grid values for '{feature}' are not multiples of "
+                             f"{QUANT_STEP[j]:g} from {FEATURE_LOWER[j]:g}")
+        axes.append(np.unique(steps))
+    return axes
+
+
+def grid_cells(axes: list) -> int:
+    """Number of cells in the cartesian product of the axes."""
+    return int(np.prod([len(axis) for axis in axes], dtype=np.float64))
+
+
+def iter_grid(axes: list, chunk_size: int):
+    """Yield raw feature matrices covering the grid, chunk by chunk."""
+    shape = tuple(len(axis) for axis in axes)
+    total = grid_cells(axes)
+    for start in range(0, total, chunk_size):
+        flat = np.arange(start, min(start + chunk_size, total))
+        index = np.unravel_index(flat, shape)
+        chunk = np.empty((len(flat), len(FEATURE_ORDER)), dtype=np.float64)
+        for j, axis in enumerate(axes):
+            chunk[:, j] = grid_values(j, axis[index[j]])
+        yield chunk
+
+
+def read_log(path: Path) -> list:
+    """Read records from a CSV or NDJSON traffic log."""
+    with open(path, newline="") as f:
+        if path.suffix.lower() == ".csv":
+            return [
+                {key: parse_number(value) for key, value in row.items() if key in FEATURE_ORDER}
+                for row in csv.DictReader(f)
+            ]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def log_cells(path: Path, top: int) -> np.ndarray:
+    """Distinct on-grid cells from a traffic log, most frequent first."""
+    features, _, errors = build_feature_matrix(read_log(path))
+    codes, on_grid = encode(features)
+    cells, counts = np.unique(codes[on_grid], return_counts=True)
+    print(f"Log rows: {len(features) + len(errors):,} "
+          f"({len(errors):,} invalid, {int((~on_grid).sum()):,} off-grid), "
+          f"distinct cells: {len(cells):,}")
+
+    order = np.argsort(-counts, kind="stable")
+    if top:
+        order = order[:top]
+    return cells[order]
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Materialize a prediction lookup table")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--grid", type=Path, help="Grid specification (JSON)")
+    source.add_argument("--from-log", type=Path, help="Traffic log (CSV or NDJSON)")
+    parser.add_argument("--top", type=int, default=0,
+                        help="With --from-log: keep only the N most frequent cells")
+    parser.add_argument("--out", type=Path, default=settings.lookup_table_dir,
+                        help="Output directory")
+    parser.add_argument("--max-cells", type=int, default=50_000_000,
+                        help="Refuse to materialize more cells than this")
+    args = parser.parse_args(argv)
+
+    # Always evaluate the live model, never an existing table
+    settings.lookup_table_enabled = False
+    from app.models.predictor import HeartDiseasePredictor
+    predictor = HeartDiseasePredictor()
+    chunk_size = max(1, settings.batch_chunk_size)
+
+    if args.grid:
+        axes = load_grid(args.grid)
+        total = grid_cells(axes)
+        chunks = iter_grid(axes, chunk_size)
+        source_info = {"grid": str(args.grid)}
+    else:
+        cells = log_cells(args.from_log, args.top)
+        total = len(cells)
+        chunks = (decode(cells[i:i + chunk_size]) for i in range(0, total, chunk_size))
+        source_info = {"log": str(args.from_log), "top": args.top}
+
+    if total > args.max_cells:
+        print(f"✗ {total:,} cells exceeds --max-cells {args.max_cells:,}")
+        return 1
+
+    print(f"Materializing {total:,} cells...")
+    started = time.perf_counter()
+    all_codes, all_proba, all_labels = [], [], []
+    done = 0
+    last_report = started
+    for chunk in chunks:
+        predictions, probabilities = predictor.predict_batch(chunk)
+        codes, _ = encode(chunk)
+        all_codes.append(codes)
+        all_proba.append(probabilities)
+        all_labels.append(predictions.astype(np.int8))
+        done += len(chunk)
+
+        now = time.perf_counter()
+        if now - last_report >= 1.0 or done == total:
+            last_report = now
+            print(f"  {done:,}/{total:,} cells ({done / max(now - started, 1e-9):,.0f} cells/s)",
+                  file=sys.stderr)
+
+    table = LookupTable.build(
+        np.concatenate(all_codes) if all_codes else np.zeros(0, dtype=np.int64),
+        np.concatenate(all_proba) if all_proba else np.zeros(0),
+        np.concatenate(all_labels) if all_labels else np.zeros(0, dtype=np.int8),
+        meta={"fingerprint": predictor.fingerprint, "source": source_info}
+    )
+    table.save(args.out)
+
+    info = table.describe()
+    print(f"✓ Wrote {info['cells']:,} cells to {args.out} "
+          f"({info['memory_bytes'] / 1e6:.1f} MB, "
+          f"{info['domain_coverage']:.2e} of the input domain) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
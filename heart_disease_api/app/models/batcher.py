@@ -0,0 +1,166 @@
+"""Dynamic micro-batching for concurrent single predictions.
+
+Collects concurrent /predict calls for up to max_wait_ms (or until
+max_batch_size rows are waiting), scores them with one vectorized
+predict_batch call on the inference executor, and resolves each
+caller's future with its own row.
+
+Each row's stage metrics are its wait for the batch to flush
+(batch_wait) and the batch's scoring call (batch_inference), both timed
+here around the executor call.
+"""
+
+import asyncio
+import numpy as np
+from app.core import metrics
+from app.core.config import settings
+from app.core.executor import inference_executor
+from app.schemas.heart import HeartDiseaseInput, HeartDiseasePrediction
+from app.utils.preprocessing import extract_features
+
+
+class MicroBatcher:
+    """Micro-batching front end for HeartDiseasePredictor.
+
+    All state is touched only from the event loop thread; the model call
+    itself runs on the inference executor.
+    """
+
+    def __init__(self, get_predictor, executor, max_batch_size: int, max_wait_ms: float):
+        """Initialize the batcher.
+
+        Args:
+            get_predictor: Callable returning the HeartDiseasePredictor to
+                score with; resolved per batch so a hot reload takes effect
+            executor: InferenceExecutor that runs predict_batch
+            max_batch_size: Flush as soon as this many rows are waiting
+            max_wait_ms: Flush at the latest this long after the first row arrives
+        """
+        self.get_predictor = get_predictor
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        # Metrics
+        self.batches = 0
+        self.rows = 0
+        self.max_observed_batch = 0
+        self.total_wait_ms = 0.0
+
+    async def predict(self, data: HeartDiseaseInput) -> HeartDiseasePrediction:
+        """Score one request as part of the next micro-batch.
+
+        Args:
+            data: Validated patient health metrics
+
+        Returns:
+            HeartDiseasePrediction for this request
+
+        Raises:
+            ValueError: If prediction fails
+            InferenceOverloadedError: If the inference queue is full
+        """
+        try:
+            features = extract_features(data)
+        except AttributeError as e:
+            raise ValueError(f"Missing required feature: {e}")
+
+        has_disease, probability, predictor = await self.submit(features)
+        return predictor.build_result(has_disease, probability)
+
+    async def submit(self, features: np.ndarray):
+        """Queue one raw feature row and wait for its result.
+
+        Args:
+            features: Unscaled float64 array of shape (13,) in FEATURE_ORDER
+
+        Returns:
+            Tuple of (has_disease, probability, predictor that scored it)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, future, loop.time()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Hand the waiting rows to a background scoring task."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list):
+        """Score a batch and resolve every caller's future."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self.batches += 1
+        self.rows += len(batch)
+        self.max_observed_batch = max(self.max_observed_batch, len(batch))
+        self.total_wait_ms += sum(now - queued_at for _, _, queued_at in batch) * 1000.0
+
+        predictor = self.get_predictor()
+        try:
+            matrix = np.stack([features for features, _, _ in batch])
+            predictions, probabilities = await self.executor.run(
+                predictor, "predict_batch", matrix
+            )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if predictor.record_metrics:
+            inference = loop.time() - now
+            for _, _, queued_at in batch:
+                metrics.observe_stages(predictor.version, {
+                    "batch_wait": now - queued_at,
+                    "batch_inference": inference
+                })
+
+        for (_, future, _), has_disease, probability in zip(
+            batch, predictions.tolist(), probabilities.tolist()
+        ):
+            # Skip callers that went away (e.g. client disconnected)
+            if not future.done():
+                future.set_result((has_disease, probability, predictor))
+
+    def stats(self) -> dict:
+        """Return batching configuration and counters."""
+        return {
+            "enabled": settings.micro_batch_enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": round(self.rows / self.batches, 3) if self.batches else 0.0,
+            "max_observed_batch_size": self.max_observed_batch,
+            "mean_wait_ms": round(self.total_wait_ms / self.rows, 3) if self.rows else 0.0,
+            "pending": len(self._pending)
+        }
+
+
+def create_batcher(get_predictor) -> MicroBatcher:
+    """Create a MicroBatcher configured from settings."""
+    return MicroBatcher(
+        get_predictor,
+        inference_executor,
+        max_batch_size=settings.micro_batch_max_size,
+        max_wait_ms=settings.micro_batch_max_wait_ms
+    )
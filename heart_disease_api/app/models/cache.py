@@ -0,0 +1,186 @@
+"""Prediction cache.
+
+Bounded LRU (with optional TTL) memoizing predictions over the input
+space. Keys are the canonical feature tuple in FEATURE_ORDER; entries
+are tied to the fingerprint of the loaded model and scaler artifacts, so
+the first lookup for a new artifact invalidates everything cached before
+it. A result stored for any other fingerprint (a request still finishing
+on the previous model) is dropped rather than switching the cache back.
+
+Each registry candidate (see app.models.registry) gets a cache of its own
+from cache_for, so requests routed to a candidate do not invalidate the
+primary model's entries, and the other way round. Caches of candidates
+that a registry reload removed are dropped by prune_caches.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from app.core.config import settings
+from app.schemas.heart import HeartDiseaseInput, HeartDiseasePrediction
+from app.utils.preprocessing import FEATURE_ORDER
+
+
+def make_key(data: HeartDiseaseInput) -> tuple:
+    """Build the canonical cache key for a request.
+
+    Args:
+        data: Validated patient health metrics
+
+    Returns:
+        Tuple of floats in FEATURE_ORDER
+    """
+    return tuple(float(getattr(data, feature)) for feature in FEATURE_ORDER)
+
+
+class PredictionCache:
+    """Thread-safe LRU cache of predictions keyed by feature tuple."""
+
+    def __init__(self, max_size: int, ttl_seconds: float = 0.0):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries before LRU eviction
+            ttl_seconds: Entry lifetime in seconds (0 disables expiry)
+        """
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self._entries = OrderedDict()
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    def _check_fingerprint(self, fingerprint: str):
+        """Drop all entries if the artifacts changed (lock must be held)."""
+        if fingerprint != self._fingerprint:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def get(self, key: tuple, fingerprint: str) -> Optional[HeartDiseasePrediction]:
+        """Look up a cached prediction.
+
+        Args:
+            key: Canonical feature tuple (see make_key)
+            fingerprint: Fingerprint of the artifacts serving the request
+
+        Returns:
+            Cached HeartDiseasePrediction, or None on a miss
+        """
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, fingerprint: str, value: HeartDiseasePrediction):
+        """Store a prediction, evicting the least recently used entry if full.
+
+        The value is dropped if the cache already serves other artifacts
+        (only get switches the fingerprint), so a request finishing on the
+        previous model after a reload cannot clear the new model's entries.
+
+        Args:
+            key: Canonical feature tuple (see make_key)
+            fingerprint: Fingerprint of the artifacts that produced the value
+            value: Prediction to cache
+        """
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if self._fingerprint is None:
+                self._fingerprint = fingerprint
+            elif fingerprint != self._fingerprint:
+                self.stale_puts += 1
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return cache configuration and counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.prediction_cache_enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts,
+                "fingerprint": self._fingerprint
+            }
+
+
+# Singleton instance (primary model)
+prediction_cache = PredictionCache(
+    max_size=settings.prediction_cache_max_size,
+    ttl_seconds=settings.prediction_cache_ttl_seconds
+)
+
+# Caches of registry candidates by name, created on first use
+candidate_caches: Dict[str, PredictionCache] = {}
+
+
+def cache_for(model: Optional[str]) -> PredictionCache:
+    """Prediction cache of a model.
+
+    Args:
+        model: Registry name of a candidate, or None for the primary
+
+    Returns:
+        prediction_cache for the primary, else the candidate's own cache
+    """
+    if model is None:
+        return prediction_cache
+    cache = candidate_caches.get(model)
+    if cache is None:
+        cache = candidate_caches.setdefault(model, PredictionCache(
+            max_size=settings.prediction_cache_max_size,
+            ttl_seconds=settings.prediction_cache_ttl_seconds
+        ))
+    return cache
+
+
+def prune_caches(names: Iterable[str]):
+    """Drop the caches of candidates that are no longer registered.
+
+    Args:
+        names: Names of the candidates in the registry being activated
+    """
+    names = set(names)
+    for model in list(candidate_caches):
+        if model not in names:
+            candidate_caches.pop(model, None)
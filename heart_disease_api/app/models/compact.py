@@ -0,0 +1,217 @@
+"""Compact training-matrix representations for the compiled KNN.
+
+CompiledKNN stores the scaled training matrix as float64, although most
+columns hold a handful of values (sex, fbs and exang are 0/1; cp,
+restecg, slope and thal 0-3; ca 0-4) or integers in a narrow range.
+KNN_PRECISION selects a narrower representation:
+
+    float32      - the matrix as float32; distances in float32
+    int16 / int8 - integer codes with a per-feature scale and offset
+                   (x = offset + scale * code); distances in float32
+
+A column whose distinct values lie on an evenly spaced grid that fits the
+integer range (every categorical or integer feature, and oldpeak in 0.1
+steps) is stored without loss; other columns are quantized linearly over
+their range. Neighbor ties may break differently than with float64;
+load_compact_knn can measure agreement with the float64 model at startup
+(KNN_PRECISION_CHECK, about 1 s).
+"""
+
+import time
+from typing import Optional
+import numpy as np
+from app.models.compiled import CompiledKNN, minkowski_distances
+
+PRECISIONS = ("float64", "float32", "int16", "int8")
+
+# Queries for the startup comparison (at most ~1 s)
+_REPORT_ROWS = 256
+
+
+def _quantization_grid(fit_X: np.ndarray, dtype):
+    """Per-feature (offset, scale, exact) so codes cover each column.
+
+    Returns:
+        Tuple of float64 offset and scale arrays and a bool array marking
+        columns stored without loss
+    """
+    info = np.iinfo(dtype)
+    steps = int(info.max) - int(info.min)
+    n_features = fit_X.shape[1]
+    offset = np.zeros(n_features, dtype=np.float64)
+    scale = np.ones(n_features, dtype=np.float64)
+    exact = np.zeros(n_features, dtype=bool)
+
+    for j in range(n_features):
+        values = np.unique(fit_X[:, j])
+        low, span = values[0], values[-1] - values[0]
+        if values.size == 1:
+            exact[j] = True
+        else:
+            # Evenly spaced values (up to float rounding) need no rounding at all
+            step = np.diff(values).min()
+            positions = (values - low) / step
+            if (span / step <= steps
+                    and np.abs(positions - np.round(positions)).max() < 1e-6):
+                scale[j], exact[j] = step, True
+            else:
+                scale[j] = span / steps
+        offset[j] = low - scale[j] * info.min
+    return offset, scale, exact
+
+
+class QuantizedKNN(CompiledKNN):
+    """KNN over an int8/int16 training matrix with per-feature scale factors.
+
+    Queries are mapped into code units, where distances are computed in
+    float32 and weighted by the feature scales.
+    """
+
+    def __init__(self, knn: CompiledKNN, dtype):
+        """Quantize a compiled KNN's training matrix.
+
+        Args:
+            knn: CompiledKNN with a float training matrix
+            dtype: np.int8 or np.int16
+        """
+        fit_X = np.asarray(knn.fit_X, dtype=np.float64)
+        info = np.iinfo(dtype)
+        self.classes_ = knn.classes_
+        self.n_neighbors = knn.n_neighbors
+        self.p = knn.p
+        self.dtype = np.dtype(dtype)
+        self.y = knn.y
+        self.offset, self.scale, self.exact = _quantization_grid(fit_X, dtype)
+        codes = np.round((fit_X - self.offset) / self.scale)
+        self.codes = np.ascontiguousarray(np.clip(codes, info.min, info.max), dtype=dtype)
+        self._scale = self.scale.astype(np.float32)
+        self._weights = self._scale ** self.p
+
+    def kneighbors(self, features: np.ndarray):
+        """Return (distances, indices) of the k nearest training rows."""
+        X = ((np.asarray(features, dtype=np.float64) - self.offset) / self.scale).astype(np.float32)
+        return self._k_nearest(minkowski_distances(X, self.codes, self.p, self._weights))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes)
+
+
+def compact_knn(knn: CompiledKNN, precision: str) -> CompiledKNN:
+    """Return a copy of a compiled KNN using a narrower training matrix.
+
+    Args:
+        knn: CompiledKNN (float64 training matrix)
+        precision: One of PRECISIONS
+
+    Raises:
+        ValueError: If the precision is unknown
+    """
+    if precision == "float64":
+        return knn
+    if precision == "float32":
+        compact = CompiledKNN.__new__(CompiledKNN)
+        compact.__dict__.update(knn.__dict__)
+        compact.dtype = np.dtype(np.float32)
+        compact.fit_X = np.ascontiguousarray(knn.fit_X, dtype=np.float32)
+        return compact
+    if precision in ("int16", "int8"):
+        return QuantizedKNN(knn, np.dtype(precision))
+    raise ValueError(f"Unknown KNN precision: {precision} (expected one of {PRECISIONS})")
+
+
+def _matrix_bytes(knn: CompiledKNN) -> int:
+    return knn.nbytes if isinstance(knn, QuantizedKNN) else int(np.asarray(knn.fit_X).nbytes)
+
+
+def compare_knn(reference: CompiledKNN, compact: CompiledKNN, queries: np.ndarray,
+                budget_s: float = 1.0) -> dict:
+    """Agreement, memory and speed of a compact KNN against the float64 one.
+
+    Queries are scored one row at a time by both models (as /predict
+    does) until all are done or budget_s has passed.
+
+    Args:
+        reference: float64 CompiledKNN
+        compact: Output of compact_knn
+        queries: Scaled query rows
+        budget_s: Time limit for the comparison
+
+    Returns:
+        Dict with rows compared, label_agreement, max_proba_diff, matrix
+        bytes before and after, and single-row latency of both models
+    """
+    reference.predict_proba(queries[:1])
+    compact.predict_proba(queries[:1])
+    expected, proba = [], []
+    reference_s = compact_s = 0.0
+    started = time.perf_counter()
+    for i in range(len(queries)):
+        row = queries[i:i + 1]
+        before = time.perf_counter()
+        expected.append(reference.predict_proba(row)[0])
+        middle = time.perf_counter()
+        proba.append(compact.predict_proba(row)[0])
+        after = time.perf_counter()
+        reference_s += middle - before
+        compact_s += after - middle
+        if after - started >= budget_s:
+            break
+
+    expected, proba = np.array(expected), np.array(proba)
+    return {
+        "rows": len(expected),
+        "label_agreement": float(np.mean(
+            np.argmax(proba, axis=1) == np.argmax(expected, axis=1)
+        )),
+        "max_proba_diff": float(np.abs(proba - expected).max()),
+        "reference_bytes": _matrix_bytes(reference),
+        "compact_bytes": _matrix_bytes(compact),
+        "reference_ms": reference_s * 1000.0 / len(expected),
+        "compact_ms": compact_s * 1000.0 / len(expected),
+        "speedup": reference_s / compact_s if compact_s > 0 else None
+    }
+
+
+def shuffled_queries(fit_X: np.ndarray, n_rows: int, seed: int = 0) -> np.ndarray:
+    """Query rows that combine feature values of different training rows.
+
+    Every value lies on its feature's grid, but the rows are not training
+    rows, so a query is not its own nearest neighbor (which would make
+    agreement look better than on real requests).
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, fit_X.shape[0], size=(n_rows, fit_X.shape[1]))
+    return np.ascontiguousarray(fit_X[picks, np.arange(fit_X.shape[1])], dtype=np.float64)
+
+
+def load_compact_knn(model, precision: str, check: bool = False) -> Optional[CompiledKNN]:
+    """Switch a compiled KNN to a compact representation and report the effect.
+
+    Always prints the memory saved (no extra work). With check, it also
+    times single-row predictions and measures agreement with the float64
+    model on shuffled_queries (about 1 s). Returns None (model unchanged)
+    when the model is not a compiled brute-force KNN.
+    """
+    if type(model) is not CompiledKNN:
+        print(f"✗ KNN_PRECISION={precision} ignored: needs a KNN model on the compiled "
+              f"engine, not {type(model).__name__}")
+        return None
+
+    compact = compact_knn(model, precision)
+    exact = ""
+    if isinstance(compact, QuantizedKNN):
+        exact = f", {int(compact.exact.sum())}/{len(compact.exact)} features lossless"
+    print(f"✓ Compact KNN ({precision}): training matrix "
+          f"{_matrix_bytes(model) / 1e6:.2f} MB -> {_matrix_bytes(compact) / 1e6:.2f} MB"
+          f"{exact}")
+    if not check:
+        return compact
+
+    queries = shuffled_queries(np.asarray(model.fit_X), _REPORT_ROWS)
+    report = compare_knn(model, compact, queries)
+    print(f"✓ Compact KNN ({precision}) check: single-row predict "
+          f"{report['reference_ms']:.3f} ms -> {report['compact_ms']:.3f} ms "
+          f"({report['speedup']:.2f}x); labels agree {report['label_agreement']:.2%} "
+          f"on {report['rows']} rows, max probability diff {report['max_proba_diff']:.4f}")
+    return compact
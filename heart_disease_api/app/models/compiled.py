@@ -0,0 +1,399 @@
+"""Compiled NumPy inference engine.
+
+Built once at load time from the pickled scaler and model. Replaces
+sklearn's per-call validation layers with plain vectorized NumPy while
+reproducing sklearn's arithmetic, so scaler and tree ensemble outputs
+are bit-for-bit identical. KNN distances are computed directly rather
+than through sklearn's expanded dot-product form, so they may differ in
+the last bits; probabilities match unless two training rows are tied
+(to within rounding) for the k-th nearest place.
+
+Supported artifacts:
+- Scalers: StandardScaler, MinMaxScaler
+- Models: RandomForestClassifier / ExtraTreesClassifier, DecisionTreeClassifier,
+  KNeighborsClassifier (brute force, minkowski/euclidean/manhattan,
+  uniform weights)
+
+compile_artifacts raises ValueError for anything else so the caller can
+fall back to sklearn.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Optional
+import numpy as np
+
+# Size of the (n, block, d) |x - y| temporary per block of training rows
+_DIFF_BLOCK_BYTES = 4 << 20
+
+
+def minkowski_distances(X: np.ndarray, rows: np.ndarray, p: float,
+                        weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Minkowski distances from each row of X (n, d) to each row of rows (m, d).
+
+    The training rows are processed in blocks, so the temporary difference
+    tensor stays within _DIFF_BLOCK_BYTES whatever the size of rows.
+
+    Args:
+        X: Query rows
+        rows: Training rows (may be integer codes)
+        p: Minkowski power
+        weights: Optional per-feature weights w, giving
+            (sum_k w_k |x_k - y_k|^p)^(1/p)
+
+    Returns:
+        Array of shape (n, m) in the dtype of the differences
+    """
+    dtype = np.result_type(X, rows)
+    dist = np.empty((X.shape[0], rows.shape[0]), dtype=dtype)
+    step = max(1, _DIFF_BLOCK_BYTES // max(1, X.shape[0] * X.shape[1] * dtype.itemsize))
+    for start in range(0, rows.shape[0], step):
+        diff = np.abs(X[:, None, :] - rows[None, start:start + step, :])
+        out = dist[:, start:start + step]
+        if weights is not None:
+            if p == 1:
+                np.matmul(diff, weights, out=out)
+            elif p == 2:
+                np.sqrt((diff * diff) @ weights, out=out)
+            else:
+                np.power((diff ** p) @ weights, 1.0 / p, out=out)
+        elif p == 2:
+            np.sqrt(np.einsum("ijk,ijk->ij", diff, diff), out=out)
+        elif p == 1:
+            diff.sum(axis=2, out=out)
+        else:
+            np.power((diff ** p).sum(axis=2), 1.0 / p, out=out)
+    return dist
+
+
+class CompiledScaler:
+    """Affine feature scaler: X -> (X - offset) / divisor or X * scale + min."""
+
+    def __init__(self, scaler):
+        """Extract scaling statistics from a fitted sklearn scaler.
+
+        Args:
+            scaler: Fitted StandardScaler or MinMaxScaler
+
+        Raises:
+            ValueError: If the scaler type is not supported
+        """
+        kind = type(scaler).__name__
+        self.kind = kind
+        self.n_features = int(scaler.n_features_in_)
+
+        if kind == "StandardScaler":
+            self.mean = np.ascontiguousarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else None
+            self.scale = np.ascontiguousarray(scaler.scale_, dtype=np.float64) if scaler.with_std else None
+        elif kind == "MinMaxScaler":
+            self.scale = np.ascontiguousarray(scaler.scale_, dtype=np.float64)
+            self.min = np.ascontiguousarray(scaler.min_, dtype=np.float64)
+            self.clip = scaler.feature_range if scaler.clip else None
+        else:
+            raise ValueError(f"Unsupported scaler for compiled engine: {kind}")
+
+    def to_state(self) -> dict:
+        """Return the scaling statistics as JSON-serializable data."""
+        state = {"kind": self.kind, "n_features": self.n_features}
+        if self.kind == "StandardScaler":
+            state["mean"] = None if self.mean is None else self.mean.tolist()
+            state["scale"] = None if self.scale is None else self.scale.tolist()
+        else:
+            state["scale"] = self.scale.tolist()
+            state["min"] = self.min.tolist()
+            state["clip"] = None if self.clip is None else list(self.clip)
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict) -> "CompiledScaler":
+        """Rebuild a scaler from to_state() output (no sklearn needed)."""
+        scaler = cls.__new__(cls)
+        scaler.kind = state["kind"]
+        scaler.n_features = state["n_features"]
+
+        def as_array(values):
+            return None if values is None else np.asarray(values, dtype=np.float64)
+
+        scaler.scale = as_array(state["scale"])
+        if scaler.kind == "StandardScaler":
+            scaler.mean = as_array(state["mean"])
+        elif scaler.kind == "MinMaxScaler":
+            scaler.min = as_array(state["min"])
+            scaler.clip = state["clip"]
+        else:
+            raise ValueError(f"Unsupported scaler kind: {scaler.kind}")
+        return scaler
+
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        """Scale a raw float64 feature matrix (same operation order as sklearn)."""
+        X = np.array(features, dtype=np.float64, copy=True)
+        if self.kind == "StandardScaler":
+            if self.mean is not None:
+                X -= self.mean
+            if self.scale is not None:
+                X /= self.scale
+        else:
+            X *= self.scale
+            X += self.min
+            if self.clip is not None:
+                np.clip(X, self.clip[0], self.clip[1], out=X)
+        return X
+
+
+class _CompiledClassifier(ABC):
+    """Shared predict() for compiled classifiers."""
+
+    classes_: np.ndarray
+
+    @abstractmethod
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Class probabilities for a scaled feature matrix, shape (n, n_classes)."""
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Predict class labels (argmax of predict_proba, first class wins ties)."""
+        return self.classes_.take(np.argmax(self.predict_proba(features), axis=1))
+
+
+class CompiledForest(_CompiledClassifier):
+    """Tree ensemble flattened into contiguous node arrays.
+
+    All trees are evaluated together: each step advances every unfinished
+    (row, tree) pair one level down until all have reached a leaf.
+    """
+
+    def __init__(self, model):
+        """Flatten a fitted tree or forest classifier.
+
+        Args:
+            model: Fitted RandomForestClassifier, ExtraTreesClassifier
+                or DecisionTreeClassifier (single output)
+
+        Raises:
+            ValueError: If the model is multi-output
+        """
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Compiled engine supports single-output classifiers only")
+
+        estimators = getattr(model, "estimators_", None)
+        self.is_ensemble = estimators is not None
+        trees = [e.tree_ for e in estimators] if self.is_ensemble else [model.tree_]
+
+        self.classes_ = model.classes_
+        n_classes = len(self.classes_)
+
+        features, thresholds, left, right, values, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            is_leaf = tree.children_left < 0
+            roots.append(offset)
+            features.append(np.where(is_leaf, -1, tree.feature))
+            thresholds.append(tree.threshold)
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            values.append(tree.value[:, 0, :n_classes])
+            offset += tree.node_count
+
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64)
+        self.left = np.ascontiguousarray(np.concatenate(left), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.concatenate(right), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.n_trees = len(trees)
+
+    _ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes_")
+
+    def to_state(self):
+        """Return (params, arrays) for export: small JSON params plus NumPy arrays."""
+        params = {"kind": "forest", "is_ensemble": self.is_ensemble,
+                  "max_depth": int(self.max_depth), "n_trees": self.n_trees}
+        return params, {name: getattr(self, name) for name in self._ARRAYS}
+
+    @classmethod
+    def from_state(cls, params: dict, arrays: dict) -> "CompiledForest":
+        """Rebuild from to_state() output; arrays may be memory-mapped."""
+        forest = cls.__new__(cls)
+        forest.is_ensemble = params["is_ensemble"]
+        forest.max_depth = params["max_depth"]
+        forest.n_trees = params["n_trees"]
+        for name in cls._ARRAYS:
+            setattr(forest, name, arrays[name])
+        return forest
+
+    def apply(self, features: np.ndarray) -> np.ndarray:
+        """Return the leaf index reached in every tree, shape (n, n_trees)."""
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.ascontiguousarray(features, dtype=np.float32)
+        n_rows = X.shape[0]
+        node = np.tile(self.roots, n_rows)
+        rows = np.repeat(np.arange(n_rows), self.n_trees)
+
+        # Advance only the (row, tree) pairs that have not reached a leaf
+        active = np.flatnonzero(self.feature[node] >= 0)
+        while active.size:
+            current = node[active]
+            go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            active = active[self.feature[current] >= 0]
+
+        return node.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Class probabilities, accumulated tree by tree like sklearn."""
+        leaves = self.apply(features)
+        if not self.is_ensemble:
+            return self.value[leaves[:, 0]]
+
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        for t in range(self.n_trees):
+            proba += self.value[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+
+class CompiledKNN(_CompiledClassifier):
+    """Brute-force k-nearest-neighbours over the stored training matrix."""
+
+    # Size of the (query rows, training rows) distance matrix per chunk of
+    # predict_proba (the difference temporaries are bounded separately)
+    chunk_bytes = 16 << 20
+
+    def __init__(self, model, dtype=np.float64):
+        """Copy the fitted training data into a contiguous array.
+
+        Args:
+            model: Fitted KNeighborsClassifier
+            dtype: Storage / distance dtype (float64 or float32)
+
+        Raises:
+            ValueError: If the metric or weights are not supported
+        """
+        metric = model.effective_metric_
+        params = model.effective_metric_params_ or {}
+        if metric == "euclidean":
+            self.p = 2
+        elif metric == "manhattan":
+            self.p = 1
+        elif metric == "minkowski":
+            self.p = params.get("p", model.p)
+        else:
+            raise ValueError(f"Unsupported KNN metric for compiled engine: {metric}")
+        # Distance weights depend on sklearn's exact distance arithmetic,
+        # so they cannot be reproduced bit-for-bit
+        if model.weights != "uniform":
+            raise ValueError(f"Unsupported KNN weights for compiled engine: {model.weights}")
+        if getattr(model, "outputs_2d_", False):
+            raise ValueError("Compiled engine supports single-output classifiers only")
+
+        self.classes_ = model.classes_
+        self.n_neighbors = model.n_neighbors
+        self.dtype = dtype
+        self.fit_X = np.ascontiguousarray(model._fit_X, dtype=dtype)
+        self.y = np.ascontiguousarray(model._y, dtype=np.intp)
+
+    _ARRAYS = ("fit_X", "y", "classes_")
+
+    def to_state(self):
+        """Return (params, arrays) for export: small JSON params plus NumPy arrays."""
+        params = {"kind": "knn", "p": self.p, "n_neighbors": self.n_neighbors,
+                  "dtype": np.dtype(self.dtype).name}
+        return params, {name: getattr(self, name) for name in self._ARRAYS}
+
+    @classmethod
+    def from_state(cls, params: dict, arrays: dict) -> "CompiledKNN":
+        """Rebuild from to_state() output; arrays may be memory-mapped."""
+        knn = cls.__new__(cls)
+        knn.p = params["p"]
+        knn.n_neighbors = params["n_neighbors"]
+        knn.dtype = np.dtype(params["dtype"])
+        for name in cls._ARRAYS:
+            setattr(knn, name, arrays[name])
+        return knn
+
+    def kneighbors(self, features: np.ndarray):
+        """Return (distances, indices) of the k nearest training rows."""
+        X = np.ascontiguousarray(features, dtype=self.dtype)
+        return self._k_nearest(minkowski_distances(X, self.fit_X, self.p))
+
+    def _k_nearest(self, dist: np.ndarray):
+        """Pick the k smallest distances per row, nearest first."""
+        k = self.n_neighbors
+        idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        rows = np.arange(dist.shape[0])[:, None]
+        order = np.argsort(dist[rows, idx], axis=1, kind="stable")
+        idx = idx[rows, order]
+        return dist[rows, idx].astype(np.float64), idx
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Class probabilities from neighbour votes."""
+        proba = np.zeros((features.shape[0], len(self.classes_)), dtype=np.float64)
+        chunk_rows = max(1, self.chunk_bytes // (self.y.shape[0] * 8))
+        for start in range(0, features.shape[0], chunk_rows):
+            stop = start + chunk_rows
+            proba[start:stop] = self._predict_proba_chunk(features[start:stop])
+        return proba
+
+    def _predict_proba_chunk(self, features: np.ndarray) -> np.ndarray:
+        _, idx = self.kneighbors(features)
+        labels = self.y[idx]
+        rows = np.arange(labels.shape[0])
+        proba = np.zeros((labels.shape[0], len(self.classes_)), dtype=np.float64)
+        for i in range(labels.shape[1]):
+            proba[rows, labels[:, i]] += 1.0
+        proba /= proba.sum(axis=1)[:, np.newaxis]
+        return proba
+
+
+def compile_model(model):
+    """Compile a fitted sklearn classifier.
+
+    Args:
+        model: Fitted sklearn classifier
+
+    Returns:
+        Compiled model exposing classes_, predict_proba and predict
+
+    Raises:
+        ValueError: If the model type is not supported
+    """
+    kind = type(model).__name__
+    if kind in ("RandomForestClassifier", "ExtraTreesClassifier", "DecisionTreeClassifier",
+                "ExtraTreeClassifier"):
+        return CompiledForest(model)
+    if kind == "KNeighborsClassifier":
+        return CompiledKNN(model)
+    raise ValueError(f"Unsupported model for compiled engine: {kind}")
+
+
+def model_from_state(params: dict, arrays: dict):
+    """Rebuild a compiled model from exported params and arrays.
+
+    Raises:
+        ValueError: If the model kind is unknown
+    """
+    kinds = {"forest": CompiledForest, "knn": CompiledKNN}
+    if params.get("kind") not in kinds:
+        raise ValueError(f"Unsupported compiled model kind: {params.get('kind')}")
+    return kinds[params["kind"]].from_state(params, arrays)
+
+
+def is_compiled(model) -> bool:
+    """Whether a model is already a compiled NumPy model."""
+    return isinstance(model, _CompiledClassifier)
+
+
+def compile_artifacts(model, scaler):
+    """Compile a model and scaler pair.
+
+    Args:
+        model: Fitted sklearn classifier
+        scaler: Fitted StandardScaler or MinMaxScaler
+
+    Returns:
+        Tuple of (compiled_model, compiled_scaler)
+
+    Raises:
+        ValueError: If either artifact is not supported
+    """
+    return compile_model(model), CompiledScaler(scaler)
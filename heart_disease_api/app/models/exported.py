@@ -0,0 +1,96 @@
+"""Pickle-free exported artifact format.
+
+A versioned directory that can be loaded with NumPy alone:
+
+    manifest.json       - format version, source fingerprint, model
+                          hyperparameters and scaler statistics
+    model.<name>.npy    - raw model arrays (tree nodes or KNN training
+                          matrix and labels)
+
+Arrays are loaded with np.load(mmap_mode="r"), so every worker process
+maps the same page-cache pages instead of holding its own unpickled copy.
+"""
+
+import json
+import time
+from pathlib import Path
+import numpy as np
+from app.models.compiled import CompiledScaler, compile_artifacts, model_from_state
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def export_artifacts(model, scaler, directory: Path, fingerprint: str) -> dict:
+    """Write a model and scaler pair in the exported format.
+
+    Args:
+        model: Fitted sklearn classifier (see app.models.compiled)
+        scaler: Fitted StandardScaler or MinMaxScaler
+        directory: Output directory (created if missing)
+        fingerprint: Fingerprint of the source artifacts; kept so caches and
+            lookup tables built from the .pkl files stay valid
+
+    Returns:
+        The manifest that was written
+
+    Raises:
+        ValueError: If the artifacts cannot be compiled
+    """
+    compiled_model, compiled_scaler = compile_artifacts(model, scaler)
+    params, arrays = compiled_model.to_state()
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    array_files = {}
+    for name, array in arrays.items():
+        filename = f"model.{name}.npy"
+        np.save(directory / filename, np.ascontiguousarray(array))
+        array_files[name] = filename
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "created_at": time.time(),
+        "source_model": type(model).__name__,
+        "model": {"params": params, "arrays": array_files},
+        "scaler": compiled_scaler.to_state()
+    }
+    # Write the manifest last so a partial export is never picked up
+    tmp_path = directory / (MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(directory / MANIFEST_NAME)
+    return manifest
+
+
+def load_exported(directory: Path, mmap: bool = True):
+    """Load artifacts written by export_artifacts.
+
+    Args:
+        directory: Exported artifact directory
+        mmap: Memory-map the arrays (read-only) instead of reading them
+
+    Returns:
+        Tuple of (model, scaler, fingerprint) where model and scaler are
+        compiled NumPy objects
+
+    Raises:
+        FileNotFoundError: If the manifest or an array file is missing
+        ValueError: If the format version or model kind is not supported
+    """
+    directory = Path(directory)
+    with open(directory / MANIFEST_NAME) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported exported format: {manifest.get('format_version')}")
+
+    mode = "r" if mmap else None
+    arrays = {
+        name: np.load(directory / filename, mmap_mode=mode)
+        for name, filename in manifest["model"]["arrays"].items()
+    }
+    model = model_from_state(manifest["model"]["params"], arrays)
+    scaler = CompiledScaler.from_state(manifest["scaler"])
+    return model, scaler, manifest["fingerprint"]
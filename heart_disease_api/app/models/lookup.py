@@ -0,0 +1,302 @@
+"""Precomputed prediction lookup table.
+
+Every validated input lives on a finite grid: integer fields step by 1
+and oldpeak by 0.1 within the HeartDiseaseInput bounds. Each grid cell
+gets a unique int64 code (mixed radix over FEATURE_ORDER), and the
+materialized cells are stored in an open-addressing hash table made of
+plain .npy arrays, so the table can be memory-mapped and answered in O(1)
+expected time. Cells that were not materialized fall back to the live model.
+
+On-disk layout (directory):
+    lookup_meta.json    - format version, artifact fingerprint, grid, counts
+    lookup_keys.npy     - int64 cell codes (-1 = empty slot)
+    lookup_proba.npy    - float64 probability of heart disease per slot
+    lookup_labels.npy   - int8 predicted class label per slot
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from app.utils.preprocessing import FEATURE_LOWER, FEATURE_ORDER, FEATURE_UPPER, INTEGER_FEATURES
+
+FORMAT_VERSION = 1
+
+# Quantization grid: integers step by 1, oldpeak by 0.1 (one decimal place)
+QUANT_STEP = np.where(INTEGER_FEATURES, 1.0, 0.1)
+QUANT_DECIMALS = np.where(INTEGER_FEATURES, 0, 1)
+QUANT_SIZE = (np.round((FEATURE_UPPER - FEATURE_LOWER) / QUANT_STEP).astype(np.int64) + 1)
+
+# Mixed-radix strides (last feature varies fastest); full domain fits in int64
+QUANT_STRIDE = np.ones(len(FEATURE_ORDER), dtype=np.int64)
+for _j in range(len(FEATURE_ORDER) - 2, -1, -1):
+    QUANT_STRIDE[_j] = QUANT_STRIDE[_j + 1] * QUANT_SIZE[_j + 1]
+DOMAIN_CELLS = int(QUANT_STRIDE[0] * QUANT_SIZE[0])
+
+_EMPTY = np.int64(-1)
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing
+
+
+def grid_values(j: int, steps: np.ndarray) -> np.ndarray:
+    """Convert grid step indices for feature j into canonical feature values.
+
+    Values are rounded to the feature's precision so they are bit-identical
+    to what a client sends (e.g. oldpeak 2.3, not 2.3000000000000003).
+    """
+    return np.round(FEATURE_LOWER[j] + steps * QUANT_STEP[j], int(QUANT_DECIMALS[j]))
+
+
+def encode(features: np.ndarray):
+    """Map raw feature rows to grid cell codes.
+
+    Args:
+        features: float64 array of shape (n, 13) in FEATURE_ORDER
+
+    Returns:
+        Tuple of (codes, on_grid): int64 codes and a bool mask of rows that
+        lie exactly on the grid (codes for other rows are meaningless)
+    """
+    features = np.atleast_2d(features)
+    steps = np.round((features - FEATURE_LOWER) / QUANT_STEP)
+    on_grid = np.all((steps >= 0) & (steps < QUANT_SIZE), axis=1)
+    steps = np.where(on_grid[:, None], steps, 0).astype(np.int64)
+
+    # Only values bit-identical to the canonical grid value count as on-grid
+    canonical = np.empty_like(features, dtype=np.float64)
+    for j in range(len(FEATURE_ORDER)):
+        canonical[:, j] = grid_values(j, steps[:, j])
+    on_grid &= np.all(canonical == features, axis=1)
+
+    return steps @ QUANT_STRIDE, on_grid
+
+
+def decode(codes: np.ndarray) -> np.ndarray:
+    """Map grid cell codes back to canonical raw feature rows."""
+    codes = np.asarray(codes, dtype=np.int64)
+    features = np.empty((codes.shape[0], len(FEATURE_ORDER)), dtype=np.float64)
+    for j in range(len(FEATURE_ORDER)):
+        features[:, j] = grid_values(j, (codes // QUANT_STRIDE[j]) % QUANT_SIZE[j])
+    return features
+
+
+def _hash(codes: np.ndarray, bits: int) -> np.ndarray:
+    """Fibonacci hash of int64 codes into [0, 2**bits)."""
+    mixed = codes.astype(np.uint64) * _HASH_MULTIPLIER
+    return (mixed >> np.uint64(64 - bits)).astype(np.int64)
+
+
+class LookupTable:
+    """Open-addressing hash table of materialized predictions."""
+
+    def __init__(self, keys: np.ndarray, proba: np.ndarray, labels: np.ndarray, meta: dict):
+        """Wrap table arrays (usually memory-mapped).
+
+        Args:
+            keys: int64 cell codes, -1 for empty slots (power-of-two length)
+            proba: float64 probability of heart disease per slot
+            labels: int8 predicted class label per slot
+            meta: Metadata dict (see lookup_meta.json)
+        """
+        self.keys = keys
+        self.proba = proba
+        self.labels = labels
+        self.meta = meta
+        self.capacity = len(keys)
+        self.bits = self.capacity.bit_length() - 1
+        self.mask = self.capacity - 1
+        self.cells = int(meta["cells"])
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def build(cls, codes: np.ndarray, proba: np.ndarray, labels: np.ndarray, meta: dict,
+              load_factor: float = 0.5) -> "LookupTable":
+        """Build a table from materialized cells.
+
+        Args:
+            codes: int64 cell codes (duplicates keep their first value)
+            proba: Probability of heart disease per cell
+            labels: Predicted class label per cell
+            meta: Extra metadata to store (grid, fingerprint, ...)
+            load_factor: Maximum fraction of occupied slots
+
+        Returns:
+            LookupTable held in memory
+        """
+        codes, first = np.unique(np.asarray(codes, dtype=np.int64), return_index=True)
+        proba = np.asarray(proba, dtype=np.float64)[first]
+        labels = np.asarray(labels, dtype=np.int8)[first]
+
+        capacity = 2
+        while capacity * load_factor < max(len(codes), 1):
+            capacity *= 2
+        bits = capacity.bit_length() - 1
+        mask = capacity - 1
+
+        keys = np.full(capacity, _EMPTY, dtype=np.int64)
+        slot_proba = np.zeros(capacity, dtype=np.float64)
+        slot_labels = np.zeros(capacity, dtype=np.int8)
+
+        # Vectorized linear probing: each round, the first pending cell per
+        # empty slot claims it; everyone else moves one slot along
+        pending = np.arange(len(codes))
+        slots = _hash(codes, bits)
+        while pending.size:
+            candidate_slots = slots[pending]
+            free = keys[candidate_slots] == _EMPTY
+            claimed, first_claim = np.unique(candidate_slots[free], return_index=True)
+            winners = pending[free][first_claim]
+            keys[claimed] = codes[winners]
+            slot_proba[claimed] = proba[winners]
+            slot_labels[claimed] = labels[winners]
+
+            placed = np.zeros(len(codes), dtype=bool)
+            placed[winners] = True
+            pending = pending[~placed[pending]]
+            slots[pending] = (slots[pending] + 1) & mask
+
+        meta = {**meta, "format_version": FORMAT_VERSION, "cells": int(len(codes)),
+                "capacity": capacity, "domain_cells": DOMAIN_CELLS}
+        return cls(keys, slot_proba, slot_labels, meta)
+
+    def lookup_codes(self, codes: np.ndarray) -> np.ndarray:
+        """Find the slot of each code.
+
+        Args:
+            codes: int64 cell codes
+
+        Returns:
+            int64 slot index per code, -1 where the cell is not materialized
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        result = np.full(len(codes), -1, dtype=np.int64)
+        pending = np.arange(len(codes))
+        slots = _hash(codes, self.bits)
+        while pending.size:
+            found = np.asarray(self.keys[slots[pending]])
+            match = found == codes[pending]
+            result[pending[match]] = slots[pending[match]]
+            # Keep probing while the slot is occupied by another cell
+            pending = pending[~match & (found != _EMPTY)]
+            slots[pending] = (slots[pending] + 1) & self.mask
+        return result
+
+    def get(self, features: np.ndarray):
+        """Look up one raw feature row.
+
+        Args:
+            features: float64 array of shape (13,) in FEATURE_ORDER
+
+        Returns:
+            Tuple of (label, probability) or None if not materialized
+        """
+        codes, on_grid = encode(features.reshape(1, -1))
+        if on_grid[0]:
+            slot = int(self.lookup_codes(codes)[0])
+            if slot >= 0:
+                self.hits += 1
+                return int(self.labels[slot]), float(self.proba[slot])
+        self.misses += 1
+        return None
+
+    def get_batch(self, features: np.ndarray):
+        """Look up raw feature rows.
+
+        Args:
+            features: float64 array of shape (n, 13) in FEATURE_ORDER
+
+        Returns:
+            Tuple of (found, labels, proba): bool mask of materialized rows
+            and their labels / probabilities (undefined where not found)
+        """
+        codes, on_grid = encode(features)
+        slots = np.full(len(codes), -1, dtype=np.int64)
+        if on_grid.any():
+            slots[on_grid] = self.lookup_codes(codes[on_grid])
+        found = slots >= 0
+        safe = np.where(found, slots, 0)
+        self.hits += int(found.sum())
+        self.misses += int((~found).sum())
+        return found, np.asarray(self.labels[safe]), np.asarray(self.proba[safe])
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the table arrays in bytes."""
+        return int(self.keys.nbytes + self.proba.nbytes + self.labels.nbytes)
+
+    def describe(self) -> dict:
+        """Return coverage, memory footprint and hit counters."""
+        lookups = self.hits + self.misses
+        return {
+            "cells": self.cells,
+            "capacity": self.capacity,
+            "domain_cells": DOMAIN_CELLS,
+            "domain_coverage": self.cells / DOMAIN_CELLS,
+            "memory_bytes": self.nbytes,
+            "fingerprint": self.meta.get("fingerprint"),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def save(self, directory: Path):
+        """Write the table to a directory (see module docstring for layout)."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "lookup_keys.npy", np.asarray(self.keys))
+        np.save(directory / "lookup_proba.npy", np.asarray(self.proba))
+        np.save(directory / "lookup_labels.npy", np.asarray(self.labels))
+        with open(directory / "lookup_meta.json", "w") as f:
+            json.dump({**self.meta, "created_at": time.time()}, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "LookupTable":
+        """Load a table written by save().
+
+        Args:
+            directory: Table directory
+            mmap: Memory-map the arrays instead of reading them into memory
+
+        Raises:
+            FileNotFoundError: If the table files are missing
+            ValueError: If the format version is not supported
+        """
+        directory = Path(directory)
+        with open(directory / "lookup_meta.json") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lookup table format: {meta.get('format_version')}")
+
+        mode = "r" if mmap else None
+        return cls(
+            np.load(directory / "lookup_keys.npy", mmap_mode=mode),
+            np.load(directory / "lookup_proba.npy", mmap_mode=mode),
+            np.load(directory / "lookup_labels.npy", mmap_mode=mode),
+            meta
+        )
+
+
+def load_lookup_table(directory: Path, fingerprint: str) -> Optional[LookupTable]:
+    """Load the serving lookup table if it matches the loaded artifacts.
+
+    Prints coverage and memory footprint. Returns None (live model only)
+    when the table is missing, unreadable or built from other artifacts.
+    """
+    try:
+        table = LookupTable.load(directory)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ Lookup table not loaded from {directory}: {e}")
+        return None
+
+    if table.meta.get("fingerprint") != fingerprint:
+        print(f"✗ Lookup table at {directory} was built from different artifacts; ignoring it")
+        return None
+
+    info = table.describe()
+    print(f"✓ Lookup table loaded from {directory}: {info['cells']:,} cells "
+          f"({info['domain_coverage']:.2e} of the input domain), "
+          f"{info['memory_bytes'] / 1e6:.1f} MB")
+    return table
@@ -0,0 +1,301 @@
+"""Serving predictor lifecycle: startup, warm-up and hot reload.
+
+Holds the predictor currently serving requests. At startup the inference
+dependencies are imported, the artifacts loaded and the model warmed up
+before the service reports ready. A reload loads the new
+model and scaler in a background thread, warms them up, and then swaps
+the reference in one assignment: requests that already picked up the old
+predictor finish on it, new requests get the new one.
+
+Candidate models from the model registry (app.models.registry) are
+loaded and warmed up at startup and reloaded together with the primary.
+
+Reloads can be triggered by the admin API, SIGHUP, or a polling watcher
+on the artifact files and the registry file.
+"""
+
+import asyncio
+import importlib
+import signal
+import time
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from app.core import metrics
+from app.core.config import settings
+from app.core.executor import inference_executor
+from app.models import ml_model
+from app.models.predictor import HeartDiseasePredictor
+from app.models.registry import model_registry
+from app.models.shared_cache import shared_cache
+from app.schemas.heart import HeartDiseaseInput
+from app.utils.preprocessing import (
+    FEATURE_LOWER,
+    FEATURE_ORDER,
+    FEATURE_UPPER,
+    INTEGER_FEATURES,
+    extract_features,
+)
+
+
+def _watched_files() -> list:
+    """Artifact and registry files whose changes trigger a reload."""
+    files = [settings.model_path, settings.scaler_path, settings.model_registry_path]
+    if settings.artifact_format == "exported":
+        files.append(Path(settings.exported_artifacts_dir) / "manifest.json")
+    return files
+
+
+def _file_signature() -> tuple:
+    """(path, mtime, size) of each watched file; missing files count too."""
+    signature = []
+    for path in _watched_files():
+        try:
+            stat = Path(path).stat()
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((str(path), None, None))
+    return tuple(signature)
+
+
+def synthetic_inputs(count: int, seed: int = 0) -> List[HeartDiseaseInput]:
+    """Valid inputs for warm-up: the schema example plus random in-range rows."""
+    inputs = [HeartDiseaseInput.model_validate(
+        HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+    )]
+    rng = np.random.default_rng(seed)
+    rows = rng.uniform(FEATURE_LOWER, FEATURE_UPPER, size=(max(0, count - 1), len(FEATURE_ORDER)))
+    rows = np.where(INTEGER_FEATURES, np.round(rows), np.round(rows, 1))
+    inputs.extend(
+        HeartDiseaseInput(**dict(zip(FEATURE_ORDER, row.tolist()))) for row in rows
+    )
+    return inputs
+
+
+def _warm_up(predictor: HeartDiseasePredictor, count: int):
+    """Run synthetic predictions, single and batched, before serving.
+
+    Pays first-call costs (lazy initialization inside NumPy/sklearn, page
+    faults on memory-mapped arrays) here instead of on real requests.
+
+    Raises:
+        ValueError: If the artifacts cannot score the synthetic inputs
+    """
+    inputs = synthetic_inputs(max(1, count))
+    record_metrics, predictor.record_metrics = predictor.record_metrics, False
+    try:
+        for data in inputs:
+            predictor.predict(data)
+        predictor.predict_batch(np.stack([extract_features(data) for data in inputs]))
+    finally:
+        predictor.record_metrics = record_metrics
+
+
+def _activate_shared_cache(predictor: HeartDiseasePredictor):
+    """Point the cross-worker cache at the artifacts now serving."""
+    if settings.shared_cache_enabled and shared_cache.activate(predictor.fingerprint):
+        print(f"✓ Shared prediction cache now serves model {predictor.version} "
+              f"(older entries invalidated)")
+
+
+class PredictorManager:
+    """Owner of the serving predictor and its reload lifecycle."""
+
+    def __init__(self):
+        """Create the manager (the predictor is built on first access)."""
+        self._current: Optional[HeartDiseasePredictor] = None
+        self._lock = None  # Created on first reload, inside the running loop
+        self._watch_task = None
+        self._signature = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.last_trigger = None
+        self.ready = False
+        self.startup_timings = {}
+
+    @property
+    def current(self) -> HeartDiseasePredictor:
+        """The predictor serving new requests."""
+        if self._current is None:
+            self._current = HeartDiseasePredictor()
+            self._signature = _file_signature()
+            self.loaded_at = time.time()
+        return self._current
+
+    def _load_new(self):
+        """Load artifacts from disk and build warmed-up predictors (blocking).
+        
+        The artifacts are only read here; reload installs them with
+        ml_model.set_artifacts after everything succeeded, so a failed
+        warm-up or registry leaves the previous artifacts in ml_model.
+        
+        Returns:
+            Tuple of (primary predictor, candidates to pass to
+            model_registry.activate, artifacts for ml_model.set_artifacts)
+        """
+        artifacts = ml_model.read_artifacts()
+        predictor = HeartDiseasePredictor(artifacts, primary=True)
+        _warm_up(predictor, settings.warmup_predictions)
+        candidates = model_registry.prepare(
+            lambda candidate: _warm_up(candidate, settings.warmup_predictions)
+        )
+        return predictor, candidates, artifacts
+
+    async def startup(self) -> dict:
+        """Import, load and warm up the model, then mark the service ready.
+
+        Blocking steps run in a background thread so the event loop stays
+        responsive.
+
+        Returns:
+            Seconds spent per phase ("import", "load", "warmup", "total")
+
+        Raises:
+            Exception: If the artifacts cannot be loaded or scored
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        # Step 1: Import the libraries needed to unpickle the artifacts
+        # (the exported format needs NumPy only)
+        if settings.artifact_format == "joblib":
+            await loop.run_in_executor(None, importlib.import_module, "joblib")
+            await loop.run_in_executor(None, importlib.import_module, "sklearn")
+        imported = time.perf_counter()
+
+        # Step 2: Load the artifacts and build the predictor, then the
+        # registry's candidate models (warmed up as they are loaded)
+        predictor = await loop.run_in_executor(None, lambda: self.current)
+        candidates = await loop.run_in_executor(
+            None, model_registry.prepare,
+            lambda candidate: _warm_up(candidate, settings.warmup_predictions)
+        )
+        model_registry.activate(candidates)
+        loaded = time.perf_counter()
+
+        # Step 3: Warm up in-process, then start the inference pool workers
+        await loop.run_in_executor(None, _warm_up, predictor, settings.warmup_predictions)
+        example = synthetic_inputs(1)[0]
+        record_metrics, predictor.record_metrics = predictor.record_metrics, False
+        try:
+            await asyncio.gather(*[
+                inference_executor.run(predictor, "predict", example)
+                for _ in range(inference_executor.max_workers)
+            ])
+        finally:
+            predictor.record_metrics = record_metrics
+        warmed = time.perf_counter()
+
+        _activate_shared_cache(predictor)
+        metrics.set_model_info(predictor.version, predictor.engine)
+        self.startup_timings = {
+            "import": round(imported - started, 4),
+            "load": round(loaded - imported, 4),
+            "warmup": round(warmed - loaded, 4),
+            "total": round(warmed - started, 4)
+        }
+        self.ready = True
+        return self.startup_timings
+
+    async def reload(self, trigger: str = "api") -> dict:
+        """Load the artifacts again and swap them in atomically.
+
+        Args:
+            trigger: What requested the reload ("api", "signal", "watch")
+
+        Returns:
+            Status dict (see stats); the old predictor keeps serving on failure
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self.last_trigger = trigger
+            signature = _file_signature()
+            loop = asyncio.get_running_loop()
+            try:
+                predictor, candidates, artifacts = await loop.run_in_executor(None, self._load_new)
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = str(e)
+                print(f"✗ Model reload ({trigger}) failed, keeping {self.current.version}: {e}")
+                return self.stats()
+
+            previous = self.current
+            # Everything loaded: only now install the artifacts that later
+            # HeartDiseasePredictor() calls (pool workers, supervisor) build from
+            ml_model.set_artifacts(artifacts)
+            # Single reference assignment: the swap itself is atomic
+            self._current = predictor
+            model_registry.activate(candidates)
+            self._signature = signature
+            self.loaded_at = time.time()
+            self.reloads += 1
+            self.last_error = None
+            metrics.set_model_info(predictor.version, predictor.engine)
+            _activate_shared_cache(predictor)
+
+            # Process pool workers hold their own predictor; replace them
+            if inference_executor.kind == "process":
+                inference_executor.restart()
+
+            print(f"✓ Model reloaded ({trigger}): {previous.version} -> {predictor.version}")
+            return self.stats()
+
+    async def _watch(self, interval: float):
+        """Poll the artifact files and reload once a change has settled."""
+        pending = None
+        while True:
+            await asyncio.sleep(interval)
+            signature = _file_signature()
+            if signature == self._signature:
+                pending = None
+            elif signature == pending:
+                # Unchanged for a full interval: the copy is complete
+                await self.reload("watch")
+                pending = None
+            else:
+                pending = signature
+
+    def start(self):
+        """Install the SIGHUP handler and start the file watcher (if enabled)."""
+        loop = asyncio.get_running_loop()
+        if settings.model_reload_on_sighup and hasattr(signal, "SIGHUP"):
+            try:
+                loop.add_signal_handler(
+                    signal.SIGHUP, lambda: asyncio.ensure_future(self.reload("signal"))
+                )
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+        if settings.model_watch_interval_seconds > 0 and self._watch_task is None:
+            self._watch_task = asyncio.ensure_future(
+                self._watch(settings.model_watch_interval_seconds)
+            )
+
+    def stop(self):
+        """Stop the file watcher."""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    def stats(self) -> dict:
+        """Return the serving model version and reload counters."""
+        predictor = self.current
+        return {
+            "model_version": predictor.version,
+            "fingerprint": predictor.fingerprint,
+            "engine": predictor.engine,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_trigger": self.last_trigger,
+            "last_error": self.last_error,
+            "watching": self._watch_task is not None,
+            "ready": self.ready,
+            "startup_timings": self.startup_timings
+        }
+
+
+# Singleton instance
+predictor_manager = PredictorManager()
@@ -1,12 +1,16 @@
 """Machine learning model loader.
 
-Loads pre-trained model and scaler at module level (once on startup).
-Uses joblib for loading pickle files.
+Loads pre-trained model and scaler on first use (normally during the
+application's startup phase, see app.main), not as an import side effect.
+Uses joblib for loading pickle files, or the pickle-free exported format
+(see app.models.exported) when settings.artifact_format == "exported".
 """
 
-import joblib
+import hashlib
+import threading
 import warnings
 from pathlib import Path
+from typing import Optional
 from app.core.config import settings
 
 # Suppress sklearn version warnings
@@ -15,15 +19,38 @@ warnings.filterwarnings('ignore', category=UserWarning, module='sklearn')
 # Module-level variables (loaded once)
 _model = None
 _scaler = None
+_fingerprint = None
+_load_lock = threading.Lock()
 
 
-def _load_artifacts():
-    """Load model and scaler artifacts.
+def _fingerprint_files(*paths: Path) -> str:
+    """Compute a SHA-256 fingerprint over the contents of artifact files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def read_artifacts():
+    """Load the serving model and scaler from disk without installing them.
     
-    Called once at module import time.
+    Called on first use (via _load_artifacts) and on hot reload, where the
+    predictor manager only commits the pair with set_artifacts once the new
+    predictor is built and warmed up.
     Raises exceptions if loading fails - app should not start with missing models.
+    
+    Returns:
+        Tuple of (model, scaler, fingerprint)
     """
-    global _model, _scaler
+    if settings.artifact_format == "exported":
+        artifacts = _read_exported_artifacts()
+        if artifacts is not None:
+            return artifacts
+    
+    # joblib (and sklearn, when unpickling) is only needed on this path
+    import joblib
     
     try:
         # Load the trained ML model
@@ -34,7 +61,7 @@ def _load_artifacts():
                 f"Please place 'heart_model.pkl' in the artifacts/ directory"
             )
         
-        _model = joblib.load(model_path)
+        model = joblib.load(model_path)
         print(f"✓ Model loaded successfully from {model_path}")
         
     except Exception as e:
@@ -50,27 +77,123 @@ def _load_artifacts():
                 f"Please place 'scaler.pkl' in the artifacts/ directory"
             )
         
-        _scaler = joblib.load(scaler_path)
+        scaler = joblib.load(scaler_path)
         print(f"✓ Scaler loaded successfully from {scaler_path}")
         
     except Exception as e:
         print(f"✗ ERROR loading scaler: {e}")
         raise
+    
+    # Fingerprint identifies this exact model + scaler pair (used for caching)
+    fingerprint = _fingerprint_files(settings.model_path, settings.scaler_path)
+    return model, scaler, fingerprint
 
 
-# Load artifacts when module is imported
-_load_artifacts()
+def _read_exported_artifacts() -> Optional[tuple]:
+    """Load the memory-mapped exported artifacts.
+    
+    Returns:
+        Tuple of (model, scaler, fingerprint), or None (after logging why)
+        to fall back to joblib
+    """
+    from app.models.exported import load_exported
+    
+    directory = settings.exported_artifacts_dir
+    try:
+        model, scaler, fingerprint = load_exported(directory)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ Exported artifacts not loaded from {directory}, using joblib: {e}")
+        return None
+    
+    # Refuse an export that is older than the .pkl files next to it
+    if settings.model_path.exists() and settings.scaler_path.exists():
+        if _fingerprint_files(settings.model_path, settings.scaler_path) != fingerprint:
+            print(f"✗ Exported artifacts in {directory} are stale, using joblib")
+            return None
+    
+    print(f"✓ Model and scaler memory-mapped from {directory}")
+    return model, scaler, fingerprint
+
+
+def set_artifacts(artifacts: tuple):
+    """Install a (model, scaler, fingerprint) tuple from read_artifacts.
+    
+    The three globals change together under the load lock, so readers
+    never see a model with another model's scaler.
+    """
+    global _model, _scaler, _fingerprint
+    with _load_lock:
+        _model, _scaler, _fingerprint = artifacts
+
+
+def load_artifact_files(model_path: Path, scaler_path: Path):
+    """Load a model and scaler pair other than the serving one.
+    
+    Used for candidate models (see app.models.registry); the module-level
+    artifacts are left untouched.
+    
+    Args:
+        model_path: Pickled sklearn classifier
+        scaler_path: Pickled scaler fitted with it
+        
+    Returns:
+        Tuple of (model, scaler, fingerprint)
+        
+    Raises:
+        FileNotFoundError: If either file is missing
+    """
+    import joblib
+    
+    for path in (model_path, scaler_path):
+        if not Path(path).exists():
+            raise FileNotFoundError(f"Artifact file not found at: {path}")
+    return (joblib.load(model_path), joblib.load(scaler_path),
+            _fingerprint_files(model_path, scaler_path))
+
+
+def _load_artifacts():
+    """Read the artifacts and install them (caller holds _load_lock).
+    
+    The globals are only replaced once both artifacts loaded, so a failed
+    load leaves the previous pair in place.
+    """
+    global _model, _scaler, _fingerprint
+    _model, _scaler, _fingerprint = read_artifacts()
+
+
+def _ensure_loaded():
+    """Load the artifacts once, on first access from any thread."""
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                _load_artifacts()
+
+
+def reload_artifacts():
+    """Load the artifacts from disk again and install them immediately.
+    
+    Used by the supervisor before forking workers; the predictor manager's
+    hot reload uses read_artifacts and set_artifacts instead, so nothing is
+    installed until the new predictor has warmed up.
+    
+    Raises:
+        Exception: Whatever loading raised; the previous artifacts stay loaded
+    """
+    with _load_lock:
+        _load_artifacts()
 
 
 def get_model():
     """Get the loaded ML model.
     
     Returns:
-        The trained scikit-learn model
+        The trained scikit-learn model (or its compiled form when loaded
+        from exported artifacts)
         
     Raises:
-        RuntimeError: If model is not loaded
+        RuntimeError: If model is not loaded (loading errors propagate)
     """
+    _ensure_loaded()
     if _model is None:
         raise RuntimeError("Model not loaded. Check startup logs.")
     return _model
@@ -85,6 +208,22 @@ def get_scaler():
     Raises:
         RuntimeError: If scaler is not loaded
     """
+    _ensure_loaded()
     if _scaler is None:
         raise RuntimeError("Scaler not loaded. Check startup logs.")
     return _scaler
+
+
+def get_fingerprint() -> str:
+    """Get the fingerprint of the loaded model and scaler artifacts.
+    
+    Returns:
+        SHA-256 hex digest of the model and scaler files
+        
+    Raises:
+        RuntimeError: If artifacts are not loaded
+    """
+    _ensure_loaded()
+    if _fingerprint is None:
+        raise RuntimeError("Artifacts not loaded. Check startup logs.")
+    return _fingerprint
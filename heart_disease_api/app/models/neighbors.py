@@ -0,0 +1,341 @@
+"""Neighbor indexes for KNN models with large training sets.
+
+Brute-force KNN (sklearn's or CompiledKNN) measures the distance to every
+stored training row on every call, which stops scaling at millions of
+rows. An index built offline over the model's (already scaled) training
+matrix replaces that scan:
+
+    kd_tree / ball_tree - exact search with sklearn's KDTree / BallTree
+    ivf                 - approximate search: k-means partitions the rows
+                          into n_lists inverted lists and a query only scans
+                          the n_probe lists with the nearest centroids;
+                          n_probe is the recall/latency knob (n_probe ==
+                          n_lists is exact)
+
+Exact indexes return the same neighbor distances as brute force; rows
+tied at the k-th distance may be picked differently.
+
+On-disk layout (directory):
+    neighbors_meta.json    - format version, kind, artifact fingerprint, sizes
+    neighbors_tree.joblib  - KDTree / BallTree (exact kinds)
+    ivf_centroids.npy      - float64 (n_lists, n_features) partition centroids
+    ivf_offsets.npy        - int64 (n_lists + 1) start of each list in ivf_data
+    ivf_rows.npy           - int64 training row index per ivf_data row
+    ivf_data.npy           - float64 training rows grouped by list
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from app.models.compiled import CompiledKNN, minkowski_distances
+
+FORMAT_VERSION = 1
+
+INDEX_KINDS = ("kd_tree", "ball_tree", "ivf")
+
+# Rows per block when assigning rows to centroids (bounds memory)
+_ASSIGN_CHUNK_ROWS = 65536
+
+
+def _nearest_centroid(X: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (squared euclidean) for each row of X."""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignment = np.empty(X.shape[0], dtype=np.intp)
+    for start in range(0, X.shape[0], _ASSIGN_CHUNK_ROWS):
+        block = X[start:start + _ASSIGN_CHUNK_ROWS]
+        # ||x - c||^2 without the ||x||^2 term, which does not change the argmin
+        assignment[start:start + len(block)] = np.argmin(
+            centroid_norms - 2.0 * block @ centroids.T, axis=1
+        )
+    return assignment
+
+
+def _kmeans(X: np.ndarray, n_lists: int, iterations: int, seed: int) -> np.ndarray:
+    """Lloyd's k-means on a sample of X; returns (n_lists, d) centroids."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(X.shape[0], n_lists * 256)
+    sample = X[np.sort(rng.choice(X.shape[0], sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = _nearest_centroid(sample, centroids)
+        counts = np.bincount(assignment, minlength=n_lists)
+        filled = counts > 0
+        for j in range(X.shape[1]):
+            sums = np.bincount(assignment, weights=sample[:, j], minlength=n_lists)
+            centroids[filled, j] = sums[filled] / counts[filled]
+    return centroids
+
+
+class TreeIndex:
+    """Exact neighbor search with sklearn's KDTree or BallTree."""
+
+    def __init__(self, tree, kind: str):
+        self.tree = tree
+        self.kind = kind
+        self.n_rows = int(np.asarray(tree.data).shape[0])
+
+    @classmethod
+    def build(cls, fit_X: np.ndarray, p: float, kind: str = "kd_tree",
+              leaf_size: int = 40) -> "TreeIndex":
+        """Build a tree over the scaled training matrix.
+
+        Args:
+            fit_X: Scaled training rows, shape (n, d)
+            p: Minkowski power of the model's metric
+            kind: "kd_tree" or "ball_tree"
+            leaf_size: Rows per leaf (smaller = deeper tree)
+        """
+        from sklearn.neighbors import BallTree, KDTree
+        tree_class = KDTree if kind == "kd_tree" else BallTree
+        return cls(tree_class(fit_X, leaf_size=leaf_size, metric="minkowski", p=p), kind)
+
+    def kneighbors(self, X: np.ndarray, k: int):
+        """Return (distances, indices) of the k nearest rows, nearest first."""
+        return self.tree.query(X, k=min(k, self.n_rows))
+
+    def describe(self) -> dict:
+        return {"kind": self.kind}
+
+    def save(self, directory: Path):
+        import joblib
+        joblib.dump(self.tree, Path(directory) / "neighbors_tree.joblib")
+
+    @classmethod
+    def load(cls, directory: Path, meta: dict) -> "TreeIndex":
+        import joblib
+        return cls(joblib.load(Path(directory) / "neighbors_tree.joblib"), meta["kind"])
+
+
+class IVFIndex:
+    """Approximate neighbor search over k-means partitions (inverted lists).
+
+    Rows are stored grouped by partition, so the candidates of a probed list
+    are one contiguous slice. A query ranks the centroids, scans the nearest
+    n_probe lists (more if they hold fewer than k rows) and returns the k
+    nearest candidates.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray,
+                 data: np.ndarray, p: float, n_probe: int = 8):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.data = data
+        self.p = p
+        self.n_probe = n_probe
+        self.sizes = np.diff(offsets)
+        self.n_rows = int(rows.shape[0])
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, fit_X: np.ndarray, p: float, n_lists: Optional[int] = None,
+              iterations: int = 10, seed: int = 0, n_probe: int = 8) -> "IVFIndex":
+        """Partition the scaled training matrix.
+
+        Args:
+            fit_X: Scaled training rows, shape (n, d)
+            p: Minkowski power of the model's metric
+            n_lists: Number of partitions (default about sqrt(n))
+            iterations: k-means iterations
+            seed: Random seed for the k-means sample and initialization
+            n_probe: Lists scanned per query
+        """
+        fit_X = np.ascontiguousarray(fit_X, dtype=np.float64)
+        n_rows = fit_X.shape[0]
+        if n_lists is None:
+            n_lists = int(np.sqrt(n_rows))
+        n_lists = max(1, min(n_lists, n_rows))
+
+        centroids = _kmeans(fit_X, n_lists, iterations, seed)
+        assignment = _nearest_centroid(fit_X, centroids)
+        rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, offsets, rows, fit_X[rows], p, n_probe)
+
+    def kneighbors(self, X: np.ndarray, k: int):
+        """Return (distances, indices) of the k nearest candidates, nearest first.
+
+        An index over fewer than k rows returns all of them.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        k = min(k, self.n_rows)
+        distances = np.empty((X.shape[0], k), dtype=np.float64)
+        indices = np.empty((X.shape[0], k), dtype=np.intp)
+        ranked = np.argsort(minkowski_distances(X, self.centroids, 2), axis=1)
+        n_probe = max(1, min(self.n_probe, self.n_lists))
+
+        for i in range(X.shape[0]):
+            lists = ranked[i]
+            # Probe further lists until there are at least k candidates
+            needed = int(np.searchsorted(np.cumsum(self.sizes[lists]), k)) + 1
+            lists = lists[:max(n_probe, needed)]
+            candidates = np.concatenate([
+                np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists
+            ])
+            dist = minkowski_distances(X[i:i + 1], self.data[candidates], self.p)[0]
+            nearest = np.argpartition(dist, k - 1)[:k] if dist.size > k else np.arange(dist.size)
+            nearest = nearest[np.argsort(dist[nearest], kind="stable")]
+            distances[i] = dist[nearest]
+            indices[i] = self.rows[candidates[nearest]]
+        return distances, indices
+
+    def describe(self) -> dict:
+        return {"kind": self.kind, "n_lists": self.n_lists, "n_probe": self.n_probe,
+                "mean_list_size": round(float(self.sizes.mean()), 1)}
+
+    def save(self, directory: Path):
+        directory = Path(directory)
+        np.save(directory / "ivf_centroids.npy", self.centroids)
+        np.save(directory / "ivf_offsets.npy", self.offsets)
+        np.save(directory / "ivf_rows.npy", np.asarray(self.rows))
+        np.save(directory / "ivf_data.npy", np.asarray(self.data))
+
+    @classmethod
+    def load(cls, directory: Path, meta: dict) -> "IVFIndex":
+        directory = Path(directory)
+        return cls(
+            np.load(directory / "ivf_centroids.npy"),
+            np.load(directory / "ivf_offsets.npy"),
+            np.load(directory / "ivf_rows.npy", mmap_mode="r"),
+            np.load(directory / "ivf_data.npy", mmap_mode="r"),
+            meta["p"]
+        )
+
+
+class IndexedKNN(CompiledKNN):
+    """KNN classifier that finds neighbors through an index instead of brute force.
+
+    Votes are counted exactly like CompiledKNN (uniform weights).
+    """
+
+    def __init__(self, knn: CompiledKNN, index):
+        """Wrap a compiled KNN model.
+
+        Args:
+            knn: CompiledKNN providing classes_, labels and n_neighbors
+            index: TreeIndex or IVFIndex built over knn.fit_X
+        """
+        self.classes_ = knn.classes_
+        self.n_neighbors = knn.n_neighbors
+        self.p = knn.p
+        self.dtype = np.float64
+        self.y = knn.y
+        self.index = index
+
+    def kneighbors(self, features: np.ndarray):
+        """Return (distances, indices) of the k nearest training rows."""
+        return self.index.kneighbors(np.ascontiguousarray(features, dtype=np.float64),
+                                     self.n_neighbors)
+
+
+def as_compiled_knn(model) -> CompiledKNN:
+    """Return the model as a CompiledKNN.
+
+    Raises:
+        ValueError: If the model is not a supported KNN classifier
+    """
+    if isinstance(model, IndexedKNN):
+        raise ValueError("Model already uses a neighbor index")
+    if isinstance(model, CompiledKNN):
+        return model
+    if type(model).__name__ != "KNeighborsClassifier":
+        raise ValueError(f"Neighbor indexes need a KNN model, not {type(model).__name__}")
+    return CompiledKNN(model)
+
+
+def build_index(model, kind: str = "kd_tree", **params):
+    """Build a neighbor index over a KNN model's training matrix.
+
+    Args:
+        model: Fitted KNeighborsClassifier or CompiledKNN
+        kind: "kd_tree", "ball_tree" or "ivf"
+        **params: Passed to TreeIndex.build / IVFIndex.build
+
+    Returns:
+        TreeIndex or IVFIndex
+
+    Raises:
+        ValueError: If the model or kind is not supported
+    """
+    knn = as_compiled_knn(model)
+    fit_X = np.ascontiguousarray(knn.fit_X, dtype=np.float64)
+    if kind in ("kd_tree", "ball_tree"):
+        return TreeIndex.build(fit_X, knn.p, kind=kind, **params)
+    if kind == "ivf":
+        return IVFIndex.build(fit_X, knn.p, **params)
+    raise ValueError(f"Unknown neighbor index kind: {kind} (expected one of {INDEX_KINDS})")
+
+
+def save_index(index, directory: Path, fingerprint: str, build_seconds: float):
+    """Write an index and its metadata (see module docstring for layout)."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    index.save(directory)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        **{key: value for key, value in index.describe().items() if key != "n_probe"},
+        "p": float(index.p) if isinstance(index, IVFIndex) else None,
+        "fingerprint": fingerprint,
+        "n_rows": index.n_rows,
+        "build_seconds": round(build_seconds, 3),
+        "created_at": time.time()
+    }
+    with open(directory / "neighbors_meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_index(directory: Path):
+    """Load an index written by save_index.
+
+    Returns:
+        Tuple of (index, meta)
+
+    Raises:
+        FileNotFoundError: If the index files are missing
+        ValueError: If the format version or kind is not supported
+    """
+    directory = Path(directory)
+    with open(directory / "neighbors_meta.json") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported neighbor index format: {meta.get('format_version')}")
+    if meta.get("kind") == "ivf":
+        return IVFIndex.load(directory, meta), meta
+    if meta.get("kind") in ("kd_tree", "ball_tree"):
+        return TreeIndex.load(directory, meta), meta
+    raise ValueError(f"Unknown neighbor index kind: {meta.get('kind')}")
+
+
+def load_indexed_model(model, directory: Path, fingerprint: str,
+                       n_probe: int) -> Optional[IndexedKNN]:
+    """Attach the serving neighbor index to a KNN model.
+
+    Returns None (brute-force model unchanged) when the model is not a
+    KNN, or the index is missing, unreadable or built from other artifacts.
+    """
+    try:
+        knn = as_compiled_knn(model)
+        index, meta = load_index(directory)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ Neighbor index not loaded from {directory}: {e}")
+        return None
+
+    if meta.get("fingerprint") != fingerprint or meta.get("n_rows") != len(knn.y):
+        print(f"✗ Neighbor index at {directory} was built from different artifacts; ignoring it")
+        return None
+
+    if isinstance(index, IVFIndex):
+        index.n_probe = n_probe
+    details = ", ".join(f"{key} {value}" for key, value in index.describe().items() if key != "kind")
+    print(f"✓ Neighbor index loaded from {directory}: {index.kind} over "
+          f"{meta['n_rows']:,} rows" + (f" ({details})" if details else ""))
+    return IndexedKNN(knn, index)
@@ -8,10 +8,19 @@ Handles the core prediction workflow:
 5. Return structured result
 """
 
+import time
+from typing import Optional
 import numpy as np
 from app.models import ml_model
+from app.core import metrics, profiling
+from app.core.config import settings
+from app.engine import HIGH_RISK_THRESHOLD, MEDIUM_RISK_THRESHOLD
+from app.models.compact import load_compact_knn
+from app.models.compiled import compile_artifacts, is_compiled
+from app.models.lookup import load_lookup_table
+from app.models.neighbors import load_indexed_model
 from app.schemas.heart import HeartDiseaseInput, HeartDiseasePrediction
-from app.utils.preprocessing import preprocess_input
+from app.utils.preprocessing import extract_features, preprocess_batch
 
 
 class HeartDiseasePredictor:
@@ -21,10 +30,70 @@ class HeartDiseasePredictor:
     Applies risk thresholds to probability scores.
     """
     
-    def __init__(self):
-        """Initialize predictor with loaded model and scaler."""
-        self.model = ml_model.get_model()
-        self.scaler = ml_model.get_scaler()
+    def __init__(self, artifacts: Optional[tuple] = None, primary: Optional[bool] = None):
+        """Initialize predictor with loaded model and scaler.
+        
+        With settings.inference_engine == "compiled" the artifacts are
+        compiled into plain NumPy arrays; unsupported artifacts fall back
+        to sklearn. With settings.neighbor_index_enabled, KNN models search
+        the prebuilt neighbor index instead of every training row; otherwise
+        settings.knn_precision can narrow a compiled KNN's training matrix.
+        With settings.lookup_table_enabled, materialized cells are answered
+        from the precomputed lookup table.
+        
+        Args:
+            artifacts: (model, scaler, fingerprint) of a candidate model (see
+                app.models.registry); default: the artifacts loaded by
+                app.models.ml_model. The neighbor index and lookup table are
+                built for those, so candidates never use them.
+            primary: Whether artifacts are the serving model's (a hot reload
+                builds the new primary before installing its artifacts);
+                default: artifacts is None
+        """
+        if primary is None:
+            primary = artifacts is None
+        if artifacts is None:
+            self.model = ml_model.get_model()
+            self.scaler = ml_model.get_scaler()
+            self.fingerprint = ml_model.get_fingerprint()
+        else:
+            self.model, self.scaler, self.fingerprint = artifacts
+        self.version = self.fingerprint[:12]
+        self.record_metrics = settings.metrics_enabled  # Per-stage latency (app.core.metrics)
+        self.record_stages = settings.slow_request_threshold_ms > 0  # Slow request log stages
+        self.stage_sink = None  # List collecting stage timings instead (process pool workers)
+        self.engine = "sklearn"
+        
+        if is_compiled(self.model):
+            # Exported artifacts are already compiled
+            self.engine = "compiled"
+        elif settings.inference_engine == "compiled":
+            try:
+                self.model, self.scaler = compile_artifacts(self.model, self.scaler)
+                self.engine = "compiled"
+            except ValueError as e:
+                print(f"✗ Compiled engine unavailable, using sklearn: {e}")
+        
+        # Optional neighbor index for large KNN training sets (see app.index)
+        if settings.neighbor_index_enabled and primary:
+            indexed = load_indexed_model(self.model, settings.neighbor_index_dir,
+                                         self.fingerprint, settings.neighbor_index_n_probe)
+            if indexed is not None:
+                self.model = indexed
+                self.engine = f"indexed ({indexed.index.kind})"
+        
+        # Optional compact training matrix for brute-force compiled KNN
+        if settings.knn_precision != "float64":
+            compact = load_compact_knn(self.model, settings.knn_precision,
+                                       check=settings.knn_precision_check)
+            if compact is not None:
+                self.model = compact
+                self.engine = f"compiled ({settings.knn_precision})"
+        
+        # Optional precomputed lookup table (see app.materialize)
+        self.lookup = None
+        if settings.lookup_table_enabled and primary:
+            self.lookup = load_lookup_table(settings.lookup_table_dir, self.fingerprint)
     
     def predict(self, data: HeartDiseaseInput) -> HeartDiseasePrediction:
         """Make prediction for heart disease.
@@ -39,35 +108,172 @@ class HeartDiseasePredictor:
             ValueError: If prediction fails
         """
         try:
+            raw = extract_features(data)
+        except AttributeError as e:
+            raise ValueError(f"Prediction failed: missing feature {e}")
+        return self.predict_features(raw)
+    
+    def predict_features(self, raw: np.ndarray) -> HeartDiseasePrediction:
+        """Make a prediction for one validated raw feature vector.
+        
+        Args:
+            raw: Unscaled float64 array of shape (13,) in FEATURE_ORDER
+            
+        Returns:
+            HeartDiseasePrediction with prediction, probability, and risk level
+            
+        Raises:
+            ValueError: If prediction fails
+        """
+        try:
+            timed = self.record_metrics or self.record_stages
+            if timed:
+                started = time.perf_counter()
+            
+            # Step 0: Answer from the lookup table if this cell is materialized
+            if self.lookup is not None:
+                hit = self.lookup.get(raw)
+                if hit is not None:
+                    label, probability = hit
+                    if timed:
+                        self.observe_stages({"lookup": time.perf_counter() - started})
+                    return self.build_result(bool(label == 1), probability)
+            if timed:
+                extracted = time.perf_counter()
+            
             # Step 1: Preprocess input (scale features)
-            features = preprocess_input(data, self.scaler)
+            features = preprocess_batch(raw.reshape(1, -1), self.scaler)
+            if timed:
+                scaled = time.perf_counter()
             
-            # Step 2: Get probability predictions
+            # Step 2: Get class labels and probability predictions
             # predict_proba returns array of shape (n_samples, n_classes)
             # For binary classification: [[prob_class_0, prob_class_1]]
-            prediction_proba = self.model.predict_proba(features)[0]
+            labels, prediction_proba = self._predict_scaled(features)
+            if timed:
+                predicted = time.perf_counter()
             
             # Step 3: Extract probability of positive class (heart disease)
-            probability = float(prediction_proba[1])
+            probability = float(prediction_proba[0, 1])
             
             # Step 4: Make binary prediction (0 or 1)
-            prediction_class = int(self.model.predict(features)[0])
+            prediction_class = int(labels[0])
             
             # Step 5: Convert to boolean
             has_disease = bool(prediction_class == 1)
             
-            # Step 6: Determine risk level based on probability thresholds
-            risk_level = self._get_risk_level(probability)
+            # Step 6: Apply risk thresholds and return structured response
+            result = self.build_result(has_disease, probability)
+            if timed:
+                self.observe_stages({
+                    "preprocess": extracted - started,
+                    "scale": scaled - extracted,
+                    "predict_proba": predicted - scaled,
+                    "postprocess": time.perf_counter() - predicted
+                })
+            return result
             
-            # Step 7: Return structured response
-            return HeartDiseasePrediction(
-                prediction=has_disease,
-                probability=round(probability, 4),
-                risk_level=risk_level
-            )
+        except Exception as e:
+            raise ValueError(f"Prediction failed: {str(e)}")
+    
+    def observe_stages(self, stages: dict):
+        """Report stage durations (seconds) to the enabled consumers.
+        
+        With a stage_sink set they are only collected there, for the
+        process that owns the metrics to report.
+        """
+        if self.stage_sink is not None:
+            self.stage_sink.append(stages)
+            return
+        if self.record_metrics:
+            metrics.observe_stages(self.version, stages)
+        if self.record_stages:
+            profiling.record_stages(stages)
+    
+    def build_result(self, has_disease: bool, probability: float) -> HeartDiseasePrediction:
+        """Build the API response for one scored row.
+        
+        Args:
+            has_disease: Predicted class (True = heart disease)
+            probability: Unrounded probability of heart disease
+            
+        Returns:
+            HeartDiseasePrediction with rounded probability and risk level
+        """
+        return HeartDiseasePrediction(
+            prediction=has_disease,
+            probability=round(probability, 4),
+            risk_level=self._get_risk_level(probability)
+        )
+    
+    def _predict_scaled(self, features: np.ndarray):
+        """Run the model on scaled features.
+        
+        With settings.single_pass_inference the class label is derived from
+        predict_proba (argmax over classes_, first class wins ties, same as
+        the estimator's own predict), so the model runs once instead of twice.
+        
+        Args:
+            features: Scaled feature array of shape (n, 13)
+            
+        Returns:
+            Tuple of (labels, probabilities) with shapes (n,) and (n, n_classes)
+        """
+        proba = self.model.predict_proba(features)
+        if settings.single_pass_inference:
+            labels = self.model.classes_.take(np.argmax(proba, axis=1))
+        else:
+            labels = self.model.predict(features)
+        return labels, proba
+    
+    def predict_batch(self, features: np.ndarray):
+        """Make predictions for a matrix of raw (unscaled) features.
+        
+        Rows are processed in chunks of settings.batch_chunk_size, with one
+        scaler.transform and one model call per chunk (for rows not answered
+        by the lookup table).
+        
+        Args:
+            features: float64 array of shape (n, 13) in FEATURE_ORDER
+            
+        Returns:
+            Tuple of (predictions, probabilities):
+            - predictions: bool array of shape (n,)
+            - probabilities: float64 array of shape (n,), positive class
             
+        Raises:
+            ValueError: If prediction fails
+        """
+        n_rows = features.shape[0]
+        predictions = np.zeros(n_rows, dtype=bool)
+        probabilities = np.zeros(n_rows, dtype=np.float64)
+        chunk_size = max(1, settings.batch_chunk_size)
+        
+        try:
+            for start in range(0, n_rows, chunk_size):
+                stop = min(start + chunk_size, n_rows)
+                chunk = features[start:stop]
+                
+                # Rows with a materialized cell skip the model entirely
+                if self.lookup is not None:
+                    found, labels, proba = self.lookup.get_batch(chunk)
+                    probabilities[start:stop][found] = proba[found]
+                    predictions[start:stop][found] = labels[found] == 1
+                    missing = np.flatnonzero(~found)
+                    if missing.size == 0:
+                        continue
+                    chunk = chunk[missing]
+                else:
+                    missing = slice(None)
+                
+                scaled = preprocess_batch(chunk, self.scaler)
+                labels, proba = self._predict_scaled(scaled)
+                probabilities[start:stop][missing] = proba[:, 1]
+                predictions[start:stop][missing] = labels == 1
         except Exception as e:
             raise ValueError(f"Prediction failed: {str(e)}")
+        
+        return predictions, probabilities
     
     def _get_risk_level(self, probability: float) -> str:
         """Categorize risk level based on probability threshold.
@@ -83,9 +289,9 @@ class HeartDiseasePredictor:
         Returns:
             Risk level string: "High", "Medium", or "Low"
         """
-        if probability >= 0.7:
+        if probability >= HIGH_RISK_THRESHOLD:
             return "High"
-        elif probability >= 0.4:
+        elif probability >= MEDIUM_RISK_THRESHOLD:
             return "Medium"
         else:
             return "Low"
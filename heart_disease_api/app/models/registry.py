@@ -0,0 +1,301 @@
+"""Model registry: candidate models served and shadowed next to the primary.
+
+The primary model is the one configured by settings.model_path (or
+settings.exported_artifacts_dir) and hot-reloaded by app.models.manager.
+Candidates - a retrained KNN with another k, a logistic model, ... - are
+listed in a JSON file at settings.model_registry_path:
+
+    {
+      "primary": "knn-v1",
+      "models": [
+        {"name": "knn-k7", "model_path": "candidates/knn-k7.pkl",
+         "scaler_path": "scaler.pkl", "weight": 0.1},
+        {"name": "logreg-v1", "exported_dir": "candidates/logreg", "shadow": true}
+      ]
+    }
+
+Relative paths are resolved against the file's directory. Each candidate
+is a HeartDiseasePredictor of its own (pickled model and scaler, or an
+export written by python -m app.export), versioned by the fingerprint of
+its artifacts like the primary.
+
+Routing (POST /predict and /predict/batch): a request naming a model in
+the settings.model_header header is served by it; otherwise each
+candidate serves its "weight" share of requests at random and the
+primary the rest. Candidates flagged "shadow" also score every request
+they did not serve, in the background (see app.models.shadow).
+
+Without the file only the primary model serves.
+"""
+
+import json
+import random
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from app.core.config import settings
+from app.models import ml_model
+from app.models.cache import prune_caches
+from app.models.exported import load_exported
+from app.models.predictor import HeartDiseasePredictor
+
+_ENTRY_KEYS = {"name", "model_path", "scaler_path", "exported_dir", "weight", "shadow"}
+
+
+class UnknownModelError(LookupError):
+    """Raised when a request names a model that is not registered."""
+
+
+class RegisteredModel(NamedTuple):
+    """A candidate model and its routing configuration."""
+    name: str
+    predictor: HeartDiseasePredictor
+    weight: float  # Share of requests without a model header
+    shadow: bool  # Scores the requests it does not serve, in the background
+    source: str  # Artifact path(s) it was loaded from
+
+
+class _Snapshot(NamedTuple):
+    """Registry contents, replaced in one assignment on reload."""
+    primary_name: str
+    models: Dict[str, RegisteredModel]
+    weighted: List[Tuple[float, RegisteredModel]]  # (cumulative weight, model)
+
+
+def read_registry_file(path: Path) -> Tuple[str, List[dict]]:
+    """Parse and validate a registry file.
+
+    Args:
+        path: JSON registry file (see module docstring)
+
+    Returns:
+        Tuple of (primary model name, entries) with paths resolved
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+        ValueError: If the file is malformed
+    """
+    path = Path(path)
+    try:
+        config = json.loads(path.read_text())
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid registry file {path}: {e}")
+    if not isinstance(config, dict) or not isinstance(config.get("models", []), list):
+        raise ValueError(f"Registry file {path} must be an object with a 'models' list")
+
+    primary = config.get("primary", "primary")
+    names = {primary}
+    entries = []
+    total_weight = 0.0
+    for entry in config.get("models", []):
+        if not isinstance(entry, dict) or not isinstance(entry.get("name"), str):
+            raise ValueError("Every registry entry needs a 'name'")
+        name = entry["name"]
+        unknown = set(entry) - _ENTRY_KEYS
+        if unknown:
+            raise ValueError(f"Model '{name}': unknown keys {sorted(unknown)}")
+        if name in names:
+            raise ValueError(f"Model name '{name}' is used twice")
+        names.add(name)
+
+        resolved = {"name": name, "weight": float(entry.get("weight", 0.0)),
+                    "shadow": bool(entry.get("shadow", False))}
+        if "exported_dir" in entry:
+            if "model_path" in entry or "scaler_path" in entry:
+                raise ValueError(f"Model '{name}': give exported_dir or model_path and "
+                                 f"scaler_path, not both")
+            resolved["exported_dir"] = path.parent / entry["exported_dir"]
+        elif "model_path" in entry and "scaler_path" in entry:
+            resolved["model_path"] = path.parent / entry["model_path"]
+            resolved["scaler_path"] = path.parent / entry["scaler_path"]
+        else:
+            raise ValueError(f"Model '{name}': needs exported_dir, or model_path and scaler_path")
+
+        if not 0.0 <= resolved["weight"] <= 1.0:
+            raise ValueError(f"Model '{name}': weight must be between 0 and 1")
+        total_weight += resolved["weight"]
+        entries.append(resolved)
+
+    if total_weight > 1.0 + 1e-9:
+        raise ValueError(f"Candidate weights add up to {total_weight:g}, more than 1")
+    return primary, entries
+
+
+def load_candidate(entry: dict) -> HeartDiseasePredictor:
+    """Build the predictor of one registry entry (see read_registry_file)."""
+    if "exported_dir" in entry:
+        artifacts = load_exported(entry["exported_dir"])
+    else:
+        artifacts = ml_model.load_artifact_files(entry["model_path"], entry["scaler_path"])
+    return HeartDiseasePredictor(artifacts)
+
+
+class ModelRegistry:
+    """Candidate models next to the primary, and the request router."""
+
+    def __init__(self, path: Path):
+        """Initialize an empty registry (candidates are loaded by load/prepare).
+
+        Args:
+            path: JSON registry file; a missing file means no candidates
+        """
+        self.path = Path(path)
+        self._snapshot = _Snapshot("primary", {}, [])
+        self.loaded_at = None
+
+        # Metrics (this process only; updated on the event loop thread)
+        self.routed = Counter()
+
+    @property
+    def primary_name(self) -> str:
+        """Name of the primary model (for headers, logs and statistics)."""
+        return self._snapshot.primary_name
+
+    @property
+    def snapshot(self) -> _Snapshot:
+        """Current registry contents (to activate in another process)."""
+        return self._snapshot
+
+    @property
+    def models(self) -> Dict[str, RegisteredModel]:
+        """Registered candidates by name."""
+        return self._snapshot.models
+
+    def prepare(self, warm_up: Optional[Callable[[HeartDiseasePredictor], None]] = None
+                ) -> _Snapshot:
+        """Load every candidate in the registry file (blocking).
+
+        Args:
+            warm_up: Called with each candidate's predictor once it is built
+
+        Returns:
+            The loaded registry, to pass to activate
+
+        Raises:
+            ValueError: If the file is malformed or a candidate cannot be loaded
+        """
+        if not self.path.exists():
+            return _Snapshot("primary", {}, [])
+        primary, entries = read_registry_file(self.path)
+
+        models = {}
+        for entry in entries:
+            source = str(entry.get("exported_dir") or entry["model_path"])
+            try:
+                predictor = load_candidate(entry)
+                if warm_up is not None:
+                    warm_up(predictor)
+            except Exception as e:
+                raise ValueError(f"Candidate model '{entry['name']}' not loaded from {source}: {e}")
+            models[entry["name"]] = RegisteredModel(entry["name"], predictor, entry["weight"],
+                                                    entry["shadow"], source)
+
+        weighted = []
+        cumulative = 0.0
+        for model in models.values():
+            if model.weight > 0:
+                cumulative += model.weight
+                weighted.append((cumulative, model))
+        return _Snapshot(primary, models, weighted)
+
+    def activate(self, snapshot: _Snapshot):
+        """Swap in a registry built by prepare (a single assignment).
+
+        Prediction caches of candidates the new registry no longer has are
+        dropped.
+        """
+        self._snapshot = snapshot
+        self.loaded_at = time.time()
+        prune_caches(snapshot.models)
+        for model in snapshot.models.values():
+            roles = []
+            if model.weight > 0:
+                roles.append(f"weight {model.weight:.0%}")
+            if model.shadow:
+                roles.append("shadow")
+            print(f"✓ Candidate model {model.name} ({model.predictor.version}, "
+                  f"{model.predictor.engine}) from {model.source}: "
+                  f"{', '.join(roles) or 'header only'}")
+
+    def load(self, warm_up: Optional[Callable[[HeartDiseasePredictor], None]] = None):
+        """Load the registry file and swap it in (blocking; see prepare)."""
+        self.activate(self.prepare(warm_up))
+
+    def get(self, name: str) -> HeartDiseasePredictor:
+        """Predictor of a registered candidate.
+
+        Raises:
+            UnknownModelError: If no candidate has that name
+        """
+        model = self._snapshot.models.get(name)
+        if model is None:
+            raise UnknownModelError(f"Unknown model '{name}'")
+        return model.predictor
+
+    def route(self, requested: Optional[str] = None) -> Optional[RegisteredModel]:
+        """Pick the model serving a request.
+
+        Args:
+            requested: Model named by the request (settings.model_header), if any
+
+        Returns:
+            The candidate serving it, or None for the primary model
+
+        Raises:
+            UnknownModelError: If requested is neither the primary nor a candidate
+        """
+        snapshot = self._snapshot
+        model = None
+        if requested:
+            if requested != snapshot.primary_name:
+                model = snapshot.models.get(requested)
+                if model is None:
+                    raise UnknownModelError(
+                        f"Unknown model '{requested}' (registered: "
+                        f"{', '.join([snapshot.primary_name, *snapshot.models])})"
+                    )
+        elif snapshot.weighted:
+            draw = random.random()
+            for cumulative, candidate in snapshot.weighted:
+                if draw < cumulative:
+                    model = candidate
+                    break
+        self.routed[snapshot.primary_name if model is None else model.name] += 1
+        return model
+
+    def shadows(self, served: Optional[str] = None) -> List[RegisteredModel]:
+        """Shadow candidates for a request served by the named model (None = primary)."""
+        return [model for model in self._snapshot.models.values()
+                if model.shadow and model.name != served]
+
+    def stats(self) -> dict:
+        """Return the registered models and routing counters."""
+        snapshot = self._snapshot
+        candidate_weight = sum(model.weight for model in snapshot.models.values())
+        return {
+            "path": str(self.path),
+            "loaded_at": self.loaded_at,
+            "header": settings.model_header or None,
+            "primary": {
+                "name": snapshot.primary_name,
+                "weight": round(1.0 - candidate_weight, 6),
+                "routed": self.routed[snapshot.primary_name]
+            },
+            "candidates": {
+                model.name: {
+                    "version": model.predictor.version,
+                    "fingerprint": model.predictor.fingerprint,
+                    "engine": model.predictor.engine,
+                    "source": model.source,
+                    "weight": model.weight,
+                    "shadow": model.shadow,
+                    "routed": self.routed[model.name]
+                }
+                for model in snapshot.models.values()
+            }
+        }
+
+
+# Singleton instance
+model_registry = ModelRegistry(settings.model_registry_path)
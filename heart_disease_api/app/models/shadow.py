@@ -0,0 +1,532 @@
+"""Shadow scoring: candidate models scored on live traffic, off the critical path.
+
+Once a prediction request has been answered, its feature rows and the
+served predictions are handed to a bounded queue. Background threads
+score them with every shadow model in the registry (app.models.registry)
+that did not serve the request, and compare. Requests never wait for
+this: submit() only copies the rows (at most settings.shadow_max_rows
+per request) and enqueues them without blocking. A worker gathers the
+jobs arriving within settings.shadow_batch_wait_ms and scores them in one
+call per shadow model, so shadow work competes with request threads for
+the GIL once per batch rather than once per request.
+
+Shadow work is dropped, never queued without limit:
+
+    load        - every inference executor worker is busy, checked on
+                  submit and again when a job is picked up
+    queue_full  - settings.shadow_max_queue jobs are already waiting
+
+Results go to settings.shadow_sink, one row per (request row, shadow
+model) with the served and shadow prediction, probability and risk code:
+
+    sqlite - table shadow_results, shared by every worker on the host;
+             the admin API summarizes agreement across workers from it
+    jsonl  - one JSON object per line, appended
+    none   - agreement statistics in memory only
+
+Agreement statistics per shadow model and served model (this worker) are
+kept in memory: label and risk level agreement, probability differences,
+scoring time. The served probability of a single prediction is the
+rounded one from the response.
+"""
+
+import itertools
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+import numpy as np
+from app.core import metrics
+from app.core.config import settings
+from app.core.executor import inference_executor
+from app.engine import risk_codes
+from app.models.registry import ModelRegistry, RegisteredModel, model_registry
+
+
+class ShadowJob(NamedTuple):
+    """Rows answered by one request, waiting to be shadow scored."""
+    served_model: str
+    served_version: str
+    features: np.ndarray  # Raw rows, shape (n, 13)
+    predictions: np.ndarray  # Served labels (bool)
+    probabilities: np.ndarray  # Served probabilities of heart disease
+    shadows: List[RegisteredModel]
+
+
+def _under_load() -> bool:
+    """Whether every inference worker is busy (shadow work would compete with it)."""
+    return inference_executor.pending >= inference_executor.max_workers
+
+
+def _merge(jobs: List[ShadowJob]) -> ShadowJob:
+    """Concatenate jobs of one served model (see ShadowScorer._collect)."""
+    if len(jobs) == 1:
+        return jobs[0]
+    return jobs[0]._replace(
+        features=np.concatenate([job.features for job in jobs]),
+        predictions=np.concatenate([job.predictions for job in jobs]),
+        probabilities=np.concatenate([job.probabilities for job in jobs]),
+        shadows=jobs[-1].shadows  # Latest registry (a reload may have happened meanwhile)
+    )
+
+
+class SQLiteShadowSink:
+    """Shadow results in a SQLite file shared by all worker processes.
+
+    Each process opens its own connection on first use (after any fork),
+    in WAL mode like the SQLite idempotency store.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, path: Path):
+        """Initialize the sink (the file is created on first write).
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self._connection_pid = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection for this process (lock must be held)."""
+        if self._connection_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False,
+                                         isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS shadow_results ("
+                "created_at REAL NOT NULL, served_model TEXT NOT NULL, "
+                "served_version TEXT NOT NULL, shadow_model TEXT NOT NULL, "
+                "shadow_version TEXT NOT NULL, features TEXT NOT NULL, "
+                "served_prediction INTEGER NOT NULL, served_probability REAL NOT NULL, "
+                "served_risk INTEGER NOT NULL, shadow_prediction INTEGER NOT NULL, "
+                "shadow_probability REAL NOT NULL, shadow_risk INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS shadow_results_model "
+                "ON shadow_results (shadow_model, created_at)"
+            )
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+    def write(self, rows: List[tuple]):
+        """Append result rows (see ShadowScorer._score for the columns)."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN")
+                connection.executemany(
+                    "INSERT INTO shadow_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+    def summary(self) -> dict:
+        """Agreement per shadow model and served model over every row (all workers)."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT shadow_model, shadow_version, served_model, COUNT(*), "
+                "AVG(served_prediction = shadow_prediction), AVG(served_risk = shadow_risk), "
+                "AVG(ABS(served_probability - shadow_probability)), "
+                "MAX(ABS(served_probability - shadow_probability)), "
+                "MIN(created_at), MAX(created_at) "
+                "FROM shadow_results GROUP BY shadow_model, shadow_version, served_model"
+            ).fetchall()
+        summary = {}
+        for (model, version, served_model, count, label_agreement, risk_agreement, mean_diff,
+             max_diff, first_at, last_at) in rows:
+            summary.setdefault(f"{model}@{version}", {})[served_model] = {
+                "rows": count,
+                "label_agreement": label_agreement,
+                "risk_level_agreement": risk_agreement,
+                "mean_abs_probability_diff": mean_diff,
+                "max_abs_probability_diff": max_diff,
+                "first_at": first_at,
+                "last_at": last_at
+            }
+        return summary
+
+    def clear(self):
+        """Remove all stored results."""
+        with self._lock:
+            self._connect().execute("DELETE FROM shadow_results")
+
+
+class JSONLShadowSink:
+    """Shadow results appended to a JSON Lines file."""
+
+    kind = "jsonl"
+    _COLUMNS = ("created_at", "served_model", "served_version", "shadow_model",
+                "shadow_version", "features", "served_prediction", "served_probability",
+                "served_risk", "shadow_prediction", "shadow_probability", "shadow_risk")
+
+    def __init__(self, path: Path):
+        """Initialize the sink (the file is created on first write).
+
+        Args:
+            path: JSON Lines file
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def write(self, rows: List[tuple]):
+        """Append result rows, one JSON object each."""
+        lines = []
+        for row in rows:
+            record = dict(zip(self._COLUMNS, row))
+            record["features"] = json.loads(record["features"])
+            lines.append(json.dumps(record) + "\n")
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.writelines(lines)
+
+    def summary(self) -> Optional[dict]:
+        """Not available for JSON Lines (use the in-memory statistics)."""
+        return None
+
+    def clear(self):
+        """Truncate the file."""
+        with self._lock:
+            if self.path.exists():
+                self.path.write_text("")
+
+
+def create_shadow_sink():
+    """Build the sink selected by settings.shadow_sink (None = statistics only)."""
+    if settings.shadow_sink == "sqlite":
+        return SQLiteShadowSink(settings.shadow_sink_path)
+    if settings.shadow_sink == "jsonl":
+        return JSONLShadowSink(settings.shadow_sink_path)
+    return None
+
+
+class _Agreement:
+    """Running agreement statistics of one shadow model."""
+
+    def __init__(self, version: str):
+        self.version = version
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+        self.label_agreements = 0
+        self.risk_agreements = 0
+        self.served_only_positive = 0  # Served True, shadow False
+        self.shadow_only_positive = 0  # Served False, shadow True
+        self.abs_diff_sum = 0.0
+        self.abs_diff_max = 0.0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        rows = max(1, self.rows)
+        return {
+            "version": self.version,
+            "requests": self.requests,
+            "batches": self.batches,
+            "rows": self.rows,
+            "label_agreement": self.label_agreements / rows,
+            "risk_level_agreement": self.risk_agreements / rows,
+            "served_only_positive": self.served_only_positive,
+            "shadow_only_positive": self.shadow_only_positive,
+            "mean_abs_probability_diff": self.abs_diff_sum / rows,
+            "max_abs_probability_diff": self.abs_diff_max,
+            "mean_batch_ms": round(self.seconds / max(1, self.batches) * 1000, 3)
+        }
+
+
+class ShadowScorer:
+    """Bounded background queue scoring shadow models after requests are answered."""
+
+    def __init__(self, registry: ModelRegistry, workers: int, max_queue: int,
+                 sample_rate: float = 1.0, max_rows: int = 1024, batch_wait_ms: float = 0.0,
+                 sink=None):
+        """Configure the scorer (worker threads start on the first job).
+
+        Args:
+            registry: Registry whose shadow candidates score the jobs
+            workers: Background threads
+            max_queue: Jobs allowed to wait; further jobs are dropped
+            sample_rate: Fraction of requests shadowed
+            max_rows: Rows of a request shadowed (the first ones), and most
+                rows scored in one batch
+            batch_wait_ms: How long a worker gathers further jobs before
+                scoring (0 = one request at a time)
+            sink: SQLiteShadowSink, JSONLShadowSink or None
+        """
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.max_rows = max(1, max_rows)
+        self.batch_wait_ms = max(0.0, batch_wait_ms)
+        self.sink = sink
+        self.registry = registry
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+        # Metrics (this process only)
+        self.submitted = 0
+        self.dropped = Counter()
+        self.failed = 0
+        self.last_error = None
+        self._agreement = {}
+
+    def submit(self, served_model: str, served_version: str, features: np.ndarray,
+               predictions, probabilities) -> bool:
+        """Queue served rows for the shadow models (never blocks).
+
+        Args:
+            served_model: Name of the model that answered the request
+            served_version: Its version
+            features: Raw rows that were scored, shape (n, 13)
+            predictions: Served labels, shape (n,)
+            probabilities: Served probabilities, shape (n,)
+
+        Returns:
+            True if the job was queued; False if there is nothing to shadow,
+            the request was not sampled or the job was dropped
+        """
+        shadows = self.registry.shadows(served_model)
+        if not shadows or len(features) == 0:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if _under_load():
+            self._drop("load")
+            return False
+
+        rows = min(len(features), self.max_rows)
+        job = ShadowJob(
+            served_model, served_version,
+            np.array(features[:rows], dtype=np.float64),
+            np.array(predictions[:rows], dtype=bool),
+            np.array(probabilities[:rows], dtype=np.float64),
+            shadows
+        )
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._drop("queue_full")
+            return False
+        with self._lock:
+            self.submitted += 1
+        self._ensure_started()
+        return True
+
+    def _drop(self, reason: str):
+        with self._lock:
+            self.dropped[reason] += 1
+        if settings.metrics_enabled:
+            metrics.SHADOW_JOBS.labels(f"dropped_{reason}").inc()
+
+    def _ensure_started(self):
+        """Start the worker threads (in this process) on first use."""
+        if len(self._threads) < self.workers:
+            with self._lock:
+                while len(self._threads) < self.workers:
+                    thread = threading.Thread(target=self._run, daemon=True,
+                                              name=f"shadow-{len(self._threads)}")
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _run(self):
+        """Worker loop: score queued jobs until a None sentinel arrives."""
+        while True:
+            jobs = self._collect()
+            scored = [job for job in jobs if job is not None]
+            try:
+                if scored and _under_load():
+                    # Queued while idle, but requests are waiting now
+                    for _ in scored:
+                        self._drop("load")
+                elif scored:
+                    for _, group in itertools.groupby(
+                        scored, key=lambda job: (job.served_model, job.served_version)
+                    ):
+                        group = list(group)
+                        self._score(_merge(group), len(group))
+                    if settings.metrics_enabled:
+                        metrics.SHADOW_JOBS.labels("scored").inc(len(scored))
+            except Exception as e:
+                with self._lock:
+                    self.failed += len(scored)
+                    self.last_error = str(e)
+                if settings.metrics_enabled:
+                    metrics.SHADOW_JOBS.labels("failed").inc(len(scored))
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+            if len(scored) < len(jobs):
+                return
+
+    def _collect(self) -> list:
+        """Wait for a job, then gather more for up to batch_wait_ms.
+
+        Jobs of the same served model are scored in one predict_batch call
+        per shadow model, so shadow work holds the GIL once per batch
+        instead of once per request. Stops early at max_rows rows, a job
+        for another served model, or a None sentinel.
+        """
+        jobs = [self._queue.get()]
+        if jobs[0] is None or self.batch_wait_ms <= 0:
+            return jobs
+        rows = len(jobs[0].features)
+        deadline = time.monotonic() + self.batch_wait_ms / 1000
+        while rows < self.max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            if (job is None or job.served_model != jobs[0].served_model
+                    or job.served_version != jobs[0].served_version):
+                break
+            rows += len(job.features)
+        return jobs
+
+    def _score(self, job: ShadowJob, requests: int = 1):
+        """Score a job with each of its shadow models and record the comparison.
+
+        Args:
+            job: Rows to score (possibly merged from several requests)
+            requests: Requests the job's rows came from
+        """
+        served_risk = risk_codes(job.probabilities)
+        scored_at = time.time()
+        sink_rows = []
+        feature_text = ([json.dumps(row) for row in job.features.tolist()]
+                        if self.sink is not None else None)
+
+        for model in job.shadows:
+            started = time.perf_counter()
+            predictions, probabilities = model.predictor.predict_batch(job.features)
+            elapsed = time.perf_counter() - started
+            shadow_risk = risk_codes(probabilities)
+            diff = np.abs(probabilities - job.probabilities)
+
+            with self._lock:
+                key = (model.name, job.served_model)
+                agreement = self._agreement.get(key)
+                if agreement is None or agreement.version != model.predictor.version:
+                    # New model, or a different version under the same name
+                    agreement = self._agreement[key] = _Agreement(model.predictor.version)
+                agreement.requests += requests
+                agreement.batches += 1
+                agreement.rows += len(predictions)
+                agreement.label_agreements += int(np.sum(predictions == job.predictions))
+                agreement.risk_agreements += int(np.sum(shadow_risk == served_risk))
+                agreement.served_only_positive += int(np.sum(job.predictions & ~predictions))
+                agreement.shadow_only_positive += int(np.sum(~job.predictions & predictions))
+                agreement.abs_diff_sum += float(diff.sum())
+                agreement.abs_diff_max = max(agreement.abs_diff_max, float(diff.max()))
+                agreement.seconds += elapsed
+
+            if self.sink is not None:
+                sink_rows.extend(zip(
+                    [scored_at] * len(predictions),
+                    [job.served_model] * len(predictions),
+                    [job.served_version] * len(predictions),
+                    [model.name] * len(predictions),
+                    [model.predictor.version] * len(predictions),
+                    feature_text,
+                    job.predictions.astype(int).tolist(),
+                    job.probabilities.tolist(),
+                    served_risk.tolist(),
+                    predictions.astype(int).tolist(),
+                    probabilities.tolist(),
+                    shadow_risk.tolist()
+                ))
+
+        if sink_rows:
+            self.sink.write(sink_rows)
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued job has been scored (tests and benchmarks).
+
+        Returns:
+            False if jobs were still pending after timeout seconds
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop the worker threads; jobs still waiting are discarded."""
+        while True:
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+            except queue.Empty:
+                break
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        for thread in threads:
+            thread.join(timeout)
+
+    def reset(self):
+        """Clear the in-memory statistics and the sink."""
+        with self._lock:
+            self.submitted = 0
+            self.dropped.clear()
+            self.failed = 0
+            self.last_error = None
+            self._agreement.clear()
+        if self.sink is not None:
+            self.sink.clear()
+
+    def stats(self) -> dict:
+        """Return configuration, queue counters and agreement per shadow and served model."""
+        with self._lock:
+            models = {}
+            for (name, served_model), agreement in self._agreement.items():
+                models.setdefault(name, {})[served_model] = agreement.as_dict()
+            return {
+                "shadow_models": [model.name for model in self.registry.shadows()],
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self._queue.qsize(),
+                "sample_rate": self.sample_rate,
+                "max_rows": self.max_rows,
+                "batch_wait_ms": self.batch_wait_ms,
+                "submitted": self.submitted,
+                "dropped": {"load": self.dropped["load"],
+                            "queue_full": self.dropped["queue_full"]},
+                "failed": self.failed,
+                "last_error": self.last_error,
+                "sink": None if self.sink is None else {"kind": self.sink.kind,
+                                                        "path": str(self.sink.path)},
+                "models": models
+            }
+
+
+# Singleton instance
+shadow_scorer = ShadowScorer(
+    model_registry,
+    settings.shadow_workers,
+    settings.shadow_max_queue,
+    settings.shadow_sample_rate,
+    settings.shadow_max_rows,
+    settings.shadow_batch_wait_ms,
+    create_shadow_sink()
+)
@@ -0,0 +1,333 @@
+"""Prediction cache shared by all worker processes on the host.
+
+The in-process PredictionCache is private to each uvicorn worker, so with
+run.py --production every worker warms its own copy. This tier is a
+fixed-size hash table in a memory-mapped file (in /dev/shm by default, so
+it lives in shared memory) that every worker maps:
+
+    header   - magic, layout version, bucket count, current fingerprint
+    hands    - one CLOCK hand per bucket
+    slots    - BUCKET_SLOTS slots of SLOT_SIZE bytes per bucket
+
+A key (the 13 float64 features, compared exactly) hashes to one bucket
+and may live in any of its slots, so lookups probe at most BUCKET_SLOTS
+slots. Readers take no lock: each slot carries a sequence number that
+writers make odd while they write it (a seqlock), and a reader retries
+if it changed during the copy. Writers lock their bucket's stripe with
+an fcntl byte-range lock, so writes to different stripes never wait on
+each other. A full bucket evicts with CLOCK: a hit sets the slot's
+reference bit, and the hand skips (and clears) referenced slots once.
+
+Every slot stores the digest of the artifact fingerprint it was computed
+with, and the header holds the digest of the serving artifacts. activate()
+replaces the header digest in a single 8-byte store when the model
+changes; from then on no request for the new model can match an older
+entry, and older entries count as free slots. Workers still serving the
+old model may read older entries that have not been reused yet (they
+are correct for that model) but do not store results until they reload.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from app.core.config import settings
+from app.engine import RISK_LEVELS
+from app.schemas.heart import HeartDiseasePrediction
+from app.utils.preprocessing import FEATURE_ORDER
+
+MAGIC = b"HDPCACHE"
+LAYOUT_VERSION = 1
+BUCKET_SLOTS = 8
+N_STRIPES = 64
+HEADER_SIZE = 64
+
+# magic, layout version, n_buckets, current fingerprint digest, invalidations
+_HEADER = struct.Struct("<8sIIQQ")
+_FINGERPRINT_OFFSET = 16
+_INVALIDATIONS_OFFSET = 24
+
+# seq, ref bit, prediction, risk level, padding, fingerprint digest,
+# features, probability: 128 bytes
+_SLOT = struct.Struct(f"<IBBBBQ{len(FEATURE_ORDER)}dd")
+SLOT_SIZE = _SLOT.size
+_SEQ = struct.Struct("<I")
+_DIGEST = struct.Struct("<Q")
+_KEY_START, _KEY_END = 16, 16 + 8 * len(FEATURE_ORDER)
+
+_SLOT_DTYPE = np.dtype([
+    ("seq", "<u4"), ("ref", "u1"), ("prediction", "u1"), ("risk", "u1"), ("pad", "u1"),
+    ("fingerprint", "<u8"), ("features", "<f8", (len(FEATURE_ORDER),)), ("probability", "<f8")
+])
+assert _SLOT_DTYPE.itemsize == SLOT_SIZE
+
+
+@lru_cache(maxsize=8)
+def fingerprint_digest(fingerprint: str) -> int:
+    """64-bit digest of an artifact fingerprint (never 0, which marks empty slots)."""
+    digest = hashlib.blake2b(fingerprint.encode(), digest_size=8).digest()
+    return _DIGEST.unpack(digest)[0] or 1
+
+
+class SharedPredictionCache:
+    """Cross-process prediction cache in a memory-mapped file."""
+
+    def __init__(self, path: Path, slots: int):
+        """Initialize the cache (the file is created or mapped on first use).
+
+        Args:
+            path: Backing file; put it on tmpfs (/dev/shm) to keep it in memory
+            slots: Capacity in entries (rounded up to whole buckets)
+        """
+        self.path = Path(path)
+        self.n_buckets = max(1, -(-slots // BUCKET_SLOTS))
+        self._mm = None
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        # Metrics (this process only)
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.evictions = 0
+        self.skipped_puts = 0
+        self.read_retries = 0
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+
+    @property
+    def _hands_offset(self) -> int:
+        return HEADER_SIZE
+
+    @property
+    def _slots_offset(self) -> int:
+        # Hands padded to a whole cache line
+        return HEADER_SIZE + -(-self.n_buckets // 64) * 64
+
+    def _size(self) -> int:
+        return self._slots_offset + self.n_buckets * BUCKET_SLOTS * SLOT_SIZE
+
+    def _map(self) -> mmap.mmap:
+        """Mapping for this process, creating the file if needed."""
+        if self._pid == os.getpid():
+            return self._mm
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+        return self._mm
+
+    def _open(self):
+        """Create or validate the file and map it (lock must be held)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX, 1, N_STRIPES)
+        try:
+            header = os.pread(fd, _HEADER.size, 0)
+            if len(header) == _HEADER.size and header[:8] == MAGIC:
+                _, version, n_buckets, _, _ = _HEADER.unpack(header)
+                if version == LAYOUT_VERSION and n_buckets != self.n_buckets:
+                    # Another server owns this file: keep its geometry rather
+                    # than resizing a file that is mapped elsewhere
+                    print(f"✗ Shared prediction cache {self.path} has "
+                          f"{n_buckets * BUCKET_SLOTS:,} slots; using that size")
+                    self.n_buckets = n_buckets
+            else:
+                version = None
+            if version != LAYOUT_VERSION or os.fstat(fd).st_size < self._size():
+                os.ftruncate(fd, self._size())
+                os.pwrite(fd, _HEADER.pack(MAGIC, LAYOUT_VERSION, self.n_buckets, 0, 0), 0)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, N_STRIPES)
+        self._mm = mmap.mmap(fd, self._size())
+        self._fd, self._pid = fd, os.getpid()
+
+    def _bucket_offset(self, key: bytes) -> tuple:
+        bucket = zlib.crc32(key) % self.n_buckets
+        return bucket, self._slots_offset + bucket * BUCKET_SLOTS * SLOT_SIZE
+
+    # ------------------------------------------------------------------
+    # Cache operations
+    # ------------------------------------------------------------------
+
+    def get(self, features: np.ndarray, fingerprint: str) -> Optional[HeartDiseasePrediction]:
+        """Look up a prediction without taking any lock.
+
+        Args:
+            features: Raw float64 feature vector in FEATURE_ORDER
+            fingerprint: Fingerprint of the artifacts serving the request
+
+        Returns:
+            Cached HeartDiseasePrediction, or None on a miss
+        """
+        mm = self._map()
+        key = np.ascontiguousarray(features, dtype=np.float64).tobytes()
+        digest = _DIGEST.pack(fingerprint_digest(fingerprint))
+        _, base = self._bucket_offset(key)
+
+        for offset in range(base, base + BUCKET_SLOTS * SLOT_SIZE, SLOT_SIZE):
+            if mm[offset + 8:offset + 16] != digest:
+                continue
+            for _ in range(4):
+                slot = mm[offset:offset + SLOT_SIZE]
+                seq = _SEQ.unpack_from(slot)[0]
+                if seq & 1 == 0 and _SEQ.unpack_from(mm, offset)[0] == seq:
+                    break
+                self.read_retries += 1
+            else:
+                continue  # Being rewritten right now: treat as a miss
+            if slot[8:16] != digest or slot[_KEY_START:_KEY_END] != key:
+                continue
+
+            if not slot[4]:
+                mm[offset + 4] = 1  # CLOCK reference bit
+            self.hits += 1
+            _, _, prediction, risk, _, _, *_, probability = _SLOT.unpack(slot)
+            return HeartDiseasePrediction(prediction=bool(prediction), probability=probability,
+                                          risk_level=RISK_LEVELS[risk])
+        self.misses += 1
+        return None
+
+    def put(self, features: np.ndarray, fingerprint: str, value: HeartDiseasePrediction):
+        """Store a prediction, evicting with CLOCK if its bucket is full.
+
+        Skipped when fingerprint is not the active one (see activate), so a
+        worker still serving an old model cannot flip the cache back.
+
+        Args:
+            features: Raw float64 feature vector in FEATURE_ORDER
+            fingerprint: Fingerprint of the artifacts that produced the value
+            value: Prediction to cache
+        """
+        mm = self._map()
+        key = np.ascontiguousarray(features, dtype=np.float64).tobytes()
+        digest = fingerprint_digest(fingerprint)
+        bucket, base = self._bucket_offset(key)
+        stripe = bucket % N_STRIPES
+
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                current = _DIGEST.unpack_from(mm, _FINGERPRINT_OFFSET)[0]
+                if current != digest:
+                    self.skipped_puts += 1
+                    return
+                offset = self._choose_slot(mm, bucket, base, key, current)
+                seq = _SEQ.unpack_from(mm, offset)[0] | 1
+                _SEQ.pack_into(mm, offset, seq)  # Odd: readers retry
+                _SLOT.pack_into(mm, offset, seq, 0, value.prediction,
+                                RISK_LEVELS.index(value.risk_level), 0, digest,
+                                *np.frombuffer(key).tolist(), value.probability)
+                _SEQ.pack_into(mm, offset, (seq + 1) & 0xFFFFFFFF)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _choose_slot(self, mm: mmap.mmap, bucket: int, base: int, key: bytes,
+                     current: int) -> int:
+        """Offset of the slot to write (stripe lock must be held)."""
+        free = None
+        for offset in range(base, base + BUCKET_SLOTS * SLOT_SIZE, SLOT_SIZE):
+            slot_digest = _DIGEST.unpack_from(mm, offset + 8)[0]
+            if slot_digest == current:
+                if mm[offset + _KEY_START:offset + _KEY_END] == key:
+                    return offset  # Another worker stored it meanwhile
+            elif free is None:
+                free = offset  # Empty, or left by an older model
+        self.inserts += 1
+        if free is not None:
+            return free
+
+        # CLOCK: give referenced slots a second chance
+        hand_offset = self._hands_offset + bucket
+        hand = mm[hand_offset]
+        while True:
+            offset = base + hand * SLOT_SIZE
+            hand = (hand + 1) % BUCKET_SLOTS
+            if mm[offset + 4]:
+                mm[offset + 4] = 0
+            else:
+                mm[hand_offset] = hand
+                self.evictions += 1
+                return offset
+
+    def activate(self, fingerprint: str) -> bool:
+        """Make fingerprint the serving artifacts, invalidating older entries.
+
+        Called when a predictor starts serving (startup and hot reload).
+
+        Returns:
+            True if the cache held entries for different artifacts
+        """
+        mm = self._map()
+        digest = fingerprint_digest(fingerprint)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, N_STRIPES)
+        try:
+            previous = _DIGEST.unpack_from(mm, _FINGERPRINT_OFFSET)[0]
+            if previous == digest:
+                return False
+            # One aligned 8-byte store: every older entry stops matching at once
+            _DIGEST.pack_into(mm, _FINGERPRINT_OFFSET, digest)
+            if previous == 0:
+                return False  # New file: nothing to invalidate
+            invalidations = _DIGEST.unpack_from(mm, _INVALIDATIONS_OFFSET)[0]
+            _DIGEST.pack_into(mm, _INVALIDATIONS_OFFSET, invalidations + 1)
+            return True
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, N_STRIPES)
+
+    def clear(self):
+        """Remove all entries (from every worker)."""
+        mm = self._map()
+        for stripe in range(N_STRIPES):
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+        try:
+            mm[self._hands_offset:self._size()] = bytes(self._size() - self._hands_offset)
+        finally:
+            for stripe in range(N_STRIPES):
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def stats(self) -> dict:
+        """Return cache configuration, shared occupancy and this worker's counters."""
+        if not settings.shared_cache_enabled:
+            return {"enabled": False}
+        mm = self._map()
+        current, invalidations = struct.unpack_from("<QQ", mm, _FINGERPRINT_OFFSET)
+        slots = np.frombuffer(mm, dtype=_SLOT_DTYPE, count=self.n_buckets * BUCKET_SLOTS,
+                              offset=self._slots_offset)
+        size = int(np.count_nonzero(slots["fingerprint"] == current))
+        del slots
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "path": str(self.path),
+            "slots": self.n_buckets * BUCKET_SLOTS,
+            "bytes": self._size(),
+            "size": size,
+            "fill_ratio": round(size / (self.n_buckets * BUCKET_SLOTS), 4),
+            "invalidations": int(invalidations),
+            "fingerprint_digest": f"{current:016x}",
+            "worker_pid": os.getpid(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "inserts": self.inserts,
+            "evictions": self.evictions,
+            "skipped_puts": self.skipped_puts,
+            "read_retries": self.read_retries
+        }
+
+
+# Singleton instance
+shared_cache = SharedPredictionCache(
+    path=settings.shared_cache_path,
+    slots=settings.shared_cache_slots
+)
@@ -3,8 +3,8 @@
 Defines request and response models with validation.
 """
 
-from pydantic import BaseModel, Field
-from typing import Literal
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, List, Literal, Optional
 
 
 class HeartDiseaseInput(BaseModel):
@@ -142,3 +142,98 @@ class HeartDiseasePrediction(BaseModel):
                 "risk_level": "High"
             }
         }
+
+
+class HeartDiseaseBatchInput(BaseModel):
+    """Input schema for batch heart disease prediction.
+    
+    Accepts either a list of records (one object per patient, same fields
+    as HeartDiseaseInput) or a columnar payload (one list per feature).
+    Rows are validated individually so one bad row does not fail the batch.
+    """
+    
+    # List[Any]: an element that is not an object fails only its own row
+    records: Optional[List[Any]] = Field(
+        None,
+        description="List of patient records (same fields as /predict)"
+    )
+    columns: Optional[Dict[str, List[Any]]] = Field(
+        None,
+        description="Columnar payload: feature name -> list of values"
+    )
+    
+    @model_validator(mode="after")
+    def check_payload(self):
+        """Ensure exactly one of records / columns is provided."""
+        if (self.records is None) == (self.columns is None):
+            raise ValueError("Provide exactly one of 'records' or 'columns'")
+        return self
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "records": [
+                    {
+                        "age": 63,
+                        "sex": 1,
+                        "cp": 3,
+                        "trestbps": 145,
+                        "chol": 233,
+                        "fbs": 1,
+                        "restecg": 0,
+                        "thalach": 150,
+                        "exang": 0,
+                        "oldpeak": 2.3,
+                        "slope": 0,
+                        "ca": 0,
+                        "thal": 1
+                    }
+                ]
+            }
+        }
+
+
+class HeartDiseaseBatchItem(BaseModel):
+    """Result for a single row of a batch prediction.
+    
+    Successful rows carry prediction, probability and risk_level.
+    Rows that failed validation carry errors instead.
+    """
+    
+    index: int = Field(
+        ...,
+        description="Position of the row in the request"
+    )
+    prediction: Optional[bool] = Field(
+        None,
+        description="Prediction result (null if the row was invalid)"
+    )
+    probability: Optional[float] = Field(
+        None,
+        ge=0,
+        le=1,
+        description="Probability of having heart disease (null if the row was invalid)"
+    )
+    risk_level: Optional[Literal["Low", "Medium", "High"]] = Field(
+        None,
+        description="Risk level (null if the row was invalid)"
+    )
+    errors: Optional[List[Dict[str, Any]]] = Field(
+        None,
+        description="Validation errors for this row (null if the row was valid)"
+    )
+
+
+class HeartDiseaseBatchPrediction(BaseModel):
+    """Output schema for batch heart disease prediction.
+    
+    Results are returned in the same order as the input rows.
+    """
+    
+    total: int = Field(..., description="Number of rows received")
+    succeeded: int = Field(..., description="Number of rows scored")
+    failed: int = Field(..., description="Number of rows rejected by validation")
+    results: List[HeartDiseaseBatchItem] = Field(
+        ...,
+        description="Per-row results in input order"
+    )
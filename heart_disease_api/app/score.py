@@ -0,0 +1,350 @@
+"""Score large files offline, without the HTTP server.
+
+Reads CSV, NDJSON or Parquet in chunks, scores the chunks on a process
+pool and writes one result line per input row, in input order, in the
+same format as POST /api/predict/stream.
+
+Usage:
+    python -m app.score patients.csv --out scores.csv
+    python -m app.score patients.parquet --out scores.ndjson --workers 8
+    python -m app.score patients.csv --out scores.csv --resume
+
+The model is loaded once before the pool starts. Workers are forked from
+that process and share its memory copy-on-write; with
+ARTIFACT_FORMAT=exported they also share the memory-mapped arrays
+through the page cache. Platforms without fork load the model once per
+worker instead.
+
+Progress is checkpointed next to the output (<out>.checkpoint). After an
+interruption or failure, --resume continues from the last checkpoint if
+the input file and the model are unchanged.
+
+Parquet input requires pyarrow.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from app.core.config import settings
+from app.utils.preprocessing import FEATURE_ORDER, build_feature_matrix_from_columns
+from app.utils.streaming import (
+    csv_result_header,
+    format_results,
+    parse_csv_header,
+    parse_lines,
+    validate_records,
+)
+
+INPUT_FORMATS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+OUTPUT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+# Run settings a checkpoint must match to be resumed
+_CHECKPOINT_KEYS = ("input", "input_size", "input_mtime_ns", "input_format",
+                    "output_format", "fingerprint")
+
+# Predictor used by score_chunk: inherited through fork, else loaded per worker
+_predictor = None
+
+
+def _init_worker():
+    """Process pool initializer: load the predictor unless it was inherited."""
+    global _predictor
+    if _predictor is None:
+        from app.models.predictor import HeartDiseasePredictor
+        _predictor = HeartDiseasePredictor()
+
+
+def score_chunk(payload, input_format: str, header, output_format: str, offset: int):
+    """Parse, validate, score and format one chunk.
+
+    Args:
+        payload: Raw bytes of complete lines (csv/ndjson), or a dict of
+            feature name -> column values (parquet)
+        input_format: "csv", "ndjson" or "parquet"
+        header: CSV header from parse_csv_header (csv only)
+        output_format: "csv" or "ndjson"
+        offset: Index of the chunk's first row in the whole input
+
+    Returns:
+        Tuple of (text, rows, failed rows)
+    """
+    # Step 1: Parse and validate
+    if input_format == "parquet":
+        n_rows = len(payload[FEATURE_ORDER[0]])
+        features, row_indices, errors = build_feature_matrix_from_columns(payload)
+    else:
+        lines = [line.rstrip("\r") for line in payload.decode("utf-8", errors="replace").split("\n")]
+        records, parse_errors = parse_lines(lines, input_format, header)
+        n_rows = len(records)
+        features, row_indices, errors = validate_records(records, parse_errors)
+
+    # Step 2: Score
+    predictions, probabilities = _predictor.predict_batch(features)
+    risk_levels = [_predictor._get_risk_level(p) for p in probabilities.tolist()]
+
+    # Step 3: Format in input order
+    text = format_results(output_format, offset, n_rows, row_indices, predictions,
+                          probabilities, risk_levels, errors)
+    return text, n_rows, len(errors)
+
+
+def read_text_chunks(path: Path, chunk_size: int, start: int):
+    """Yield (payload, rows, end position) for CSV / NDJSON input.
+
+    Positions are byte offsets into the file. Blank lines are dropped so
+    every chunk's row count is known before it is parsed.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        while True:
+            raw = list(islice(f, chunk_size))
+            if not raw:
+                return
+            position += sum(len(line) for line in raw)
+            lines = [line if line.endswith(b"\n") else line + b"\n"
+                     for line in raw if line.strip()]
+            if lines:
+                yield b"".join(lines), len(lines), position
+
+
+def read_csv_header(path: Path):
+    """Read and check the CSV header row.
+
+    Returns:
+        Tuple of (header, byte offset of the first data row)
+
+    Raises:
+        ValueError: If the file is empty or a feature column is missing
+    """
+    with open(path, "rb") as f:
+        line = f.readline()
+    if not line.strip():
+        raise ValueError("CSV input is empty or starts with a blank line")
+    return parse_csv_header(line.decode("utf-8", errors="replace").rstrip("\r\n")), len(line)
+
+
+def _open_parquet(path: Path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet input requires pyarrow: pip install pyarrow")
+    parquet = pq.ParquetFile(path)
+    missing = [feature for feature in FEATURE_ORDER if feature not in parquet.schema_arrow.names]
+    if missing:
+        raise ValueError(f"Parquet input is missing feature columns: {missing}")
+    return parquet
+
+
+def read_parquet_chunks(parquet, chunk_size: int, start: int):
+    """Yield (columns, rows, end position) for Parquet input.
+
+    Positions are row counts. Columns without nulls are passed as NumPy
+    arrays; columns with nulls as lists, so nulls get validation errors.
+    """
+    position = 0
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=FEATURE_ORDER):
+        if position + batch.num_rows <= start:
+            position += batch.num_rows
+            continue
+        if position < start:
+            batch = batch.slice(start - position)
+            position = start
+        columns = {}
+        for feature in FEATURE_ORDER:
+            column = batch.column(feature)
+            columns[feature] = (column.to_numpy(zero_copy_only=False)
+                                if column.null_count == 0 else column.to_pylist())
+        position += batch.num_rows
+        yield columns, batch.num_rows, position
+
+
+def _save_checkpoint(path: Path, state: dict, out):
+    """Flush the output and record how far input and output have got."""
+    out.flush()
+    os.fsync(out.fileno())
+    state["output_bytes"] = out.tell()
+    temp = path.with_name(path.name + ".tmp")
+    temp.write_text(json.dumps(state, indent=2))
+    os.replace(temp, path)
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    global _predictor
+    parser = argparse.ArgumentParser(description="Score a CSV, NDJSON or Parquet file offline")
+    parser.add_argument("input", type=Path, help="Input file")
+    parser.add_argument("--out", type=Path, required=True, help="Output file (.csv or .ndjson)")
+    parser.add_argument("--input-format", choices=["csv", "ndjson", "parquet"], default=None,
+                        help="Input format (default: from the file extension)")
+    parser.add_argument("--output-format", choices=["csv", "ndjson"], default=None,
+                        help="Output format (default: from the --out extension)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Scoring processes (0 = score in this process)")
+    parser.add_argument("--chunk-size", type=int, default=settings.batch_chunk_size,
+                        help="Rows per chunk")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the checkpoint of an interrupted run")
+    parser.add_argument("--checkpoint", type=Path, default=None,
+                        help="Checkpoint file (default: <out>.checkpoint)")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0,
+                        help="Seconds between checkpoints")
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format or INPUT_FORMATS.get(args.input.suffix.lower())
+    output_format = args.output_format or OUTPUT_FORMATS.get(args.out.suffix.lower())
+    if input_format is None or output_format is None:
+        print("✗ Cannot tell the file formats from the extensions; "
+              "pass --input-format / --output-format")
+        return 1
+    checkpoint_path = args.checkpoint or args.out.with_name(args.out.name + ".checkpoint")
+    chunk_size = max(1, args.chunk_size)
+
+    # Step 1: Open the input
+    try:
+        if input_format == "parquet":
+            parquet = _open_parquet(args.input)
+            header, data_start, total = None, 0, parquet.metadata.num_rows
+        else:
+            header, data_start = (read_csv_header(args.input) if input_format == "csv"
+                                  else (None, 0))
+            total = args.input.stat().st_size
+    except (OSError, ValueError) as e:
+        print(f"✗ {e}")
+        return 1
+
+    # Step 2: Load the model before forking, so workers share it
+    from app.models.predictor import HeartDiseasePredictor
+    _predictor = HeartDiseasePredictor()
+
+    stat = args.input.stat()
+    state = {
+        "input": str(args.input.resolve()),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "input_format": input_format,
+        "output_format": output_format,
+        "fingerprint": _predictor.fingerprint,
+        "position": data_start,
+        "rows": 0,
+        "failed": 0,
+        "output_bytes": 0,
+    }
+
+    # Step 3: Resume from the checkpoint, or start a new output
+    if args.resume and checkpoint_path.exists():
+        saved = json.loads(checkpoint_path.read_text())
+        changed = [key for key in _CHECKPOINT_KEYS if saved.get(key) != state[key]]
+        if changed:
+            print(f"✗ Cannot resume: {', '.join(changed)} changed since the checkpoint; "
+                  f"rerun without --resume")
+            return 1
+        state = saved
+        out = open(args.out, "r+b")
+        out.truncate(state["output_bytes"])
+        out.seek(0, os.SEEK_END)
+        print(f"Resuming after {state['rows']:,} rows")
+    else:
+        if args.resume:
+            print(f"No checkpoint at {checkpoint_path}, starting from the beginning")
+        out = open(args.out, "wb")
+        if output_format == "csv":
+            out.write(csv_result_header().encode())
+
+    if input_format == "parquet":
+        chunks = read_parquet_chunks(parquet, chunk_size, state["position"])
+    else:
+        chunks = read_text_chunks(args.input, chunk_size, state["position"])
+
+    # Step 4: Score chunks on the pool, writing results in submission order
+    pool = None
+    if args.workers > 0:
+        start_methods = multiprocessing.get_all_start_methods()
+        pool = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("fork" if "fork" in start_methods else None),
+            initializer=_init_worker
+        )
+
+    print(f"Scoring {args.input} ({input_format}) -> {args.out} ({output_format}) "
+          f"with {args.workers} worker(s), {chunk_size:,} rows per chunk...")
+    started = time.perf_counter()
+    rows_at_start = state["rows"]
+    last_report = last_checkpoint = started
+    completed = False
+
+    def write(text: str, n_rows: int, failed: int, position: int):
+        nonlocal last_report, last_checkpoint
+        out.write(text.encode())
+        state["rows"] += n_rows
+        state["failed"] += failed
+        state["position"] = position
+
+        now = time.perf_counter()
+        if now - last_checkpoint >= args.checkpoint_interval:
+            last_checkpoint = now
+            _save_checkpoint(checkpoint_path, state, out)
+        if now - last_report >= 1.0:
+            last_report = now
+            rate = (state["rows"] - rows_at_start) / max(now - started, 1e-9)
+            print(f"  {state['rows']:,} rows ({position / max(total, 1):.1%}), {rate:,.0f} rows/s",
+                  file=sys.stderr)
+
+    try:
+        offset = state["rows"]
+        in_flight = deque()
+        for payload, n_rows, position in chunks:
+            if pool is None:
+                write(*score_chunk(payload, input_format, header, output_format, offset), position)
+            else:
+                future = pool.submit(score_chunk, payload, input_format, header,
+                                     output_format, offset)
+                in_flight.append((future, position))
+                # Bound memory: at most two chunks per worker read ahead
+                while len(in_flight) >= 2 * args.workers:
+                    future, done_position = in_flight.popleft()
+                    write(*future.result(), done_position)
+            offset += n_rows
+        while in_flight:
+            future, done_position = in_flight.popleft()
+            write(*future.result(), done_position)
+        completed = True
+    except KeyboardInterrupt:
+        print(f"✗ Interrupted after {state['rows']:,} rows; rerun with --resume to continue")
+        return 130
+    except Exception as e:
+        print(f"✗ Scoring failed after {state['rows']:,} rows: {e}; "
+              f"rerun with --resume to continue")
+        return 1
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if completed:
+            out.close()
+            checkpoint_path.unlink(missing_ok=True)
+        else:
+            _save_checkpoint(checkpoint_path, state, out)
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    scored = state["rows"] - rows_at_start
+    print(f"✓ Scored {state['rows']:,} rows ({state['failed']:,} invalid) "
+          f"in {elapsed:.1f}s ({scored / max(elapsed, 1e-9):,.0f} rows/s) -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
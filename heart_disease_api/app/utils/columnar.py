@@ -0,0 +1,254 @@
+"""Binary columnar wire formats for POST /predict/batch.
+
+JSON bulk payloads are decoded into Python objects and copied value by
+value into the feature matrix. These formats carry the columns as typed
+buffers instead, which are read straight into the (n, 13) matrix:
+
+    arrow   - Apache Arrow IPC stream (application/vnd.apache.arrow.stream)
+    msgpack - MessagePack map (application/msgpack)
+
+Arrow requests hold one numeric column per FEATURE_ORDER feature (extra
+columns are ignored; one copy into the matrix), or a single "features"
+column of fixed_size_list<double>[13] rows in FEATURE_ORDER (used in
+place, no copy). MessagePack requests are maps like the JSON batch
+payload: {"records": [...]} or {"columns": {feature: values}}, where
+values is a list of numbers or bin of little-endian float64.
+
+Responses have one row per input row, in input order:
+
+    prediction  - true/false (Arrow bool; MessagePack int8 bytes, -1 = invalid row)
+    probability - unrounded float64 (MessagePack: NaN = invalid row)
+    risk_code   - 0 Low, 1 Medium, 2 High (int8; MessagePack: -1 = invalid row)
+    errors      - validation errors of invalid rows (Arrow: JSON text;
+                  MessagePack: list of error lists, nil for valid rows)
+
+Invalid rows are null in Arrow responses. pyarrow and msgpack are
+optional; without them the format is answered with 415.
+"""
+
+import json
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+from app.engine import RISK_LEVELS, risk_codes
+from app.utils.preprocessing import (
+    FEATURE_ORDER,
+    build_feature_matrix,
+    build_feature_matrix_from_columns,
+    validate_feature_matrix,
+)
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "msgpack": "application/msgpack",
+}
+
+_PACKAGES = {"arrow": "pyarrow", "msgpack": "msgpack"}
+
+
+class FormatUnavailableError(RuntimeError):
+    """Raised when the package for a binary format is not installed."""
+
+
+def format_from_media_type(media_type: Optional[str]) -> Optional[str]:
+    """Map a Content-Type / Accept value to "arrow", "msgpack" or None."""
+    if not media_type:
+        return None
+    media_type = media_type.lower()
+    if "arrow" in media_type:
+        return "arrow"
+    if "msgpack" in media_type:
+        return "msgpack"
+    return None
+
+
+def require(fmt: str):
+    """Import the package of a binary format.
+
+    Raises:
+        FormatUnavailableError: If it is not installed
+    """
+    try:
+        return __import__(_PACKAGES[fmt])
+    except ImportError:
+        raise FormatUnavailableError(
+            f"{MEDIA_TYPES[fmt]} needs {_PACKAGES[fmt]}: pip install {_PACKAGES[fmt]}"
+        )
+
+
+def read_batch(fmt: str, body: bytes) -> Tuple[int, Callable[[], tuple]]:
+    """Decode a binary batch request.
+
+    Args:
+        fmt: "arrow" or "msgpack"
+        body: Request body
+
+    Returns:
+        Tuple of (n_rows, validate) where validate() returns the same
+        (features, row_indices, errors) tuple as build_feature_matrix,
+        so the row count can be checked before any validation work
+
+    Raises:
+        FormatUnavailableError: If the format's package is not installed
+        ValueError: If the payload is malformed or feature columns are missing
+    """
+    if fmt == "arrow":
+        return _read_arrow(require("arrow"), body)
+    return _read_msgpack(require("msgpack"), body)
+
+
+def _read_arrow(pa, body: bytes):
+    import pyarrow.ipc
+
+    try:
+        table = pyarrow.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(f"Invalid Arrow IPC stream: {e}")
+    n_rows = table.num_rows
+    names = set(table.column_names)
+
+    if "features" in names and not names.issuperset(FEATURE_ORDER):
+        features = table.column("features")
+        # combine_chunks copies even a single chunk
+        features = features.chunk(0) if features.num_chunks == 1 else features.combine_chunks()
+        if (not pa.types.is_fixed_size_list(features.type)
+                or features.type.list_size != len(FEATURE_ORDER)):
+            raise ValueError(f"'features' must be fixed_size_list[{len(FEATURE_ORDER)}], "
+                             f"got {features.type}")
+        if features.null_count:
+            raise ValueError("'features' must not contain null rows")
+        values = features.flatten()
+        if not pa.types.is_float64(values.type):
+            values = values.cast(pa.float64())
+        # Null values come back as NaN; without nulls this is a view of the body
+        matrix = values.to_numpy(zero_copy_only=False).reshape(n_rows, len(FEATURE_ORDER))
+
+        def get_record(i: int) -> dict:
+            return dict(zip(FEATURE_ORDER, features[i].as_py()))
+    else:
+        missing = [feature for feature in FEATURE_ORDER if feature not in names]
+        if missing:
+            raise ValueError(f"Missing required feature columns: {missing}")
+        columns = [table.column(feature) for feature in FEATURE_ORDER]
+        for feature, column in zip(FEATURE_ORDER, columns):
+            if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+                raise ValueError(f"Feature column '{feature}' must be numeric, got {column.type}")
+
+        def get_record(i: int) -> dict:
+            return {feature: column[i].as_py() for feature, column in zip(FEATURE_ORDER, columns)}
+
+        def fill() -> np.ndarray:
+            matrix = np.empty((n_rows, len(FEATURE_ORDER)), dtype=np.float64)
+            for j, column in enumerate(columns):
+                start = 0
+                for chunk in column.chunks:
+                    if not pa.types.is_float64(chunk.type):
+                        chunk = chunk.cast(pa.float64())
+                    matrix[start:start + len(chunk), j] = chunk.to_numpy(zero_copy_only=False)
+                    start += len(chunk)
+            return matrix
+
+        return n_rows, lambda: validate_feature_matrix(fill(), get_record)
+
+    return n_rows, lambda: validate_feature_matrix(matrix, get_record)
+
+
+def _read_msgpack(msgpack, body: bytes):
+    try:
+        payload = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ValueError(f"Invalid MessagePack body: {e}")
+    if not isinstance(payload, dict) or ("records" in payload) == ("columns" in payload):
+        raise ValueError("Provide exactly one of 'records' or 'columns'")
+
+    if "records" in payload:
+        records = payload["records"]
+        if not isinstance(records, list):
+            raise ValueError("'records' must be an array of maps")
+        return len(records), lambda: build_feature_matrix(records)
+
+    columns = payload["columns"]
+    if not isinstance(columns, dict):
+        raise ValueError("'columns' must be a map of feature name to values")
+    missing = [feature for feature in FEATURE_ORDER if feature not in columns]
+    if missing:
+        raise ValueError(f"Missing required feature columns: {missing}")
+    columns = dict(columns)
+    for feature in FEATURE_ORDER:
+        values = columns[feature]
+        if isinstance(values, bytes):
+            if len(values) % 8:
+                raise ValueError(f"Column '{feature}' is not a float64 buffer")
+            columns[feature] = np.frombuffer(values, dtype="<f8")
+        elif not isinstance(values, list):
+            raise ValueError(f"Column '{feature}' must be an array or float64 bytes")
+    n_rows = len(columns[FEATURE_ORDER[0]])
+    return n_rows, lambda: build_feature_matrix_from_columns(columns)
+
+
+def write_results(fmt: str, n_rows: int, row_indices: np.ndarray, predictions: np.ndarray,
+                  probabilities: np.ndarray, errors: Dict[int, list]) -> bytes:
+    """Encode batch results as columns, one row per input row.
+
+    Args:
+        fmt: "arrow" or "msgpack"
+        n_rows: Rows in the request
+        row_indices: Positions of the scored rows
+        predictions: Predicted class per scored row (bool)
+        probabilities: Probability of heart disease per scored row
+        errors: Position -> validation errors for rejected rows
+
+    Returns:
+        Response body
+
+    Raises:
+        FormatUnavailableError: If the format's package is not installed
+    """
+    module = require(fmt)
+    valid = np.zeros(n_rows, dtype=bool)
+    valid[row_indices] = True
+    prediction = np.full(n_rows, -1, dtype=np.int8)
+    prediction[row_indices] = predictions
+    probability = np.full(n_rows, np.nan)
+    probability[row_indices] = probabilities
+    risk_code = np.full(n_rows, -1, dtype=np.int8)
+    risk_code[row_indices] = risk_codes(probabilities)
+    summary = {"total": n_rows, "succeeded": len(row_indices), "failed": len(errors)}
+
+    if fmt == "msgpack":
+        # Row-aligned like the other columns (msgpack's default unpackb
+        # rejects maps with integer keys)
+        error_column = [None] * n_rows
+        for i, row_errors in errors.items():
+            error_column[i] = row_errors
+        return module.packb({
+            **summary,
+            "risk_levels": list(RISK_LEVELS),
+            "prediction": prediction.tobytes(),
+            "probability": probability.astype("<f8", copy=False).tobytes(),
+            "risk_code": risk_code.tobytes(),
+            "errors": error_column
+        }, default=str)
+
+    import pyarrow.ipc
+
+    pa = module
+    mask = None if valid.all() else ~valid
+    error_text = [None] * n_rows
+    for i, row_errors in errors.items():
+        error_text[i] = json.dumps(row_errors, default=str)
+    schema = pa.schema(
+        [("prediction", pa.bool_()), ("probability", pa.float64()),
+         ("risk_code", pa.int8()), ("errors", pa.string())],
+        metadata={"risk_levels": json.dumps(RISK_LEVELS),
+                  **{key: str(value) for key, value in summary.items()}}
+    )
+    batch = pa.record_batch([
+        pa.array(prediction == 1, mask=mask),
+        pa.array(probability, mask=mask),
+        pa.array(risk_code, mask=mask),
+        pa.array(error_text, type=pa.string())
+    ], schema=schema)
+    sink = pa.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
@@ -3,27 +3,51 @@
 Handles feature extraction, ordering, and scaling.
 """
 
+from operator import attrgetter
 import numpy as np
+from pydantic import ValidationError
+from app.engine import FEATURE_ORDER  # Training data order, defined without pydantic
 from app.schemas.heart import HeartDiseaseInput
 
 
-# CRITICAL: Feature order MUST match the training data order
-# Do NOT change this order or predictions will be incorrect
-FEATURE_ORDER = [
-    'age', 
-    'sex', 
-    'cp', 
-    'trestbps', 
-    'chol', 
-    'fbs', 
-    'restecg', 
-    'thalach', 
-    'exang', 
-    'oldpeak', 
-    'slope', 
-    'ca', 
-    'thal'
-]
+def _field_bound(name: str, attr: str) -> float:
+    """Read a ge/le constraint for a field from the HeartDiseaseInput schema."""
+    for constraint in HeartDiseaseInput.model_fields[name].metadata:
+        if hasattr(constraint, attr):
+            return float(getattr(constraint, attr))
+    raise ValueError(f"Field '{name}' has no '{attr}' constraint")
+
+
+# Per-feature bounds and integer flags, in FEATURE_ORDER.
+# Derived from the Pydantic schema so both validation paths stay in sync.
+FEATURE_LOWER = np.array([_field_bound(f, "ge") for f in FEATURE_ORDER], dtype=np.float64)
+FEATURE_UPPER = np.array([_field_bound(f, "le") for f in FEATURE_ORDER], dtype=np.float64)
+INTEGER_FEATURES = np.array(
+    [HeartDiseaseInput.model_fields[f].annotation is int for f in FEATURE_ORDER],
+    dtype=bool
+)
+
+# Python types accepted on the fast validation path (Pydantic lax mode
+# accepts all of them for both int and float fields)
+_NUMERIC_TYPES = (int, float, bool)
+
+# Reads all features off a HeartDiseaseInput in FEATURE_ORDER
+_get_features = attrgetter(*FEATURE_ORDER)
+
+
+def extract_features(data: HeartDiseaseInput) -> np.ndarray:
+    """Extract raw (unscaled) features in training order.
+    
+    Args:
+        data: Validated input data from request
+        
+    Returns:
+        float64 array of shape (13,) in FEATURE_ORDER
+        
+    Raises:
+        AttributeError: If a feature is missing
+    """
+    return np.array(_get_features(data), dtype=np.float64)
 
 
 def preprocess_input(data: HeartDiseaseInput, scaler) -> np.ndarray:
@@ -43,26 +67,151 @@ def preprocess_input(data: HeartDiseaseInput, scaler) -> np.ndarray:
         ValueError: If feature extraction fails
     """
     try:
-        # Convert Pydantic model to dictionary
-        data_dict = data.model_dump()
-        
         # Extract features in EXACT training order
-        features = [[data_dict[feature] for feature in FEATURE_ORDER]]
-        
-        # Convert to numpy array
-        features_array = np.array(features, dtype=np.float64)
+        features_array = extract_features(data).reshape(1, -1)
         
         # Apply scaling transformation
         scaled_features = scaler.transform(features_array)
         
         return scaled_features
         
-    except KeyError as e:
+    except (KeyError, AttributeError) as e:
         raise ValueError(f"Missing required feature: {e}")
     except Exception as e:
         raise ValueError(f"Preprocessing failed: {e}")
 
 
+def preprocess_batch(features: np.ndarray, scaler) -> np.ndarray:
+    """Scale a raw feature matrix for model prediction.
+    
+    Args:
+        features: Unscaled float64 array of shape (n, 13) in FEATURE_ORDER
+        scaler: Pre-trained StandardScaler or MinMaxScaler
+        
+    Returns:
+        Scaled feature array of shape (n, 13)
+        
+    Raises:
+        ValueError: If scaling fails
+    """
+    try:
+        return scaler.transform(features)
+    except Exception as e:
+        raise ValueError(f"Preprocessing failed: {e}")
+
+
+def build_feature_matrix(records: list):
+    """Build a raw feature matrix from a list of records.
+    
+    Rows made of plain numbers are validated in one vectorized bounds check.
+    Any row that fails it (or contains other types) is re-validated with
+    HeartDiseaseInput, so accepted rows and error details match /predict.
+    
+    Args:
+        records: List of dicts keyed by feature name (any other element is
+            reported as that row's validation error)
+        
+    Returns:
+        Tuple of (features, row_indices, errors):
+        - features: float64 array of shape (n_valid, 13) in FEATURE_ORDER
+        - row_indices: int array mapping each feature row to its input index
+        - errors: dict of input index -> list of Pydantic error dicts
+    """
+    matrix = np.zeros((len(records), len(FEATURE_ORDER)), dtype=np.float64)
+    fast = np.ones(len(records), dtype=bool)
+    
+    for i, record in enumerate(records):
+        try:
+            row = [record[feature] for feature in FEATURE_ORDER]
+        except (KeyError, TypeError):
+            fast[i] = False
+            continue
+        if not all(type(value) in _NUMERIC_TYPES for value in row):
+            fast[i] = False
+            continue
+        try:
+            matrix[i] = row
+        except (OverflowError, TypeError):
+            # An int too large for float64: Pydantic reports it for this row
+            fast[i] = False
+    
+    return _validate_matrix(matrix, fast, records.__getitem__)
+
+
+def build_feature_matrix_from_columns(columns: dict):
+    """Build a raw feature matrix from a columnar payload.
+    
+    Args:
+        columns: Dict of feature name -> list of values (equal lengths)
+        
+    Returns:
+        Same (features, row_indices, errors) tuple as build_feature_matrix
+        
+    Raises:
+        ValueError: If a feature column is missing or lengths differ
+    """
+    missing = [feature for feature in FEATURE_ORDER if feature not in columns]
+    if missing:
+        raise ValueError(f"Missing required feature columns: {missing}")
+    
+    lengths = {len(columns[feature]) for feature in FEATURE_ORDER}
+    if len(lengths) != 1:
+        raise ValueError("All feature columns must have the same length")
+    n_rows = lengths.pop()
+    
+    def get_record(i: int) -> dict:
+        return {feature: columns[feature][i] for feature in FEATURE_ORDER}
+    
+    arrays = [np.asarray(columns[feature]) for feature in FEATURE_ORDER]
+    if all(array.dtype.kind in "biuf" for array in arrays):
+        # Fully numeric payload: one copy straight into the matrix
+        matrix = np.empty((n_rows, len(FEATURE_ORDER)), dtype=np.float64)
+        for j, array in enumerate(arrays):
+            matrix[:, j] = array
+        return _validate_matrix(matrix, np.ones(n_rows, dtype=bool), get_record)
+    
+    return build_feature_matrix([get_record(i) for i in range(n_rows)])
+
+
+def validate_feature_matrix(matrix: np.ndarray, get_record):
+    """Validate a raw feature matrix decoded from a binary payload.
+    
+    Args:
+        matrix: float64 array of shape (n, 13) in FEATURE_ORDER (missing
+            values as NaN); may be a read-only view of the request body
+        get_record: Returns row i as a dict, for Pydantic error messages
+        
+    Returns:
+        Same (features, row_indices, errors) tuple as build_feature_matrix;
+        features is matrix itself when every row is valid
+    """
+    return _validate_matrix(matrix, np.ones(matrix.shape[0], dtype=bool), get_record)
+
+
+def _validate_matrix(matrix: np.ndarray, fast: np.ndarray, get_record):
+    """Apply vectorized bounds checks, falling back to Pydantic per bad row."""
+    in_bounds = np.all((matrix >= FEATURE_LOWER) & (matrix <= FEATURE_UPPER), axis=1)
+    integral = np.all(~INTEGER_FEATURES | (matrix == np.floor(matrix)), axis=1)
+    valid = fast & in_bounds & integral
+    if valid.all():
+        return matrix, np.arange(matrix.shape[0]), {}
+    if not matrix.flags.writeable:
+        matrix = matrix.copy()
+    errors = {}
+    
+    for i in np.flatnonzero(~valid):
+        try:
+            data = HeartDiseaseInput.model_validate(get_record(int(i)))
+        except ValidationError as e:
+            errors[int(i)] = e.errors(include_url=False)
+            continue
+        matrix[i] = [getattr(data, feature) for feature in FEATURE_ORDER]
+        valid[i] = True
+    
+    row_indices = np.flatnonzero(valid)
+    return matrix[row_indices], row_indices, errors
+
+
 def validate_feature_order(features: list) -> bool:
     """Validate that features match expected order.
     
@@ -0,0 +1,245 @@
+"""Incremental parsing and formatting for streamed bulk scoring.
+
+Bodies arrive as arbitrary byte chunks; LineSplitter turns them into
+complete lines, and the parsers turn batches of lines into records that
+build_feature_matrix validates. Results are written back out as NDJSON
+or CSV lines in input order. Lines longer than the splitter's limit are
+dropped as they arrive and reported as an invalid row, so a body without
+newlines cannot grow the buffer without bound.
+
+Supported formats:
+    ndjson - one JSON object per line, keyed by feature name
+    csv    - header row naming the feature columns, then one row per line
+             (extra columns are ignored; quoted fields must not span lines)
+"""
+
+import codecs
+import csv
+import json
+from typing import Dict, List, Optional
+import numpy as np
+from starlette.responses import StreamingResponse
+from app.utils.preprocessing import FEATURE_ORDER, build_feature_matrix
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CSV_RESULT_COLUMNS = ["index", "prediction", "probability", "risk_level", "errors"]
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body iterator reads the request body as it goes.
+
+    The stock StreamingResponse may listen for client disconnects on
+    `receive` while streaming, which would steal request body messages from
+    the iterator. Here the iterator owns `receive`; a disconnect surfaces as
+    ClientDisconnect from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def format_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    """Map a Content-Type / Accept value to "ndjson", "csv" or None."""
+    if not content_type:
+        return None
+    content_type = content_type.lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json-seq" in content_type:
+        return "ndjson"
+    return None
+
+
+def parse_number(value: str):
+    """Parse a CSV cell as a number, leaving anything else for validation."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class LineSplitter:
+    """Split a stream of byte chunks into complete text lines.
+
+    Lines longer than max_line_length characters are not buffered: the
+    rest of the line is skipped as it arrives and the line comes out as
+    None, which parse_lines reports as an invalid row.
+    """
+
+    def __init__(self, encoding: str = "utf-8", max_line_length: Optional[int] = None):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.max_line_length = max_line_length
+        self._parts: List[str] = []  # Pieces of the incomplete last line
+        self._length = 0
+        self._overlong = False
+
+    def feed(self, chunk: bytes) -> List[Optional[str]]:
+        """Add a chunk and return the lines it completed (without newlines).
+
+        Only the newly decoded text is searched for newlines.
+        """
+        *ends, rest = self._decoder.decode(chunk).split("\n")
+        lines = [self._finish(end) for end in ends]
+        self._extend(rest)
+        return lines
+
+    def close(self) -> List[Optional[str]]:
+        """Return the final line if the stream did not end with a newline."""
+        line = self._finish(self._decoder.decode(b"", final=True))
+        return [line] if line is None or line.strip() else []
+
+    def _extend(self, text: str):
+        """Buffer part of the incomplete line, or drop it once over the limit."""
+        if self._overlong or not text:
+            return
+        self._length += len(text)
+        if self.max_line_length is not None and self._length > self.max_line_length:
+            self._overlong = True
+            self._parts = []
+        else:
+            self._parts.append(text)
+
+    def _finish(self, end: str) -> Optional[str]:
+        """Complete the buffered line with its last piece (None if too long)."""
+        self._extend(end)
+        line = None if self._overlong else "".join(self._parts).rstrip("\r")
+        self._parts, self._length, self._overlong = [], 0, False
+        return line
+
+
+_LINE_TOO_LONG = {"type": "line_too_long", "loc": [],
+                  "msg": "Line exceeds the maximum line length and was skipped"}
+
+
+def parse_csv_header(line: str) -> List[str]:
+    """Parse and check a CSV header row.
+
+    Raises:
+        ValueError: If a feature column is missing
+    """
+    header = [name.strip().lstrip("\ufeff") for name in next(csv.reader([line]), [])]
+    missing = [feature for feature in FEATURE_ORDER if feature not in header]
+    if missing:
+        raise ValueError(f"CSV header is missing feature columns: {missing}")
+    return header
+
+
+def parse_lines(lines: List[Optional[str]], fmt: str, header: Optional[List[str]] = None):
+    """Turn lines into records, skipping blank lines.
+
+    Args:
+        lines: Complete lines; None for a line LineSplitter dropped as too long
+        fmt: "ndjson" or "csv"
+        header: CSV header from parse_csv_header (csv only)
+
+    Returns:
+        Tuple of (records, parse_errors) where parse_errors maps a position
+        in lines to the error for a line that could not be parsed at all
+    """
+    lines = [line for line in lines if line is None or line.strip()]
+    records = []
+    parse_errors = {}
+    if fmt == "csv":
+        columns = [(j, name) for j, name in enumerate(header) if name in FEATURE_ORDER]
+        rows = csv.reader(line for line in lines if line is not None)
+        for i, line in enumerate(lines):
+            if line is None:
+                parse_errors[i] = [dict(_LINE_TOO_LONG)]
+                records.append({})
+                continue
+            row = next(rows)
+            if len(row) != len(header):
+                parse_errors[i] = [{
+                    "type": "csv_row_invalid", "loc": [],
+                    "msg": f"Expected {len(header)} columns, got {len(row)}"
+                }]
+                records.append({})
+                continue
+            records.append({name: parse_number(row[j]) for j, name in columns})
+    else:
+        for i, line in enumerate(lines):
+            if line is None:
+                parse_errors[i] = [dict(_LINE_TOO_LONG)]
+                records.append({})
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                parse_errors[i] = [{"type": "json_invalid", "loc": [], "msg": f"Invalid JSON: {e}"}]
+                records.append({})
+    return records, parse_errors
+
+
+def validate_records(records: list, parse_errors: Dict[int, list]):
+    """build_feature_matrix plus the parse errors of unparsable lines."""
+    features, row_indices, errors = build_feature_matrix(records)
+    errors.update(parse_errors)
+    return features, row_indices, errors
+
+
+def format_results(fmt: str, offset: int, n_rows: int, row_indices: np.ndarray,
+                   predictions: np.ndarray, probabilities: np.ndarray,
+                   risk_levels: List[str], errors: Dict[int, list]) -> str:
+    """Format one scored chunk as NDJSON or CSV lines, in input order.
+
+    Args:
+        fmt: "ndjson" or "csv"
+        offset: Index of the chunk's first row in the whole stream
+        n_rows: Rows in the chunk
+        row_indices: Chunk positions of the scored rows
+        predictions: Predicted class per scored row
+        probabilities: Probability of heart disease per scored row
+        risk_levels: Risk level per scored row
+        errors: Chunk position -> validation errors for rejected rows
+
+    Returns:
+        Text with one line per row (each ending in a newline)
+    """
+    rows = [None] * n_rows
+    for i, has_disease, probability, level in zip(
+        row_indices.tolist(), predictions.tolist(), probabilities.tolist(), risk_levels
+    ):
+        rows[i] = (bool(has_disease), round(probability, 4), level, None)
+    for i, row_errors in errors.items():
+        rows[i] = (None, None, None, row_errors)
+
+    if fmt == "csv":
+        lines = []
+        for i, (has_disease, probability, level, row_errors) in enumerate(rows):
+            if row_errors is not None:
+                lines.append(f"{offset + i},,,,{_csv_quote(json.dumps(row_errors, default=str))}\n")
+            else:
+                lines.append(f"{offset + i},{str(has_disease).lower()},{probability},{level},\n")
+        return "".join(lines)
+
+    lines = []
+    for i, (has_disease, probability, level, row_errors) in enumerate(rows):
+        if row_errors is not None:
+            item = {"index": offset + i, "errors": row_errors}
+        else:
+            item = {"index": offset + i, "prediction": has_disease,
+                    "probability": probability, "risk_level": level}
+        lines.append(json.dumps(item, default=str) + "\n")
+    return "".join(lines)
+
+
+def format_stream_error(fmt: str, message: str) -> str:
+    """Final line reporting a failure after the response has started."""
+    if fmt == "csv":
+        return f",,,,{_csv_quote(message)}\n"
+    return json.dumps({"error": message}) + "\n"
+
+
+def _csv_quote(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def csv_result_header() -> str:
+    """Header line for CSV results."""
+    return ",".join(CSV_RESULT_COLUMNS) + "\n"
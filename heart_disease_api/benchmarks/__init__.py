@@ -0,0 +1,10 @@
+"""Benchmark suite for the Heart Disease Prediction API.
+
+Three levels, each emitting JSON (p50/p95/p99 latency, req/s, CPU per
+request) so results can be compared across commits:
+
+    python -m benchmarks micro                     # predictor functions in-process
+    python -m benchmarks asgi                      # full app through an in-process ASGI client
+    python -m benchmarks load --url http://localhost:8000   # HTTP load against run.py
+    python -m benchmarks compare baseline.json current.json  # flag regressions
+"""
@@ -0,0 +1,167 @@
+"""Command-line entry point: python -m benchmarks <micro|asgi|load|neighbors|admission|imports|compare> ..."""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Latency / cost metrics where higher is worse, and throughput where lower is worse
+_HIGHER_IS_WORSE = ("p50_ms", "p95_ms", "p99_ms", "cpu_ms_per_req")
+_LOWER_IS_WORSE = ("req_per_s",)
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """List regressions of current vs baseline beyond a relative threshold."""
+    regressions = []
+    for name, before in baseline.get("results", {}).items():
+        after = current.get("results", {}).get(name)
+        if not isinstance(before, dict) or not isinstance(after, dict):
+            continue
+        for metric in _HIGHER_IS_WORSE + _LOWER_IS_WORSE:
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > threshold if metric in _HIGHER_IS_WORSE else change < -threshold
+            print(f"{'✗' if worse else ' '} {name:32s} {metric:16s} "
+                  f"{old:>12.4f} -> {new:>12.4f} ({change:+.1%})")
+            if worse:
+                regressions.append({"benchmark": name, "metric": metric,
+                                    "baseline": old, "current": new, "change": change})
+    return regressions
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark the Heart Disease Prediction API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    micro = commands.add_parser("micro", help="Predictor functions in-process")
+    micro.add_argument("--duration", type=float, default=2.0, help="Seconds per benchmark")
+    micro.add_argument("--batch-size", type=int, default=1000, help="Rows per predict_batch call")
+
+    asgi = commands.add_parser("asgi", help="Full app through an in-process ASGI client")
+    load = commands.add_parser("load", help="HTTP load against a running server")
+    for sub in (asgi, load):
+        sub.add_argument("--concurrency", type=int, default=8 if sub is asgi else 32,
+                         help="Concurrent requests / connections")
+        sub.add_argument("--duration", type=float, default=5.0 if sub is asgi else 10.0,
+                         help="Measured seconds (per scenario for asgi)")
+        sub.add_argument("--batch-fraction", type=float, default=0.0,
+                         help="Share of /predict/batch requests (0-1)")
+        sub.add_argument("--batch-size", type=int, default=100, help="Records per batch request")
+        sub.add_argument("--distinct", type=int, default=1000,
+                         help="Distinct single payloads (controls the cache hit rate)")
+    load.add_argument("--url", default="http://127.0.0.1:8000/api", help="API base URL")
+    load.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds of load first")
+    load.add_argument("--server-pid", type=int, default=None, help="Server PID for CPU per request")
+    load.add_argument("--spawn", action="store_true",
+                      help="Start run.py on the --url port for the run (measures its CPU)")
+
+    neighbors = commands.add_parser("neighbors",
+                                    help="Neighbor index recall vs latency (synthetic KNN)")
+    neighbors.add_argument("--rows", type=int, default=200_000, help="Training rows")
+    neighbors.add_argument("--queries", type=int, default=500, help="Single-row queries timed")
+    neighbors.add_argument("--n-neighbors", type=int, default=5, help="k of the KNN model")
+    neighbors.add_argument("--n-lists", type=int, default=None,
+                           help="ivf partitions (default about sqrt(rows))")
+    neighbors.add_argument("--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64],
+                           help="ivf n_probe values to measure")
+
+    admission = commands.add_parser(
+        "admission", help="Good-client latency under abuse, without and with admission control"
+    )
+    admission.add_argument("--port", type=int, default=8077, help="Port for the spawned servers")
+    admission.add_argument("--good-clients", type=int, default=4, help="Well-behaved clients")
+    admission.add_argument("--good-rate", type=float, default=10.0,
+                           help="Requests per second per good client")
+    admission.add_argument("--abusers", type=int, default=16,
+                           help="Connections flooding /predict/batch as one client")
+    admission.add_argument("--batch-size", type=int, default=100, help="Records per abuser batch")
+    admission.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    admission.add_argument("--rate-limit", type=float, default=20.0,
+                           help="RATE_LIMIT_PER_SECOND with admission control")
+    admission.add_argument("--burst", type=float, default=40.0,
+                           help="RATE_LIMIT_BURST with admission control")
+
+    imports = commands.add_parser(
+        "imports", help="Cold import and first-prediction time of the scoring entry points"
+    )
+    imports.add_argument("--runs", type=int, default=10, help="Fresh interpreters per entry point")
+
+    for sub in (micro, asgi, load, neighbors, admission, imports):
+        sub.add_argument("--out", type=Path, default=None, help="Also write the JSON report here")
+
+    comparison = commands.add_parser("compare", help="Compare two JSON reports")
+    comparison.add_argument("baseline", type=Path)
+    comparison.add_argument("current", type=Path)
+    comparison.add_argument("--threshold", type=float, default=0.10,
+                            help="Relative change counted as a regression (default 0.10)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        baseline = json.loads(args.baseline.read_text())
+        current = json.loads(args.current.read_text())
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"✗ {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+        print(f"✓ No regressions beyond {args.threshold:.0%}")
+        return 0
+
+    from benchmarks.common import write_report
+    config = {key: value for key, value in vars(args).items() if key not in ("command", "out")}
+
+    if args.command == "micro":
+        from benchmarks import micro
+        results = micro.run(duration_s=args.duration, batch_size=args.batch_size)
+    elif args.command == "asgi":
+        from benchmarks import asgi
+        results = asgi.run(
+            concurrency=args.concurrency, duration_s=args.duration,
+            batch_fraction=args.batch_fraction, batch_size=args.batch_size,
+            distinct=args.distinct
+        )
+    elif args.command == "admission":
+        from benchmarks import admission
+        results = admission.run(
+            port=args.port, good_clients=args.good_clients, good_rate=args.good_rate,
+            abusers=args.abusers, batch_size=args.batch_size, duration_s=args.duration,
+            rate_limit=args.rate_limit, burst=args.burst
+        )
+    elif args.command == "imports":
+        from benchmarks import imports
+        results = imports.run(runs=args.runs)
+    elif args.command == "neighbors":
+        from benchmarks import neighbors
+        results = neighbors.run(
+            rows=args.rows, queries=args.queries, n_neighbors=args.n_neighbors,
+            n_lists=args.n_lists, n_probes=args.n_probe
+        )
+    else:
+        from benchmarks import load
+        server = None
+        server_pid = args.server_pid
+        if args.spawn:
+            from urllib.parse import urlsplit
+            server = load.spawn_server(urlsplit(args.url).port or 80)
+            server_pid = server.pid
+        try:
+            results = load.run(
+                args.url, concurrency=args.concurrency, duration_s=args.duration,
+                warmup_s=args.warmup, batch_fraction=args.batch_fraction,
+                batch_size=args.batch_size, distinct=args.distinct, server_pid=server_pid
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    write_report(args.command, config, results, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Latency of well-behaved clients while another client floods the server.
+
+Starts run.py twice, without and with admission control, and runs two
+phases against each:
+
+- alone: good clients send single /predict requests at a fixed rate,
+  each with its own X-Client-ID
+- abuse: the same good clients, plus abuser connections sending
+  /predict/batch requests back to back under one X-Client-ID, ignoring
+  Retry-After
+
+The prediction cache is disabled so every request reaches the model.
+Good-client latency is measured from each request's scheduled send time,
+so a stalled server also counts the requests it delayed.
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter
+
+from benchmarks.common import batch_payload, single_payloads, summarize
+from benchmarks.load import HTTPConnection, spawn_server
+
+
+async def _run_phase(port: int, good_clients: int, good_rate: float, abusers: int,
+                     batch_size: int, duration_s: float) -> dict:
+    singles = [json.dumps(payload).encode() for payload in single_payloads(1000)]
+    batch = json.dumps(batch_payload(batch_size)).encode()
+    latencies, good_statuses, abuser_statuses = [], Counter(), Counter()
+    deadline = time.perf_counter() + duration_s
+
+    async def good(client: int):
+        connection = HTTPConnection("127.0.0.1", port)
+        headers = {"X-Client-ID": f"good-{client}"}
+        interval = 1.0 / good_rate
+        # Spread the clients' send times over one interval
+        scheduled = time.perf_counter() + interval * client / good_clients
+        i = client
+        try:
+            while scheduled < deadline:
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                try:
+                    status, _ = await connection.request(
+                        "POST", "/api/predict", singles[i % len(singles)], headers
+                    )
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    status = 599
+                latencies.append(time.perf_counter() - scheduled)
+                good_statuses[status] += 1
+                scheduled += interval
+                i += good_clients
+        finally:
+            connection.close()
+
+    async def abuser():
+        connection = HTTPConnection("127.0.0.1", port)
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    status, _ = await connection.request(
+                        "POST", "/api/predict/batch", batch, {"X-Client-ID": "abuser"}
+                    )
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    status = 599
+                abuser_statuses[status] += 1
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[good(i) for i in range(good_clients)],
+                         *[abuser() for _ in range(abusers)])
+    wall = time.perf_counter() - started
+    errors = sum(count for status, count in good_statuses.items() if status >= 400)
+    result = summarize(latencies, wall, None, errors)
+    result["statuses"] = dict(good_statuses)
+    if abusers:
+        result["abuser_statuses"] = dict(abuser_statuses)
+        result["abuser_rows_per_s"] = round(abuser_statuses[200] * batch_size / wall, 1)
+    return result
+
+
+def run(port: int = 8077, good_clients: int = 4, good_rate: float = 10.0, abusers: int = 16,
+        batch_size: int = 100, duration_s: float = 10.0, rate_limit: float = 20.0,
+        burst: float = 40.0) -> dict:
+    """Measure good-client latency alone and under abuse, without and with admission control.
+
+    Args:
+        port: Local port for the spawned servers
+        good_clients: Well-behaved clients
+        good_rate: Requests per second per good client
+        abusers: Connections flooding /predict/batch as one client
+        batch_size: Records per abuser batch
+        duration_s: Seconds per phase
+        rate_limit: RATE_LIMIT_PER_SECOND for the admission run
+        burst: RATE_LIMIT_BURST for the admission run
+
+    Returns:
+        Results keyed by "<off|on>_<alone|abuse>" (good-client latency in ms)
+    """
+    base_env = {"PREDICTION_CACHE_ENABLED": "false", "METRICS_ENABLED": "false"}
+    admission_env = {
+        "ADMISSION_ENABLED": "true",
+        "RATE_LIMIT_KEY_HEADER": "X-Client-ID",
+        "RATE_LIMIT_PER_SECOND": str(rate_limit),
+        "RATE_LIMIT_BURST": str(burst),
+    }
+    results = {}
+    for name, env in (("off", base_env), ("on", {**base_env, **admission_env})):
+        server = spawn_server(port, env)
+        try:
+            for phase, phase_abusers in (("alone", 0), ("abuse", abusers)):
+                results[f"{name}_{phase}"] = asyncio.run(_run_phase(
+                    port, good_clients, good_rate, phase_abusers, batch_size, duration_s
+                ))
+        finally:
+            server.terminate()
+            server.wait()
+    return results
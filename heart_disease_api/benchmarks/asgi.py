@@ -0,0 +1,176 @@
+"""End-to-end benchmarks through an in-process ASGI client.
+
+Requests go through the full application stack (middleware, routing,
+validation, inference executor, serialization) but skip the network and
+the HTTP server, calling the ASGI app directly. The client is a minimal
+driver, so no HTTP client library is needed.
+"""
+
+import asyncio
+import json
+import random
+import time
+from typing import List, Optional, Tuple
+
+from benchmarks.common import batch_payload, single_payloads, summarize
+
+
+class ASGIClient:
+    """Minimal in-process client: lifespan handling plus one-shot HTTP requests."""
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan_task = None
+        self._lifespan_receive: Optional[asyncio.Queue] = None
+        self._lifespan_send: Optional[asyncio.Queue] = None
+
+    async def _lifespan(self, message_type: str):
+        await self._lifespan_receive.put({"type": message_type})
+        reply = await self._lifespan_send.get()
+        if reply["type"].endswith(".failed"):
+            raise RuntimeError(f"Lifespan {message_type} failed: {reply.get('message')}")
+
+    async def start(self):
+        """Run the application's lifespan startup (loads and warms up the model)."""
+        self._lifespan_receive, self._lifespan_send = asyncio.Queue(), asyncio.Queue()
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._lifespan_task = asyncio.ensure_future(
+            self.app(scope, self._lifespan_receive.get, self._lifespan_send.put)
+        )
+        await self._lifespan("lifespan.startup")
+
+    async def stop(self):
+        """Run the application's lifespan shutdown."""
+        if self._lifespan_task is not None:
+            await self._lifespan("lifespan.shutdown")
+            await self._lifespan_task
+            self._lifespan_task = None
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: Optional[List[Tuple[bytes, bytes]]] = None) -> Tuple[int, bytes]:
+        """Send one request through the app.
+
+        Returns:
+            Tuple of (status code, response body)
+        """
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"bench"), (b"content-length", str(len(body)).encode()),
+                        (b"content-type", b"application/json")] + (headers or []),
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+            "state": {},
+        }
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Nothing more to send: behave like a client waiting for the response
+            await asyncio.Event().wait()
+
+        status = 0
+        chunks = []
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+
+async def _drive(client: ASGIClient, requests: list, concurrency: int, duration_s: float):
+    """Send requests from `concurrency` workers until duration_s has passed."""
+    latencies = {name: [] for name, _, _ in requests}
+    errors = {name: 0 for name, _, _ in requests}
+    deadline = time.perf_counter() + duration_s
+
+    async def worker(seed: int):
+        rng = random.Random(seed)
+        weights = [weight for _, weight, _ in requests]
+        while time.perf_counter() < deadline:
+            name, _, make = rng.choices(requests, weights)[0]
+            path, body = make(rng)
+            started = time.perf_counter()
+            status, _ = await client.request("POST" if body else "GET", path, body)
+            latencies[name].append(time.perf_counter() - started)
+            if status >= 400:
+                errors[name] += 1
+
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return latencies, errors
+
+
+def run(concurrency: int = 8, duration_s: float = 5.0, batch_fraction: float = 0.0,
+        batch_size: int = 100, distinct: int = 1000) -> dict:
+    """Benchmark the full app in-process.
+
+    Args:
+        concurrency: Concurrent in-flight requests
+        duration_s: Duration of each scenario
+        batch_fraction: Share of /predict/batch requests in the mixed scenario
+        batch_size: Records per batch request
+        distinct: Distinct single payloads cycled through (cache hit rate)
+
+    Returns:
+        Results keyed by scenario and request type
+    """
+    from app.core.config import settings
+    from app.main import app
+
+    singles = [json.dumps(payload).encode() for payload in single_payloads(distinct)]
+    batches = [json.dumps(batch_payload(batch_size, seed=seed)).encode() for seed in range(8)]
+    predict_path = f"{settings.api_prefix}/predict"
+    scenarios = {
+        "health": [("health", 1.0, lambda rng: ("/health", b""))],
+        "predict": [("predict", 1.0, lambda rng: (predict_path, rng.choice(singles)))],
+    }
+    if batch_fraction > 0:
+        scenarios["mixed"] = [
+            ("predict", 1.0 - batch_fraction, lambda rng: (predict_path, rng.choice(singles))),
+            ("predict_batch", batch_fraction,
+             lambda rng: (predict_path + "/batch", rng.choice(batches))),
+        ]
+
+    async def main():
+        client = ASGIClient(app)
+        await client.start()
+        results = {}
+        try:
+            for scenario, requests in scenarios.items():
+                cpu_started = time.process_time()
+                started = time.perf_counter()
+                latencies, errors = await _drive(client, requests, concurrency, duration_s)
+                wall = time.perf_counter() - started
+                cpu = time.process_time() - cpu_started
+                mixed = sum(1 for values in latencies.values() if values) > 1
+                for name, values in latencies.items():
+                    # CPU cannot be attributed per request type in a mixed run
+                    results[f"{scenario}/{name}"] = summarize(
+                        values, wall, None if mixed else cpu, errors[name],
+                        rows_per_request=batch_size if name == "predict_batch" else 1
+                    )
+                if mixed:
+                    results[f"{scenario}/all"] = summarize(
+                        [value for values in latencies.values() for value in values],
+                        wall, cpu, sum(errors.values())
+                    )
+        finally:
+            await client.stop()
+        return results
+
+    return asyncio.run(main())
@@ -0,0 +1,109 @@
+"""Shared helpers: payloads, latency summaries, environment info, JSON output."""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+from app.core.config import settings
+from app.models.manager import synthetic_inputs
+
+
+def single_payloads(count: int, seed: int = 0) -> List[dict]:
+    """Distinct valid /predict payloads (distinct so the cache is not all hits)."""
+    return [data.model_dump() for data in synthetic_inputs(count, seed=seed)]
+
+
+def batch_payload(size: int, seed: int = 0) -> dict:
+    """A /predict/batch payload of valid records."""
+    return {"records": single_payloads(size, seed=seed)}
+
+
+def summarize(latencies_s, wall_s: float, cpu_s: Optional[float], errors: int = 0,
+              rows_per_request: int = 1) -> dict:
+    """Latency percentiles (ms), throughput and CPU cost of one benchmark.
+
+    Args:
+        latencies_s: Per-request latencies in seconds
+        wall_s: Wall-clock duration of the run
+        cpu_s: CPU seconds used for the run (None if unknown)
+        errors: Requests that failed
+        rows_per_request: Rows scored per request (for rows/s)
+    """
+    latencies = np.asarray(latencies_s, dtype=np.float64) * 1000.0
+    n = len(latencies)
+    if n == 0:
+        return {"requests": 0, "errors": errors}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    result = {
+        "requests": n,
+        "errors": errors,
+        "mean_ms": round(float(latencies.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(latencies.max()), 4),
+        "req_per_s": round(n / wall_s, 2) if wall_s > 0 else None,
+        "cpu_ms_per_req": round(cpu_s * 1000.0 / n, 4) if cpu_s is not None else None
+    }
+    if rows_per_request > 1:
+        result["rows_per_s"] = round(n * rows_per_request / wall_s, 2) if wall_s > 0 else None
+    return result
+
+
+def process_cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU seconds of another process (Linux /proc), or None."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime, stime, cutime, cstime (fields 14-17, counted after the name)
+        ticks = sum(int(value) for value in fields[11:15])
+        return ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).parent, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> dict:
+    """Commit, interpreter and the settings that affect performance."""
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            key: getattr(settings, key)
+            for key in ("inference_engine", "artifact_format", "inference_executor",
+                        "inference_workers", "micro_batch_enabled",
+                        "prediction_cache_enabled", "lookup_table_enabled",
+                        "metrics_enabled")
+        }
+    }
+
+
+def write_report(kind: str, config: dict, results: dict, out: Optional[Path]) -> dict:
+    """Print the report as JSON and optionally save it to a file."""
+    report = {"benchmark": kind, "config": config, "environment": environment(),
+              "results": results}
+    text = json.dumps(report, indent=2, default=str)
+    print(text)
+    if out is not None:
+        Path(out).write_text(text + "\n")
+        print(f"✓ Results written to {out}", file=sys.stderr)
+    return report
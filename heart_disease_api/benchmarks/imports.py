@@ -0,0 +1,119 @@
+"""Cold-start cost of scoring in a fresh process (batch jobs, UDF workers).
+
+Each run starts a new interpreter that imports one scoring entry point,
+loads the artifacts and scores one row:
+
+- engine: app.engine.ScoringEngine on the exported artifacts (NumPy only)
+- predictor_exported: app.models.predictor.HeartDiseasePredictor on the
+  same export (the API's code path: settings, pydantic schemas)
+- predictor_joblib: HeartDiseasePredictor on the .pkl files (joblib and
+  sklearn unpickling)
+
+The artifacts are exported to a temporary directory first. Reported per
+entry point: import time and time to first prediction (both from
+interpreter start of the import, in ms, over all runs), resident memory
+after the prediction, and which heavy dependencies ended up imported.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+
+from benchmarks.common import summarize
+
+# Dependencies the slim engine must not pull in
+HEAVY_MODULES = ("fastapi", "pydantic", "pydantic_settings", "joblib", "sklearn", "scipy",
+                 "pandas")
+
+_ROW = [63, 1, 3, 145, 233, 1, 0, 150, 0, 2.3, 0, 0, 1]
+
+_SCRIPTS = {
+    "engine": """
+from app.engine import ScoringEngine
+imported = time.perf_counter()
+ScoringEngine.load().predict_proba(np.array([ROW], dtype=np.float64))
+""",
+    "predictor": """
+from app.models.predictor import HeartDiseasePredictor
+imported = time.perf_counter()
+HeartDiseasePredictor().predict_batch(np.array([ROW], dtype=np.float64))
+""",
+}
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import numpy as np
+{script}
+finished = time.perf_counter()
+rss = None
+try:
+    with open("/proc/self/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+except (OSError, StopIteration):
+    pass
+print(json.dumps({{
+    "import_s": imported - started,
+    "first_prediction_s": finished - started,
+    "rss_kb": rss,
+    "modules": len(sys.modules),
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def _probe(script: str, env: dict) -> dict:
+    code = _PROBE.format(script=script.replace("ROW", repr(_ROW)), heavy=HEAVY_MODULES)
+    completed = subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=Path(__file__).parent.parent,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int = 10) -> dict:
+    """Measure cold imports and first predictions of each scoring entry point.
+
+    Args:
+        runs: Fresh interpreters per entry point
+
+    Returns:
+        Results keyed by "<entry point>_import" and
+        "<entry point>_first_prediction" (latency fields in ms), plus
+        memory and heavy imports per entry point
+    """
+    from app.models import ml_model
+    from app.models.exported import export_artifacts
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        export_artifacts(ml_model.get_model(), ml_model.get_scaler(), Path(tmp),
+                         ml_model.get_fingerprint())
+        base_env = {**os.environ, "EXPORTED_ARTIFACTS_DIR": tmp,
+                    "PYTHONPATH": str(Path(__file__).parent.parent)}
+        cases = (
+            ("engine", _SCRIPTS["engine"], {}),
+            ("predictor_exported", _SCRIPTS["predictor"], {"ARTIFACT_FORMAT": "exported"}),
+            ("predictor_joblib", _SCRIPTS["predictor"], {"ARTIFACT_FORMAT": "joblib"}),
+        )
+        for name, script, env in cases:
+            probes = [_probe(script, {**base_env, **env}) for _ in range(runs)]
+            results[f"{name}_import"] = summarize([p["import_s"] for p in probes], 0.0, None)
+            results[f"{name}_first_prediction"] = summarize(
+                [p["first_prediction_s"] for p in probes], 0.0, None
+            )
+            rss = [p["rss_kb"] for p in probes if p["rss_kb"] is not None]
+            results[name] = {
+                "rss_kb": int(np.median(rss)) if rss else None,
+                "modules": probes[0]["modules"],
+                "heavy_modules": probes[0]["heavy"]
+            }
+            print(f"✓ {name}: import p50 {results[f'{name}_import']['p50_ms']:.1f} ms, "
+                  f"first prediction p50 "
+                  f"{results[f'{name}_first_prediction']['p50_ms']:.1f} ms, "
+                  f"heavy imports {probes[0]['heavy'] or 'none'}", file=sys.stderr)
+    return results
@@ -0,0 +1,202 @@
+"""Concurrent HTTP load generator for a running server (run.py).
+
+Each virtual client keeps one HTTP/1.1 keep-alive connection and sends
+requests back to back, with a configurable single/batch payload mix.
+The client is written on asyncio streams, so one process can keep many
+connections busy without an HTTP client library.
+
+Server CPU per request is measured from /proc/<pid>/stat when the server
+PID is known: pass --server-pid, or use --spawn to start run.py here.
+"""
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.common import batch_payload, process_cpu_seconds, single_payloads, summarize
+
+
+class HTTPConnection:
+    """One keep-alive HTTP/1.1 connection on asyncio streams."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: Optional[dict] = None) -> Tuple[int, bytes]:
+        """Send a request and read the full response (reconnecting if needed)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"{extra}\r\n")
+        self.writer.write(head.encode() + body)
+        try:
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionError("Connection closed by server")
+            status = int(status_line.split()[1])
+            length, close = None, False
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                name = name.strip().lower()
+                if name == "content-length":
+                    length = int(value)
+                elif name == "connection" and value.strip().lower() == "close":
+                    close = True
+            body = await self.reader.readexactly(length) if length else b""
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            self.close()
+            raise
+        if close:
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def _run_load(url: str, concurrency: int, duration_s: float, warmup_s: float,
+                    batch_fraction: float, batch_size: int, distinct: int):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip("/")
+    singles = [json.dumps(payload).encode() for payload in single_payloads(distinct)]
+    batches = [json.dumps(batch_payload(batch_size, seed=seed)).encode() for seed in range(8)]
+
+    latencies = {"predict": [], "predict_batch": []}
+    errors = {"predict": 0, "predict_batch": 0}
+    started = time.perf_counter()
+    measure_from = started + warmup_s
+    deadline = measure_from + duration_s
+
+    async def worker(seed: int):
+        rng = random.Random(seed)
+        connection = HTTPConnection(host, port)
+        try:
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if rng.random() < batch_fraction:
+                    name, path, body = "predict_batch", f"{prefix}/predict/batch", rng.choice(batches)
+                else:
+                    name, path, body = "predict", f"{prefix}/predict", rng.choice(singles)
+                request_started = time.perf_counter()
+                try:
+                    status, _ = await connection.request("POST", path, body)
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    status = 599
+                if request_started >= measure_from:
+                    latencies[name].append(time.perf_counter() - request_started)
+                    if status >= 400:
+                        errors[name] += 1
+        finally:
+            connection.close()
+
+    tasks = [asyncio.ensure_future(worker(i)) for i in range(concurrency)]
+    await asyncio.sleep(max(0.0, measure_from - time.perf_counter()))
+    return tasks, latencies, errors
+
+
+def _wait_ready(url: str, timeout_s: float = 60.0):
+    """Poll GET /ready until the server reports ready."""
+    parts = urlsplit(url)
+
+    async def poll():
+        deadline = time.perf_counter() + timeout_s
+        while time.perf_counter() < deadline:
+            connection = HTTPConnection(parts.hostname, parts.port or 80)
+            try:
+                status, _ = await connection.request("GET", "/ready")
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            finally:
+                connection.close()
+            await asyncio.sleep(0.25)
+        raise TimeoutError(f"Server at {url} not ready after {timeout_s:.0f}s")
+
+    asyncio.run(poll())
+
+
+def spawn_server(port: int, extra_env: Optional[dict] = None) -> subprocess.Popen:
+    """Start run.py on a local port and wait until it is ready."""
+    root = Path(__file__).resolve().parent.parent
+    process = subprocess.Popen(
+        [sys.executable, "run.py", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=root, env={**os.environ, **(extra_env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_ready(f"http://127.0.0.1:{port}")
+    except Exception:
+        process.terminate()
+        raise
+    return process
+
+
+def run(url: str, concurrency: int = 32, duration_s: float = 10.0, warmup_s: float = 2.0,
+        batch_fraction: float = 0.0, batch_size: int = 100, distinct: int = 1000,
+        server_pid: Optional[int] = None) -> dict:
+    """Generate HTTP load against a running server.
+
+    Args:
+        url: Base URL of the API prefix, e.g. http://localhost:8000/api
+        concurrency: Concurrent keep-alive connections
+        duration_s: Measured duration
+        warmup_s: Unmeasured load before the measurement starts
+        batch_fraction: Share of /predict/batch requests
+        batch_size: Records per batch request
+        distinct: Distinct single payloads cycled through (cache hit rate)
+        server_pid: Server process to measure CPU for (None = unknown)
+
+    Returns:
+        Results keyed by request type
+    """
+    async def main():
+        tasks, latencies, errors = await _run_load(
+            url, concurrency, duration_s, warmup_s, batch_fraction, batch_size, distinct
+        )
+        cpu_started = process_cpu_seconds(server_pid) if server_pid else None
+        started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+        cpu_finished = process_cpu_seconds(server_pid) if server_pid else None
+        return latencies, errors, wall, cpu_started, cpu_finished
+
+    latencies, errors, wall, cpu_started, cpu_finished = asyncio.run(main())
+    server_cpu = (cpu_finished - cpu_started
+                  if cpu_started is not None and cpu_finished is not None else None)
+
+    measured = {name: values for name, values in latencies.items() if values}
+    results = {}
+    for name, values in measured.items():
+        # CPU cannot be attributed per request type in a mixed run
+        results[name] = summarize(
+            values, wall, server_cpu if len(measured) == 1 else None, errors[name],
+            rows_per_request=batch_size if name == "predict_batch" else 1
+        )
+    if len(measured) > 1:
+        results["all"] = summarize(
+            [value for values in measured.values() for value in values],
+            wall, server_cpu, sum(errors.values())
+        )
+    return results
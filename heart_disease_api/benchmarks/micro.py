@@ -0,0 +1,107 @@
+"""Micro-benchmarks of the prediction code path, in-process.
+
+Each sample times a tight loop of calls (sized so one sample takes at
+least ~50 us) and reports per-call latency, so sub-microsecond functions
+such as _get_risk_level are not dominated by timer overhead.
+"""
+
+import json
+import time
+from typing import Callable
+import numpy as np
+
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.heart import HeartDiseaseInput
+from app.utils.preprocessing import extract_features, preprocess_input
+from benchmarks.common import single_payloads, summarize
+
+_MIN_SAMPLE_S = 50e-6
+
+
+def _calls_per_sample(func: Callable[[], object]) -> int:
+    """Calls per timed sample so one sample lasts at least _MIN_SAMPLE_S."""
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        if time.perf_counter() - started >= _MIN_SAMPLE_S or calls >= 1 << 20:
+            return calls
+        calls *= 2
+
+
+def bench(func: Callable[[], object], duration_s: float) -> dict:
+    """Time func repeatedly for about duration_s seconds."""
+    for _ in range(10):
+        func()
+    calls = _calls_per_sample(func)
+
+    samples = []
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    deadline = started + duration_s
+    while True:
+        sample_started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        now = time.perf_counter()
+        samples.append((now - sample_started) / calls)
+        if now >= deadline:
+            break
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    # Each sample stands for one call: scale wall and CPU time to match
+    result = summarize(samples, wall / calls, cpu / calls)
+    result["calls"] = len(samples) * calls
+    result["calls_per_sample"] = calls
+    return result
+
+
+def run(duration_s: float = 2.0, batch_size: int = 1000, distinct: int = 256) -> dict:
+    """Benchmark the predictor building blocks.
+
+    Args:
+        duration_s: Time spent per benchmark
+        batch_size: Rows per predict_batch call
+        distinct: Number of distinct inputs cycled through
+
+    Returns:
+        Results keyed by benchmark name (latency in ms per call)
+    """
+    predictor = HeartDiseasePredictor()
+    inputs = [HeartDiseaseInput(**payload) for payload in single_payloads(distinct)]
+    payloads = single_payloads(distinct)
+    bodies = [json.dumps(payload).encode() for payload in payloads]
+    matrix = np.stack([extract_features(data) for data in inputs])
+    batch = matrix[np.arange(batch_size) % len(matrix)]
+    probabilities = np.linspace(0.0, 1.0, distinct).tolist()
+    prediction = predictor.predict(inputs[0])
+
+    def cycle(items):
+        state = {"i": 0}
+
+        def next_item():
+            state["i"] = (state["i"] + 1) % len(items)
+            return items[state["i"]]
+        return next_item
+
+    next_input, next_payload, next_probability = cycle(inputs), cycle(payloads), cycle(probabilities)
+    next_body = cycle(bodies)
+
+    benchmarks = {
+        "validate_input": lambda: HeartDiseaseInput(**next_payload()),
+        "validate_request": lambda: extract_features(HeartDiseaseInput.model_validate_json(next_body())),
+        "preprocess_input": lambda: preprocess_input(next_input(), predictor.scaler),
+        "predict": lambda: predictor.predict(next_input()),
+        "get_risk_level": lambda: predictor._get_risk_level(next_probability()),
+        "serialize_prediction": lambda: prediction.model_dump_json(),
+        f"predict_batch_{batch_size}": lambda: predictor.predict_batch(batch),
+    }
+
+    results = {}
+    for name, func in benchmarks.items():
+        results[name] = bench(func, duration_s)
+        if name.startswith("predict_batch"):
+            results[name]["rows_per_s"] = round(batch_size / (results[name]["mean_ms"] / 1000.0), 1)
+    return results
@@ -0,0 +1,106 @@
+"""Recall vs latency of the neighbor indexes against exact sklearn KNN.
+
+The served artifact may not be a KNN model, and a production-sized
+training set is not shipped, so this builds a synthetic registry: random
+in-range patients labeled by the loaded model, scaled with the loaded
+scaler. A brute-force KNeighborsClassifier fitted on it is the exact
+reference, and every index kind (ivf for a range of n_probe values) is
+compared with it on the same single-row queries:
+
+- recall: share of returned neighbors within the true k-th distance
+  (distance-based, so ties at the k-th distance count as correct)
+- agreement: share of queries with the same predicted label
+- max_proba_diff: largest probability difference from the reference
+"""
+
+import time
+from typing import Iterable, Optional
+import numpy as np
+
+from app.models.compiled import CompiledKNN
+from app.models.neighbors import IndexedKNN, build_index
+from app.models.predictor import HeartDiseasePredictor
+from app.utils.preprocessing import (
+    FEATURE_LOWER, FEATURE_ORDER, FEATURE_UPPER, INTEGER_FEATURES, preprocess_batch
+)
+from benchmarks.common import summarize
+
+
+def synthetic_registry(predictor: HeartDiseasePredictor, rows: int, seed: int = 0):
+    """Random in-range patients, scaled, labeled by the loaded model."""
+    rng = np.random.default_rng(seed)
+    raw = rng.uniform(FEATURE_LOWER, FEATURE_UPPER, size=(rows, len(FEATURE_ORDER)))
+    raw = np.where(INTEGER_FEATURES, np.round(raw), np.round(raw, 1))
+    labels, _ = predictor.predict_batch(raw)
+    return preprocess_batch(raw, predictor.scaler), labels.astype(np.int64)
+
+
+def _time_single_rows(predict_proba, queries: np.ndarray):
+    """Score queries one row at a time, as /predict does."""
+    latencies = []
+    probabilities = np.empty((len(queries), 2), dtype=np.float64)
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    for i in range(len(queries)):
+        call_started = time.perf_counter()
+        probabilities[i] = predict_proba(queries[i:i + 1])[0]
+        latencies.append(time.perf_counter() - call_started)
+    wall = time.perf_counter() - started
+    return summarize(latencies, wall, time.process_time() - cpu_started), probabilities
+
+
+def run(rows: int = 200_000, queries: int = 500, n_neighbors: int = 5,
+        n_lists: Optional[int] = None, n_probes: Iterable[int] = (1, 2, 4, 8, 16, 32, 64),
+        seed: int = 0) -> dict:
+    """Benchmark every index kind against brute-force sklearn KNN.
+
+    Args:
+        rows: Training rows in the synthetic registry
+        queries: Single-row queries timed per configuration
+        n_neighbors: k of the KNN model
+        n_lists: ivf partitions (default about sqrt(rows))
+        n_probes: ivf n_probe values to measure
+        seed: Random seed for the registry and queries
+
+    Returns:
+        Results keyed by configuration (latency in ms per query)
+    """
+    from sklearn.neighbors import KNeighborsClassifier
+
+    predictor = HeartDiseasePredictor()
+    X, y = synthetic_registry(predictor, rows, seed=seed)
+    reference = KNeighborsClassifier(n_neighbors=n_neighbors, algorithm="brute").fit(X, y)
+    query_rows, _ = synthetic_registry(predictor, queries, seed=seed + 1)
+    true_distances, _ = reference.kneighbors(query_rows)
+    kth_distance = true_distances[:, -1:]
+
+    results = {}
+    results["sklearn_brute"], expected = _time_single_rows(reference.predict_proba, query_rows)
+    results["sklearn_brute"].update({"recall": 1.0, "agreement": 1.0, "max_proba_diff": 0.0})
+
+    knn = CompiledKNN(reference)
+    configurations = [("kd_tree", {}), ("ball_tree", {}), ("ivf", {"n_lists": n_lists, "seed": seed})]
+    for kind, params in configurations:
+        started = time.perf_counter()
+        index = build_index(knn, kind, **params)
+        build_s = round(time.perf_counter() - started, 3)
+        model = IndexedKNN(knn, index)
+
+        for n_probe in (n_probes if kind == "ivf" else [None]):
+            name = kind
+            if n_probe is not None:
+                index.n_probe = n_probe
+                name = f"ivf_probe_{n_probe}"
+            result, probabilities = _time_single_rows(model.predict_proba, query_rows)
+            distances, _ = model.kneighbors(query_rows)
+            result.update({
+                "recall": round(float(np.mean(distances <= kth_distance * (1 + 1e-9))), 4),
+                "agreement": round(float(np.mean(
+                    np.argmax(probabilities, axis=1) == np.argmax(expected, axis=1)
+                )), 4),
+                "max_proba_diff": round(float(np.abs(probabilities - expected).max()), 4),
+                "build_s": build_s,
+                **index.describe()
+            })
+            results[name] = result
+    return results
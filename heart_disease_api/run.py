@@ -3,8 +3,15 @@
 Usage:
     python run.py
     python run.py --port 8080
+    python run.py --production                  # one worker per CPU
+    python run.py --production --workers 4 --cpu-affinity
+
+Production mode forks pre-loaded workers from a supervisor process (see
+app/core/supervisor.py). Send the supervisor SIGHUP for a graceful
+restart with fresh artifacts, SIGTERM to stop.
 """
 
+import sys
 import uvicorn
 from app.core.config import settings
 import argparse
@@ -15,8 +22,39 @@ if __name__ == "__main__":
     parser.add_argument("--port", type=int, default=settings.port, help="Port number")
     parser.add_argument("--reload", action="store_true", help="Enable auto-reload")
     
+    production = parser.add_argument_group("production mode")
+    production.add_argument("--production", action="store_true",
+                            help="Run pre-forked workers under a supervisor")
+    production.add_argument("--workers", type=int, default=settings.server_workers,
+                            help="Worker processes (0 = one per CPU)")
+    production.add_argument("--cpu-affinity", action=argparse.BooleanOptionalAction,
+                            default=settings.server_cpu_affinity,
+                            help="Pin each worker to one CPU (Linux)")
+    production.add_argument("--blas-threads", type=int, default=settings.server_blas_threads,
+                            help="BLAS/OpenMP threads per worker (0 = library default)")
+    production.add_argument("--preload", action=argparse.BooleanOptionalAction,
+                            default=settings.server_preload,
+                            help="Load the artifacts once before forking the workers")
+    production.add_argument("--graceful-timeout", type=float,
+                            default=settings.server_graceful_timeout_seconds,
+                            help="Seconds workers get to finish in-flight requests")
+    
     args = parser.parse_args()
     
+    if args.production:
+        from app.core.supervisor import Supervisor
+        
+        supervisor = Supervisor(
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            cpu_affinity=args.cpu_affinity,
+            blas_threads=args.blas_threads,
+            preload=args.preload,
+            graceful_timeout=args.graceful_timeout
+        )
+        sys.exit(supervisor.run())
+    
     print(f"Starting server on {args.host}:{args.port}")
     
     uvicorn.run(
@@ -88,6 +88,65 @@ def test_predict():
         print(f"Error: {response.text}")
 
 
+def test_predict_validation():
+    """Test that both request paths of POST /api/predict agree."""
+    print("\n" + "="*60)
+    print("Testing Prediction Validation: POST /api/predict")
+    print("="*60)
+    
+    # Numbers sent as strings skip the fast path but are still accepted
+    fast = requests.post(f"{BASE_URL}/api/predict", json=test_patient)
+    coerced = requests.post(f"{BASE_URL}/api/predict",
+                            json={key: str(value) for key, value in test_patient.items()})
+    assert fast.status_code == coerced.status_code == 200
+    assert fast.json() == coerced.json()
+    assert fast.headers["content-type"] == "application/json"
+    assert fast.headers["X-Model-Version"] == coerced.headers["X-Model-Version"]
+    
+    # Invalid input keeps FastAPI's standard 422 error format
+    response = requests.post(f"{BASE_URL}/api/predict", json={**test_patient, "age": 500})
+    print(f"Status Code: {response.status_code}")
+    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "age"]
+    assert response.json()["detail"][0]["type"] == "less_than_equal"
+    
+    print("✅ Prediction validation working!")
+
+
+def test_predict_batch():
+    """Test batch prediction endpoint."""
+    print("\n" + "="*60)
+    print("Testing Batch Prediction: POST /api/predict/batch")
+    print("="*60)
+    
+    invalid_patient = {**test_patient, "age": 500}
+    payload = {"records": [test_patient, invalid_patient, test_patient]}
+    
+    response = requests.post(f"{BASE_URL}/api/predict/batch", json=payload)
+    print(f"Status Code: {response.status_code}")
+    assert response.status_code == 200
+    
+    result = response.json()
+    print(f"Response: {json.dumps(result, indent=2)}")
+    
+    # Validate per-row results and ordering
+    assert result["total"] == 3
+    assert result["succeeded"] == 2
+    assert result["failed"] == 1
+    assert [item["index"] for item in result["results"]] == [0, 1, 2]
+    assert result["results"][1]["errors"]
+    assert result["results"][1]["prediction"] is None
+    assert result["results"][0]["risk_level"] in ["Low", "Medium", "High"]
+    
+    # Single and batch paths must agree
+    single = requests.post(f"{BASE_URL}/api/predict", json=test_patient).json()
+    assert result["results"][0]["probability"] == single["probability"]
+    assert result["results"][0]["prediction"] == single["prediction"]
+    
+    print("✅ Batch prediction endpoint working!")
+
+
 def main():
     """Run all tests."""
     print("\n" + "🧪 " + "="*56 + " 🧪")
@@ -98,6 +157,8 @@ def main():
         test_root()
         test_health()
         test_predict()
+        test_predict_validation()
+        test_predict_batch()
         
         print("\n" + "="*60)
         print("✅ ALL TESTS PASSED!")
@@ -0,0 +1,1597 @@
+"""In-process tests for the prediction engine.
+
+Unlike test_api.py these do not need a running server; they load the
+artifacts directly and check the predictor against the raw sklearn model.
+
+Run with:
+    python test_predictor.py
+    python -m pytest test_predictor.py
+"""
+
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import pstats
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+from pathlib import Path
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.api import predict as predict_api
+from app.core import metrics, profiling
+from app.core.admission import (
+    CLIENT_STATE_KEY,
+    PAID_STATE_KEY,
+    ConcurrencyLimiter,
+    MemoryRateLimitBackend,
+    SQLiteRateLimitBackend,
+    admission,
+)
+from app.core.config import settings
+from app.core.executor import InferenceExecutor, inference_executor
+from app.core.supervisor import Supervisor
+from app.core.http_cache import (
+    MemoryIdempotencyStore, SQLiteIdempotencyStore, StoredResponse, etag_matches, make_etag
+)
+from app.models import ml_model
+from app.models.batcher import MicroBatcher
+from app.models.cache import (
+    PredictionCache,
+    cache_for,
+    candidate_caches,
+    make_key,
+    prediction_cache,
+)
+from app.models.compact import compact_knn, compare_knn, load_compact_knn, shuffled_queries
+from app.models.compiled import CompiledKNN, compile_artifacts
+from app.models.exported import export_artifacts, load_exported
+from app.models.lookup import LookupTable, encode
+from app.models.manager import PredictorManager
+from app.models.neighbors import IndexedKNN, build_index, load_indexed_model, save_index
+from app.models.registry import ModelRegistry, RegisteredModel, UnknownModelError, model_registry
+from app.models.shadow import ShadowScorer, SQLiteShadowSink
+from app import score
+from app.engine import RISK_LEVELS, ScoringEngine, risk_levels
+from app.models.shared_cache import BUCKET_SLOTS, SharedPredictionCache
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.heart import HeartDiseaseBatchInput, HeartDiseaseInput
+from app.utils.preprocessing import (
+    FEATURE_LOWER,
+    FEATURE_ORDER,
+    FEATURE_UPPER,
+    INTEGER_FEATURES,
+    build_feature_matrix,
+)
+from app.utils import columnar
+from app.utils.streaming import (
+    LineSplitter,
+    format_results,
+    parse_csv_header,
+    parse_lines,
+    validate_records,
+)
+
+predictor = HeartDiseasePredictor()
+
+
+def sample_domain(n_rows: int = 20000, seed: int = 0) -> np.ndarray:
+    """Sample raw feature rows covering the whole validated input domain.
+
+    Every categorical combination is included at least once (with random
+    vitals), followed by uniform random rows within the schema bounds.
+    Integer fields are whole numbers and oldpeak uses 0.1 steps.
+    """
+    rng = np.random.default_rng(seed)
+
+    def random_rows(n):
+        rows = rng.uniform(FEATURE_LOWER, FEATURE_UPPER, size=(n, len(FEATURE_ORDER)))
+        rows[:, INTEGER_FEATURES] = np.round(rows[:, INTEGER_FEATURES])
+        rows[:, ~INTEGER_FEATURES] = np.round(rows[:, ~INTEGER_FEATURES], 1)
+        return rows
+
+    categorical = [j for j, name in enumerate(FEATURE_ORDER)
+                   if INTEGER_FEATURES[j] and FEATURE_UPPER[j] - FEATURE_LOWER[j] <= 4]
+    grid = list(itertools.product(*[
+        range(int(FEATURE_LOWER[j]), int(FEATURE_UPPER[j]) + 1) for j in categorical
+    ]))
+    grid_rows = random_rows(len(grid))
+    grid_rows[:, categorical] = np.array(grid, dtype=np.float64)
+
+    return np.vstack([grid_rows, random_rows(n_rows)])
+
+
+def reference_predict(features: np.ndarray):
+    """Original two-call path on the sklearn artifacts: predict_proba, then predict."""
+    model, scaler = ml_model.get_model(), ml_model.get_scaler()
+    scaled = scaler.transform(features)
+    return model.predict(scaled), model.predict_proba(scaled)
+
+
+def test_single_pass_parity():
+    """Single-pass labels and probabilities must match predict + predict_proba."""
+    print("\n" + "="*60)
+    print("Testing single-pass inference parity")
+    print("="*60)
+
+    features = sample_domain()
+    expected_labels, expected_proba = reference_predict(features)
+
+    original = settings.single_pass_inference
+    try:
+        settings.single_pass_inference = True
+        predictions, probabilities = predictor.predict_batch(features)
+    finally:
+        settings.single_pass_inference = original
+
+    print(f"Rows checked: {len(features)}")
+    assert np.array_equal(predictions, expected_labels == 1)
+    assert np.array_equal(probabilities, expected_proba[:, 1])
+
+    # Ties (p == 0.5) must resolve to the first class, like predict
+    ties = expected_proba[:, 0] == expected_proba[:, 1]
+    print(f"Tied rows: {int(ties.sum())}")
+    assert not predictions[ties].any()
+
+    print("✅ Single-pass inference matches the two-call path!")
+
+
+def test_compiled_engine_parity():
+    """Compiled NumPy engine must match sklearn (bit-for-bit for the shipped model)."""
+    print("\n" + "="*60)
+    print("Testing compiled engine parity")
+    print("="*60)
+
+    features = sample_domain()
+    model, scaler = ml_model.get_model(), ml_model.get_scaler()
+    compiled_model, compiled_scaler = compile_artifacts(model, scaler)
+
+    scaled = scaler.transform(features)
+    compiled_scaled = compiled_scaler.transform(features)
+    assert np.array_equal(compiled_scaled, scaled)
+
+    expected_labels, expected_proba = reference_predict(features)
+    assert np.array_equal(compiled_model.predict_proba(compiled_scaled), expected_proba)
+    assert np.array_equal(compiled_model.predict(compiled_scaled), expected_labels)
+
+    # Single rows go through the same code path as the API
+    for row in features[::1000]:
+        single = compiled_model.predict_proba(compiled_scaler.transform(row.reshape(1, -1)))
+        assert np.array_equal(single, model.predict_proba(scaler.transform(row.reshape(1, -1))))
+
+    print(f"Rows checked: {len(features)}")
+
+    # The shipped model is a forest, so check CompiledKNN against fitted KNN models
+    from sklearn.neighbors import KNeighborsClassifier
+
+    train = scaler.transform(features[:5000])
+    labels = expected_labels[:5000]
+    queries = scaler.transform(sample_domain(n_rows=500, seed=10)[-500:])
+    for params in ({}, {"p": 1}, {"p": 3}, {"metric": "euclidean", "algorithm": "brute"}):
+        knn = KNeighborsClassifier(n_neighbors=5, **params).fit(train, labels)
+        compiled_knn = CompiledKNN(knn)
+        distances, indices = knn.kneighbors(queries, n_neighbors=6)
+        compiled_distances, compiled_indices = compiled_knn.kneighbors(queries)
+        np.testing.assert_allclose(compiled_distances, distances[:, :5], rtol=1e-12, atol=1e-12)
+        # Only rows tied for the k-th place may pick a different neighbour
+        untied = ~np.isclose(distances[:, 4], distances[:, 5], rtol=1e-12, atol=1e-12)
+        assert np.array_equal(np.sort(compiled_indices[untied], axis=1),
+                              np.sort(indices[untied, :5], axis=1)), params
+        assert np.array_equal(compiled_knn.predict_proba(queries[untied]),
+                              knn.predict_proba(queries[untied])), params
+        print(f"KNN {params}: {int(untied.sum())} untied rows identical")
+
+    # Distance temporaries stay bounded however large the training matrix is
+    rng = np.random.default_rng(0)
+    large = CompiledKNN(KNeighborsClassifier(n_neighbors=5).fit(
+        rng.normal(size=(20000, len(FEATURE_ORDER))), rng.integers(0, 2, 20000)
+    ))
+    tracemalloc.start()
+    large.predict_proba(rng.normal(size=(256, len(FEATURE_ORDER))))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"KNN over 20k rows: {peak / 1e6:.1f} MB peak for 256 queries")
+    assert peak < 64e6
+
+    print("✅ Compiled engine matches sklearn!")
+
+
+def test_exported_artifacts_parity():
+    """Pickle-free exported artifacts reload (memory-mapped) with identical output."""
+    print("\n" + "="*60)
+    print("Testing exported artifact format")
+    print("="*60)
+
+    features = sample_domain(n_rows=2000, seed=4)
+    expected_labels, expected_proba = reference_predict(features)
+
+    with tempfile.TemporaryDirectory() as directory:
+        export_artifacts(ml_model.get_model(), ml_model.get_scaler(), Path(directory),
+                         ml_model.get_fingerprint())
+        model, scaler, fingerprint = load_exported(Path(directory))
+
+        assert fingerprint == ml_model.get_fingerprint()
+        assert isinstance(model.threshold, np.memmap)
+        proba = model.predict_proba(scaler.transform(features))
+        labels = model.predict(scaler.transform(features))
+        del model, scaler
+
+    assert np.array_equal(proba, expected_proba)
+    assert np.array_equal(labels, expected_labels)
+
+    print(f"Rows checked: {len(features)}")
+    print("✅ Exported artifacts match the pickled model!")
+
+
+def test_slim_engine():
+    """The NumPy-only engine scores like the predictor and imports no heavy dependencies."""
+    print("\n" + "="*60)
+    print("Testing slim scoring engine")
+    print("="*60)
+
+    features = sample_domain(n_rows=2000, seed=5)
+    expected_labels, expected_proba = reference_predict(features)
+
+    with tempfile.TemporaryDirectory() as directory:
+        export_artifacts(ml_model.get_model(), ml_model.get_scaler(), Path(directory),
+                         ml_model.get_fingerprint())
+        engine = ScoringEngine.load(Path(directory), chunk_size=512)
+        assert engine.fingerprint == ml_model.get_fingerprint()
+        assert np.array_equal(engine.predict_proba(features), expected_proba)
+        assert np.array_equal(engine.predict(features), expected_labels)
+        assert engine.predict_proba(features[0]).shape == (1, 2)  # One row as a vector
+
+        predictions, probabilities, risk = engine.score(features)
+        assert np.array_equal(predictions, expected_labels == 1)
+        assert risk.tolist() == [predictor._get_risk_level(p) for p in probabilities.tolist()]
+        try:
+            import pandas as pd
+        except ImportError:
+            pd = None
+        if pd is not None:
+            # Columns are selected by name, whatever their order in the frame
+            frame = pd.DataFrame(features, columns=FEATURE_ORDER)[FEATURE_ORDER[::-1]]
+            assert np.array_equal(engine.predict_proba(frame), expected_proba)
+        del engine
+
+    assert risk_levels([0.0, 0.3999, 0.4, 0.6999, 0.7, 1.0]).tolist() == [
+        "Low", "Low", "Medium", "Medium", "High", "High"
+    ]
+
+    # A fresh interpreter importing the engine must not load the API stack
+    heavy = ("fastapi", "pydantic", "pydantic_settings", "joblib", "sklearn", "scipy")
+    loaded = subprocess.run(
+        [sys.executable, "-c",
+         f"import sys, app.engine; print([m for m in {heavy!r} if m in sys.modules])"],
+        cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert loaded == "[]", f"app.engine imports {loaded}"
+
+    print(f"Rows checked: {len(features)}")
+    print("✅ Slim engine matches the predictor!")
+
+
+def test_lookup_table():
+    """Lookup table answers materialized cells and falls back for the rest."""
+    print("\n" + "="*60)
+    print("Testing lookup table")
+    print("="*60)
+
+    features = sample_domain(n_rows=2000, seed=3)
+    codes, on_grid = encode(features)
+    assert on_grid.all()
+
+    # Materialize half the rows, then score everything through the table
+    labels, proba = reference_predict(features[::2])
+    table = LookupTable.build(codes[::2], proba[:, 1], labels,
+                              meta={"fingerprint": predictor.fingerprint})
+    with tempfile.TemporaryDirectory() as directory:
+        table.save(Path(directory))
+        loaded = LookupTable.load(Path(directory))
+
+        original = predictor.lookup
+        try:
+            predictor.lookup = loaded
+            predictions, probabilities = predictor.predict_batch(features)
+            stats = loaded.describe()
+        finally:
+            predictor.lookup = original
+        del loaded
+
+    expected_labels, expected_proba = reference_predict(features)
+    assert np.array_equal(predictions, expected_labels == 1)
+    assert np.array_equal(probabilities, expected_proba[:, 1])
+    print(f"Lookup stats: {stats}")
+    materialized = np.isin(codes, codes[::2])
+    assert stats["hits"] == int(materialized.sum())
+    assert stats["misses"] == int((~materialized).sum())
+
+    # Off-grid values (oldpeak with two decimals) are never table hits
+    off_grid = features[:1].copy()
+    off_grid[0, FEATURE_ORDER.index("oldpeak")] = 1.25
+    assert not encode(off_grid)[1][0]
+
+    # Grid files: float steps load, off-grid values are rejected
+    from app.materialize import load_grid
+    with tempfile.TemporaryDirectory() as directory:
+        grid_path = Path(directory) / "grid.json"
+        grid_path.write_text(json.dumps({"oldpeak": {"start": 0, "stop": 4, "step": 0.1},
+                                         "chol": [200, 240]}))
+        axes = load_grid(grid_path)
+        assert len(axes[FEATURE_ORDER.index("oldpeak")]) == 41
+        grid_path.write_text(json.dumps({"oldpeak": [1.0, 1.25]}))
+        try:
+            load_grid(grid_path)
+            raise AssertionError("Off-grid oldpeak was accepted")
+        except ValueError as e:
+            assert "oldpeak" in str(e)
+
+    print("✅ Lookup table matches the live model!")
+
+
+def test_neighbor_index():
+    """Exact indexes match brute-force KNN; ivf trades recall for fewer distances."""
+    print("\n" + "="*60)
+    print("Testing neighbor indexes")
+    print("="*60)
+
+    from sklearn.neighbors import KNeighborsClassifier
+
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(3000, len(FEATURE_ORDER)))
+    y = (X[:, 0] + rng.normal(size=len(X)) > 0).astype(np.int64)
+    queries = rng.normal(size=(200, len(FEATURE_ORDER)))
+    reference = KNeighborsClassifier(n_neighbors=5, algorithm="brute").fit(X, y)
+    expected = reference.predict_proba(queries)
+
+    for kind in ("kd_tree", "ball_tree"):
+        model = IndexedKNN(CompiledKNN(reference), build_index(reference, kind))
+        assert np.array_equal(model.predict_proba(queries), expected), kind
+
+    index = build_index(reference, "ivf", n_lists=30)
+    model = IndexedKNN(CompiledKNN(reference), index)
+    index.n_probe = index.n_lists
+    assert np.array_equal(model.predict_proba(queries), expected)
+    index.n_probe = 1
+    assert (model.predict_proba(queries) != expected).any()
+
+    # An index smaller than k returns every row it holds
+    for kind in ("ivf", "kd_tree", "ball_tree"):
+        small = build_index(KNeighborsClassifier(n_neighbors=3).fit(X[:3], y[:3]), kind)
+        distances, indices = small.kneighbors(queries[:4], k=5)
+        assert distances.shape == (4, 3) and sorted(indices[0].tolist()) == [0, 1, 2], kind
+
+    with tempfile.TemporaryDirectory() as directory:
+        save_index(index, Path(directory), "fingerprint", build_seconds=0.0)
+        loaded = load_indexed_model(reference, Path(directory), "fingerprint", n_probe=30)
+        assert loaded is not None and isinstance(loaded.index.data, np.memmap)
+        assert np.array_equal(loaded.predict_proba(queries), expected)
+        del loaded
+
+        # Stale index or a non-KNN model: keep brute force
+        assert load_indexed_model(reference, Path(directory), "other", n_probe=30) is None
+        assert load_indexed_model(ml_model.get_model(), Path(directory), "fingerprint",
+                                  n_probe=30) is None
+
+    print("✅ Neighbor indexes working!")
+
+
+def test_compact_knn_parity():
+    """Compact KNN matrices agree with the float64 model on labels and probabilities."""
+    print("\n" + "="*60)
+    print("Testing compact KNN representations")
+    print("="*60)
+
+    from sklearn.neighbors import KNeighborsClassifier
+
+    # Heart-shaped data: categorical, integer and 0.1-step columns
+    scaler = ml_model.get_scaler()
+    train = sample_domain(n_rows=5000, seed=8)
+    labels, _ = reference_predict(train)
+    reference = CompiledKNN(KNeighborsClassifier(n_neighbors=5).fit(scaler.transform(train), labels))
+    queries = scaler.transform(sample_domain(n_rows=300, seed=9)[-300:])
+
+    results = {}
+    for precision in ("float32", "int16", "int8"):
+        compact = compact_knn(reference, precision)
+        results[precision] = compare_knn(reference, compact, queries, budget_s=60.0)
+        print(f"{precision}: {results[precision]}")
+        assert results[precision]["rows"] == len(queries)
+
+    assert results["float32"]["compact_bytes"] * 2 == results["float32"]["reference_bytes"]
+    assert results["int8"]["compact_bytes"] * 8 == results["int8"]["reference_bytes"]
+    # int16 holds every column on its exact grid; int8 all but chol
+    assert compact_knn(reference, "int16").exact.all()
+    assert compact_knn(reference, "int8").exact.sum() == len(FEATURE_ORDER) - 1
+    for precision in ("float32", "int16"):
+        assert results[precision]["label_agreement"] == 1.0
+        assert results[precision]["max_proba_diff"] == 0.0
+    assert results["int8"]["label_agreement"] >= 0.95
+
+    # Startup check queries are on the feature grids but are not training rows
+    checked = shuffled_queries(reference.fit_X, 256)
+    training_rows = {tuple(row) for row in reference.fit_X.tolist()}
+    assert not any(tuple(row) in training_rows for row in checked.tolist())
+    assert load_compact_knn(reference, "int8", check=True) is not None
+    # The memory saving is logged even without the timed check
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        load_compact_knn(reference, "int8")
+    assert "MB -> " in log.getvalue() and "check" not in log.getvalue()
+
+    # Quantized distances use bounded temporaries too
+    int8 = compact_knn(reference, "int8")
+    tracemalloc.start()
+    int8.predict_proba(queries)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < 32e6
+
+    # Non-KNN models are left alone
+    assert load_compact_knn(ml_model.get_model(), "int8") is None
+
+    print("✅ Compact KNN representations agree with float64!")
+
+
+def test_micro_batching_parity():
+    """Concurrent requests are batched together and get their own results."""
+    print("\n" + "="*60)
+    print("Testing micro-batching")
+    print("="*60)
+
+    features = sample_domain(seed=1)[::100]
+    inputs = [HeartDiseaseInput(**dict(zip(FEATURE_ORDER, row.tolist()))) for row in features]
+    expected = [predictor.predict(data) for data in inputs]
+
+    async def run_concurrently():
+        executor = InferenceExecutor("thread", max_workers=2, max_queue=len(inputs))
+        batcher = MicroBatcher(lambda: predictor, executor, max_batch_size=32, max_wait_ms=2.0)
+        try:
+            results = await asyncio.gather(*[batcher.predict(data) for data in inputs])
+        finally:
+            executor.shutdown()
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(run_concurrently())
+    print(f"Batcher stats: {stats}")
+    assert results == expected
+    assert stats["rows"] == len(inputs)
+    assert stats["batches"] < len(inputs)
+    assert stats["max_observed_batch_size"] <= 32
+
+    print("✅ Micro-batched results match single predictions!")
+
+
+def test_inference_overload():
+    """A full inference queue rejects requests with 503 and Retry-After."""
+    print("\n" + "="*60)
+    print("Testing inference queue overload")
+    print("="*60)
+
+    data = HeartDiseaseInput.model_validate(
+        HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+    )
+    body = json.dumps({"records": [data.model_dump()] * 3}).encode()
+
+    def batch_request() -> Request:
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return Request({
+            "type": "http", "method": "POST", "path": f"{settings.api_prefix}/predict/batch",
+            "headers": [(b"content-type", b"application/json")], "query_string": b"",
+            "client": ("127.0.0.1", 50000)
+        }, receive)
+
+    def stream_request() -> Request:
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        return Request({
+            "type": "http", "method": "POST", "path": f"{settings.api_prefix}/predict/stream",
+            "headers": [(b"content-type", b"application/x-ndjson")], "query_string": b"",
+            "client": ("127.0.0.1", 50000)
+        }, receive)
+
+    route = next(route for route in predict_api.router.routes
+                 if route.path == "/predict/batch")
+    handler = route.get_route_handler()
+
+    async def rejected(call) -> HTTPException:
+        try:
+            await call
+        except HTTPException as e:
+            return e
+        raise AssertionError("Request was not rejected")
+
+    async def run():
+        pending = inference_executor._pending
+        # Every worker busy and every queue slot taken
+        inference_executor._pending = inference_executor.max_workers + inference_executor.max_queue
+        try:
+            return [await rejected(predict_api._predict(data)),
+                    await rejected(handler(batch_request())),
+                    await rejected(predict_api.predict_heart_disease_stream(stream_request()))]
+        finally:
+            inference_executor._pending = pending
+
+    cache_enabled = settings.prediction_cache_enabled
+    settings.prediction_cache_enabled = False
+    try:
+        errors = asyncio.run(run())
+    finally:
+        settings.prediction_cache_enabled = cache_enabled
+    for error in errors:
+        print(f"Rejected: {error.status_code} {error.detail}")
+        assert error.status_code == 503 and error.headers == {"Retry-After": "1"}
+
+    # A stream that already started waits for capacity, then ends with an error record
+    async def overloaded_stream() -> list:
+        async def body():
+            yield (json.dumps(data.model_dump()) + "\n").encode()
+
+        pending = inference_executor._pending
+        inference_executor._pending = inference_executor.max_workers + inference_executor.max_queue
+        try:
+            return [line async for line in predict_api._stream_predictions(
+                body(), LineSplitter(), [], "ndjson", "ndjson", None, predictor, None
+            )]
+        finally:
+            inference_executor._pending = pending
+
+    wait_seconds = settings.stream_overload_wait_seconds
+    settings.stream_overload_wait_seconds = 0.1
+    try:
+        started = time.perf_counter()
+        lines = asyncio.run(overloaded_stream())
+    finally:
+        settings.stream_overload_wait_seconds = wait_seconds
+    print(f"Overloaded stream: {lines}")
+    assert len(lines) == 1 and "Server overloaded after 0 rows" in lines[0]
+    assert time.perf_counter() - started < 5
+
+    # With room in the queue, the same batch is parsed and scored off the loop
+    response = asyncio.run(handler(batch_request()))
+    result = json.loads(response.body)
+    assert response.status_code == 200 and result["succeeded"] == 3
+    assert result["results"][0]["probability"] == round(predictor.predict(data).probability, 4)
+    inference_executor.shutdown()
+
+    print("✅ Overloaded requests rejected with 503!")
+
+
+def test_prediction_cache():
+    """Cache evicts least recently used entries and drops stale fingerprints."""
+    print("\n" + "="*60)
+    print("Testing prediction cache")
+    print("="*60)
+
+    rows = sample_domain(n_rows=3, seed=2)[-3:]
+    inputs = [HeartDiseaseInput(**dict(zip(FEATURE_ORDER, row.tolist()))) for row in rows]
+    keys = [make_key(data) for data in inputs]
+    results = [predictor.predict(data) for data in inputs]
+
+    cache = PredictionCache(max_size=2)
+    cache.put(keys[0], predictor.fingerprint, results[0])
+    cache.put(keys[1], predictor.fingerprint, results[1])
+    assert cache.get(keys[0], predictor.fingerprint) == results[0]
+
+    # keys[1] is now least recently used and gets evicted
+    cache.put(keys[2], predictor.fingerprint, results[2])
+    assert cache.get(keys[1], predictor.fingerprint) is None
+    assert cache.get(keys[2], predictor.fingerprint) == results[2]
+
+    # A different artifact fingerprint invalidates everything
+    assert cache.get(keys[2], "retrained-model") is None
+    stats = cache.stats()
+    print(f"Cache stats: {stats}")
+    assert stats["size"] == 0
+    assert stats["evictions"] == 1
+    assert stats["invalidations"] == 1
+
+    # A result of the previous model arriving late does not switch the cache back
+    cache.put(keys[0], "retrained-model", results[0])
+    cache.put(keys[1], predictor.fingerprint, results[1])
+    assert cache.get(keys[0], "retrained-model") == results[0]
+    assert cache.stats()["stale_puts"] == 1 and cache.stats()["invalidations"] == 1
+
+    # Registry candidates have caches of their own: routing to one does not
+    # invalidate the primary's entries
+    assert cache_for(None) is prediction_cache
+    assert cache_for("candidate") is cache_for("candidate") is not prediction_cache
+    prediction_cache.put(keys[0], predictor.fingerprint, results[0])
+    cache_for("candidate").put(keys[0], "candidate-model", results[1])
+    assert prediction_cache.get(keys[0], predictor.fingerprint) == results[0]
+    assert cache_for("candidate").get(keys[0], "candidate-model") == results[1]
+
+    # Activating a registry without the candidate drops its cache
+    cache_for("kept")
+    registered = model_registry.snapshot
+    kept = RegisteredModel("kept", predictor, 0.0, False, "-")
+    try:
+        model_registry.activate(registered._replace(models={"kept": kept}))
+        assert list(candidate_caches) == ["kept"]
+    finally:
+        model_registry.activate(registered)
+    assert "kept" not in candidate_caches
+    candidate_caches.clear()
+
+    print("✅ Prediction cache working!")
+
+
+def test_shared_cache():
+    """Shared cache is visible across processes, evicts with CLOCK and invalidates."""
+    print("\n" + "="*60)
+    print("Testing shared prediction cache")
+    print("="*60)
+
+    import multiprocessing
+
+    rows = sample_domain(n_rows=BUCKET_SLOTS + 1, seed=6)[-(BUCKET_SLOTS + 1):]
+    results = [predictor.predict_features(row) for row in rows]
+
+    enabled, settings.shared_cache_enabled = settings.shared_cache_enabled, True
+    with tempfile.TemporaryDirectory() as tmp:
+        # A single bucket, so every row competes for the same slots
+        cache = SharedPredictionCache(Path(tmp) / "cache.bin", slots=BUCKET_SLOTS)
+        cache.put(rows[0], predictor.fingerprint, results[0])
+        assert cache.get(rows[0], predictor.fingerprint) is None  # Not activated yet
+        assert not cache.activate(predictor.fingerprint)  # Empty: nothing invalidated
+
+        for row, result in zip(rows[:BUCKET_SLOTS], results):
+            cache.put(row, predictor.fingerprint, result)
+        assert cache.get(rows[0], predictor.fingerprint) == results[0]
+        nudged = rows[0].copy()
+        nudged[FEATURE_ORDER.index("oldpeak")] += 1e-9
+        assert cache.get(nudged, predictor.fingerprint) is None  # Keys are exact
+
+        # rows[0] was referenced and survives; rows[1] is evicted
+        cache.put(rows[-1], predictor.fingerprint, results[-1])
+        assert cache.get(rows[0], predictor.fingerprint) == results[0]
+        assert cache.get(rows[1], predictor.fingerprint) is None
+        assert cache.get(rows[-1], predictor.fingerprint) == results[-1]
+
+        # Another process maps the same file and sees (and adds) entries
+        ctx = multiprocessing.get_context("fork")
+        child = ctx.Process(target=cache.put, args=(rows[1], predictor.fingerprint, results[1]))
+        child.start()
+        child.join()
+        assert child.exitcode == 0
+        assert cache.get(rows[1], predictor.fingerprint) == results[1]
+        stats = cache.stats()
+        print(f"Shared cache stats: {stats}")
+        # Occupancy is shared; counters are per process
+        assert stats["size"] == BUCKET_SLOTS and stats["evictions"] == 1
+
+        # New artifacts invalidate every entry at once; old-model puts are skipped
+        assert cache.activate("retrained-model")
+        assert cache.get(rows[0], "retrained-model") is None
+        cache.put(rows[2], predictor.fingerprint, results[2])
+        stats = cache.stats()
+        assert stats["size"] == 0 and stats["invalidations"] == 1
+        assert stats["skipped_puts"] == 2
+    settings.shared_cache_enabled = enabled
+
+    print("✅ Shared prediction cache working!")
+
+
+def test_http_cache():
+    """ETags identify input and model; idempotency stores replay and evict."""
+    print("\n" + "="*60)
+    print("Testing ETags and idempotency stores")
+    print("="*60)
+
+    rows = sample_domain(n_rows=2, seed=5)[-2:]
+    etag = make_etag(rows[0], predictor.fingerprint)
+    assert etag == make_etag(rows[0].copy(), predictor.fingerprint)
+    assert etag != make_etag(rows[1], predictor.fingerprint)
+    assert etag != make_etag(rows[0], "retrained-model")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert not etag_matches("*", etag)  # Answered with 412 instead
+    assert not etag_matches(None, etag) and not etag_matches('"other"', etag)
+
+    responses = [StoredResponse(f"hash-{i}", 200, {"etag": etag}, b'{"i":%d}' % i)
+                 for i in range(3)]
+    memory = MemoryIdempotencyStore(max_entries=2)
+    memory.put("a", responses[0])
+    memory.put("b", responses[1])
+    assert memory.get("a") == responses[0]
+    # "b" is now least recently used and gets evicted
+    memory.put("c", responses[2])
+    assert memory.get("b") is None
+    assert memory.stats()["evictions"] == 1
+
+    # The first request claims a key; concurrent retries see the placeholder
+    assert memory.begin("e", "hash-e") is None
+    assert memory.begin("e", "hash-e").in_progress and memory.get("e") is None
+    memory.release("e")
+    assert memory.begin("e", "hash-e") is None
+    memory.put("e", responses[0])
+    assert memory.begin("e", "hash-e") == responses[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteIdempotencyStore(Path(tmp) / "idempotency.sqlite3", max_entries=2)
+        for key, response in zip("abc", responses):
+            store.put(key, response)
+        assert store.get("a") == responses[0]
+        assert store.get("missing") is None
+        assert store.begin("e", "hash-e") is None
+        # Another worker's connection sees the claim
+        other = SQLiteIdempotencyStore(Path(tmp) / "idempotency.sqlite3", max_entries=2)
+        assert other.begin("e", "hash-e").in_progress and other.get("e") is None
+        store.release("e")
+        assert other.begin("e", "hash-e") is None
+        other.put("e", responses[1])
+        assert store.begin("e", "hash-e") == responses[1]
+
+        # Pruning keeps the newest max_entries rows
+        store._prune(store._connect(), 0.0)
+        assert store.get("a") is None and store.get("c") == responses[2]
+
+        expiring = SQLiteIdempotencyStore(Path(tmp) / "idempotency.sqlite3", max_entries=2,
+                                          ttl_seconds=1e-9)
+        expiring.put("d", responses[0])
+        assert expiring.get("d") is None
+        print(f"SQLite store stats: {store.stats()}")
+
+    # Through the /predict route: a concurrent retry is not scored twice,
+    # and "If-None-Match: *" is a failed precondition
+    example = HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+    body = json.dumps(example).encode()
+
+    def predict_request(key: str, if_none_match=None) -> Request:
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        headers = [(b"content-type", b"application/json"), (b"idempotency-key", key.encode())]
+        if if_none_match is not None:
+            headers.append((b"if-none-match", if_none_match.encode()))
+        return Request({
+            "type": "http", "method": "POST", "path": f"{settings.api_prefix}/predict",
+            "headers": headers, "query_string": b"", "client": ("127.0.0.1", 50000)
+        }, receive)
+
+    route = next(route for route in predict_api.router.routes if route.path == "/predict")
+    handler = route.get_route_handler()
+
+    async def run():
+        first, retry = await asyncio.gather(handler(predict_request("key-1")),
+                                            handler(predict_request("key-1")))
+        replay = await handler(predict_request("key-1"))
+        wildcard = None
+        try:
+            await handler(predict_request("key-1", "*"))
+        except HTTPException as e:
+            wildcard = e.status_code
+        return first, retry, replay, wildcard
+
+    cache_enabled = settings.prediction_cache_enabled
+    settings.prediction_cache_enabled = False
+    try:
+        first, retry, replay, wildcard = asyncio.run(run())
+    finally:
+        settings.prediction_cache_enabled = cache_enabled
+        inference_executor.shutdown()
+    assert first.status_code == 200
+    assert retry.status_code == 409 and retry.headers["retry-after"] == "1"
+    assert replay.headers["idempotent-replayed"] == "true" and replay.body == first.body
+    assert wildcard == 412
+
+    print("✅ ETags and idempotency stores working!")
+
+
+def test_admission_control():
+    """Token buckets charge by cost and limit bursts; the limiter bounds concurrency."""
+    print("\n" + "="*60)
+    print("Testing admission control")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in (MemoryRateLimitBackend(max_clients=10),
+                        SQLiteRateLimitBackend(Path(tmp) / "rate_limits.sqlite3")):
+            # 5 tokens of burst, refilled at 1 token per 100 s (no refill in the test)
+            take = lambda client, cost, **kwargs: backend.take(client, cost, 0.01, 5.0, **kwargs)
+            assert [take("a", 1) for _ in range(5)] == [0.0] * 5
+            assert math.isclose(take("a", 1), 100.0, rel_tol=1e-3)
+            assert take("b", 1) == 0.0  # Other clients are unaffected
+
+            # A batch larger than the burst needs a full bucket and leaves debt
+            assert take("c", 1) == 0.0 and take("c", 9, paid=1.0) == 0.0
+            assert math.isclose(take("c", 1), 600.0, rel_tol=1e-3)
+            # Streamed rows are charged even without tokens
+            assert take("d", 50, enforce=False) == 0.0 and take("d", 1) > 0
+            print(f"{backend.kind} backend: {backend.stats()}")
+
+    async def run_concurrently():
+        limiter = ConcurrencyLimiter(limit=2, max_queue=1, timeout_s=0.05)
+        assert await limiter.acquire() and await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        assert not await limiter.acquire()  # Queue full: rejected at once
+        limiter.release()
+        assert await waiter  # Got the released slot
+        assert not await limiter.acquire()  # Timed out waiting
+        return limiter.active
+
+    assert asyncio.run(run_concurrently()) == 2
+
+    # Batches are charged by body size before parsing, then by actual rows
+    example = HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+
+    def batch_request(client: str, body: bytes) -> Request:
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        assert admission.take(client, 1.0) == 0.0  # What AdmissionMiddleware charges
+        return Request({
+            "type": "http", "method": "POST", "path": f"{settings.api_prefix}/predict/batch",
+            "headers": [(b"content-type", b"application/json")], "query_string": b"",
+            "client": ("127.0.0.1", 50000),
+            "state": {CLIENT_STATE_KEY: client, PAID_STATE_KEY: 1.0}
+        }, receive)
+
+    def stream_request() -> Request:
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        return Request({
+            "type": "http", "method": "POST", "path": f"{settings.api_prefix}/predict/stream",
+            "headers": [(b"content-type", b"application/x-ndjson")], "query_string": b"",
+            "client": ("127.0.0.1", 50000)
+        }, receive)
+
+    route = next(route for route in predict_api.router.routes
+                 if route.path == "/predict/batch")
+    handler = route.get_route_handler()
+    padded = json.dumps({"records": [example] * 3}).encode().ljust(512 * 4)
+    junk = b"[" + b" " * (512 * 20)
+    rate, burst, backend = admission.rate, admission.burst, admission.backend
+    admission.rate, admission.burst = 0.01, 5.0
+    admission.backend = MemoryRateLimitBackend(max_clients=10)
+    try:
+        request = batch_request("refund", padded)
+        response = asyncio.run(handler(request))
+        assert response.status_code == 200 and json.loads(response.body)["succeeded"] == 3
+        # Charged 4 rows by size, refunded to the 3 actual rows
+        assert request.scope["state"][PAID_STATE_KEY] == 3.0
+        assert math.isclose(admission.backend._buckets["refund"][0], 2.0, abs_tol=0.01)
+
+        # A client out of tokens is turned away before its body is parsed
+        request = batch_request("junk", junk)
+        admission.take("junk", 4.0)
+        response = asyncio.run(handler(request))
+        assert response.status_code == 429 and b"20-row batch" in response.body
+    finally:
+        admission.rate, admission.burst, admission.backend = rate, burst, backend
+        inference_executor.shutdown()
+
+    print("✅ Admission control working!")
+
+
+def test_profiling():
+    """The sampling profiler sees inference threads; the slow log records stages."""
+    print("\n" + "="*60)
+    print("Testing profiling")
+    print("="*60)
+
+    data = HeartDiseaseInput.model_validate(
+        HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+    )
+    stop = threading.Event()
+
+    def busy():
+        while not stop.is_set():
+            predictor.predict(data)
+
+    worker = threading.Thread(target=busy, name="busy")
+    worker.start()
+    try:
+        profile = profiling.sample_stacks(0.3, 0.002)
+    finally:
+        stop.set()
+        worker.join()
+    collapsed = profiling.collapsed_stacks(profile)
+    assert any(line.startswith("busy;") and "predict_features" in line
+               for line in collapsed.splitlines())
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "profile.pstats"
+        path.write_bytes(profiling.pstats_dump(profile))
+        stats = pstats.Stats(str(path))
+        assert math.isclose(stats.total_tt, sum(profile["stacks"].values()) * profile["interval_s"])
+    print(f"CPU profile: {profile['samples']} samples, {len(stats.stats)} functions")
+
+    diff = profiling.memory_diff(predictor, predictions=5, top=3)
+    assert diff["predictions"] == 5 and len(diff["top"]) <= 3
+    assert predictor.record_metrics == settings.metrics_enabled  # Serving predictor untouched
+    # A failure while preparing the measurement does not leave the profiler busy
+    try:
+        profiling.memory_diff(None, predictions=1)
+    except AttributeError:
+        pass
+    assert not profiling._profile_lock.locked()
+    print(f"Memory diff: {diff['size_diff_bytes']} bytes over 5 predictions")
+
+    async def request():
+        async def app(scope, receive, send):
+            profiling.note_features(np.arange(len(FEATURE_ORDER), dtype=np.float64))
+            profiling.mark("validation")
+            profiling.record_stages({"predict_proba": 0.001})
+            await asyncio.sleep(0.01)
+            profiling.mark("inference")
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "POST", "path": f"{settings.api_prefix}/predict"}
+        await profiling.SlowRequestMiddleware(app)(scope, None, send)
+
+    log = profiling.slow_request_log
+    threshold = log.threshold_ms
+    try:
+        log.threshold_ms = 5.0
+        log.clear()
+        asyncio.run(request())
+        entry = log.entries()[0]
+        assert entry["status"] == 200 and entry["total_ms"] >= 10.0
+        assert list(entry["stages_ms"])[:2] == ["validation", "inference"]
+        assert entry["stages_ms"]["inference"] >= 10.0
+        assert entry["model_stages_ms"] == {"predict_proba": 1.0}
+        assert entry["features"]["age"] == 0.0
+        profiling.mark("inference")  # No-op outside a request
+    finally:
+        log.threshold_ms = threshold
+        log.clear()
+
+    print("✅ Profiling working!")
+
+
+def test_hot_reload():
+    """Reload swaps in a new predictor and keeps the old one if loading fails."""
+    print("\n" + "="*60)
+    print("Testing hot model reload")
+    print("="*60)
+
+    data = HeartDiseaseInput.model_validate(
+        HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+    )
+    original_paths = (settings.model_path, settings.scaler_path)
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = Path(tmp) / original_paths[0].name
+        scaler_path = Path(tmp) / original_paths[1].name
+        shutil.copy(original_paths[0], model_path)
+        shutil.copy(original_paths[1], scaler_path)
+        settings.model_path, settings.scaler_path = model_path, scaler_path
+        try:
+            manager = PredictorManager()
+            old = manager.current
+
+            stats = asyncio.run(manager.reload("test"))
+            print(f"After reload: {stats}")
+            assert manager.current is not old
+            assert stats["reloads"] == 1 and stats["last_error"] is None
+            assert stats["model_version"] == old.version
+            # In-flight requests holding the old predictor still work
+            assert old.predict(data) == manager.current.predict(data)
+
+            # A broken model file must not replace the serving predictor
+            serving = manager.current
+            model_path.write_bytes(b"not a model")
+            stats = asyncio.run(manager.reload("test"))
+            print(f"After failed reload: {stats}")
+            assert manager.current is serving
+            assert stats["failed_reloads"] == 1 and stats["last_error"]
+
+            # A failure after the files loaded (here a bad registry) must not
+            # leave the unactivated artifacts in ml_model either
+            shutil.copy(original_paths[0], model_path)
+            installed = ml_model.get_model()
+            prepare = model_registry.prepare
+
+            def broken_registry(warm_up):
+                raise ValueError("bad registry file")
+
+            model_registry.prepare = broken_registry
+            try:
+                stats = asyncio.run(manager.reload("test"))
+            finally:
+                model_registry.prepare = prepare
+            assert manager.current is serving
+            assert stats["failed_reloads"] == 2 and "bad registry" in stats["last_error"]
+            assert ml_model.get_model() is installed
+            assert ml_model.get_fingerprint() == serving.fingerprint
+        finally:
+            settings.model_path, settings.scaler_path = original_paths
+
+    # A reload while a request waits for its micro-batch: the response and
+    # cache entry belong to the model that scored it
+    from app.models.manager import predictor_manager
+
+    reloaded = HeartDiseasePredictor()
+    reloaded.fingerprint, reloaded.version = "reloaded-fingerprint", "reloaded"
+    features = np.array([getattr(data, feature) for feature in FEATURE_ORDER], dtype=np.float64)
+
+    async def request_during_reload():
+        task = asyncio.ensure_future(predict_api._predict(data))
+        await asyncio.sleep(0)  # The request is now waiting in the batcher
+        predictor_manager._current = reloaded
+        return await task
+
+    serving = predictor_manager.current
+    stale_puts = predict_api.prediction_cache.stale_puts
+    micro_batch_enabled = settings.micro_batch_enabled
+    settings.micro_batch_enabled = True
+    try:
+        response = asyncio.run(request_during_reload())
+    finally:
+        settings.micro_batch_enabled = micro_batch_enabled
+        predictor_manager._current = serving
+        inference_executor.shutdown()
+    assert serving.version != "reloaded"
+    assert response.headers["x-model-version"] == "reloaded"
+    assert response.headers["etag"] == make_etag(features, "reloaded-fingerprint")
+    # The cache still serves the model its last lookup was for: the result is
+    # not stored, and the new model's first lookup switches it over
+    assert predict_api.prediction_cache.stale_puts == stale_puts + 1
+    assert predict_api.prediction_cache.get(tuple(features.tolist()),
+                                            "reloaded-fingerprint") is None
+
+    print("✅ Hot reload working!")
+
+
+def test_startup_warm_up():
+    """Startup loads and warms up the model before reporting ready."""
+    print("\n" + "="*60)
+    print("Testing startup phase")
+    print("="*60)
+
+    manager = PredictorManager()
+    assert not manager.ready
+    try:
+        timings = asyncio.run(manager.startup())
+    finally:
+        inference_executor.shutdown()
+    print(f"Startup timings: {timings}")
+    assert manager.ready
+    assert set(timings) == {"import", "load", "warmup", "total"}
+    assert manager.stats()["startup_timings"] == timings
+
+    print("✅ Startup phase working!")
+
+
+def test_metrics():
+    """Stage timings are recorded per model version and rendered for Prometheus."""
+    print("\n" + "="*60)
+    print("Testing metrics")
+    print("="*60)
+
+    histogram = metrics.Histogram("test_seconds", "Test histogram", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.labels("a").observe(value)
+    rendered = "\n".join(histogram.render())
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 2' in rendered
+    assert 'test_seconds_bucket{stage="a",le="1"} 3' in rendered
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 4' in rendered
+    assert 'test_seconds_count{stage="a"} 4' in rendered
+
+    data = HeartDiseaseInput.model_validate(
+        HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+    )
+    local = HeartDiseasePredictor()
+    local.record_metrics = True
+    child = metrics.STAGE_LATENCY.labels("predict_proba", local.version)
+    before = sum(child.counts)
+    local.predict(data)
+    assert sum(child.counts) == before + 1
+
+    # Process pool workers send their stage timings back with the result
+    async def score_in_worker():
+        executor = InferenceExecutor("process", max_workers=1, max_queue=0)
+        try:
+            return await executor.run(local, "predict", data)
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(score_in_worker()) == local.predict(data)
+    assert sum(child.counts) == before + 3
+
+    # Micro-batched requests record their batch wait and the batch's scoring
+    async def score_micro_batched():
+        executor = InferenceExecutor("thread", max_workers=1, max_queue=4)
+        batcher = MicroBatcher(lambda: local, executor, max_batch_size=4, max_wait_ms=1.0)
+        try:
+            return await asyncio.gather(*[batcher.predict(data) for _ in range(4)])
+        finally:
+            executor.shutdown()
+
+    waits = metrics.STAGE_LATENCY.labels("batch_wait", local.version)
+    before = sum(waits.counts)
+    asyncio.run(score_micro_batched())
+    assert sum(waits.counts) == before + 4
+
+    text = metrics.registry.render()
+    for stage in ("preprocess", "scale", "predict_proba", "postprocess",
+                  "batch_wait", "batch_inference"):
+        assert f'stage="{stage}",model_version="{local.version}"' in text
+
+    # validation and serialization describe the single-prediction path only
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    def single_path_samples() -> int:
+        return sum(sum(child.counts) for key, child in metrics.STAGE_LATENCY._children.items()
+                   if key[0] in ("validation", "serialization"))
+
+    example = HeartDiseaseInput.model_config["json_schema_extra"]["example"]
+    before = single_path_samples()
+    client = TestClient(app)
+    response = client.post(f"{settings.api_prefix}/predict/batch", json={"records": [example] * 3})
+    assert response.status_code == 200
+    response = client.post(f"{settings.api_prefix}/predict/stream",
+                           content=json.dumps(example) + "\n",
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200 and '"risk_level"' in response.text
+    assert single_path_samples() == before
+    client.post(f"{settings.api_prefix}/predict", json=example)
+    assert single_path_samples() == before + 2
+
+    print("✅ Metrics working!")
+
+
+def test_supervisor():
+    """Crashed workers are respawned, also while a graceful restart waits."""
+    print("\n" + "="*60)
+    print("Testing production supervisor")
+    print("="*60)
+
+    class StubSupervisor(Supervisor):
+        """Forks workers that report ready and sleep instead of running uvicorn."""
+
+        failing_generation = None
+
+        def _load_app(self):
+            # An old worker crashes while the restart is under way
+            if self._children:
+                os.kill(min(self._children), signal.SIGKILL)
+
+        def _run_worker(self, index, ready_fd):
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            if self._generation == self.failing_generation:
+                time.sleep(0.6)  # Let the supervisor reap the crashed worker first
+                raise SystemExit(3)
+            os.write(ready_fd, b"1")
+            os.close(ready_fd)
+            while True:
+                time.sleep(1.0)
+
+    def settle(supervisor, count, gone):
+        """Reap and respawn until pid gone has been replaced and count workers run."""
+        deadline = time.monotonic() + 10.0
+        while time.monotonic() < deadline:
+            supervisor._respawn_crashed()
+            children = list(supervisor._children.values())
+            if (gone not in supervisor._children and len(children) == count
+                    and not any(child.retiring for child in children)):
+                if supervisor._wait_ready(children, timeout=5.0):
+                    return children
+            time.sleep(0.05)
+        raise AssertionError(f"Workers did not settle: {supervisor._children}")
+
+    supervisor = StubSupervisor("127.0.0.1", 0, workers=2, cpu_affinity=False,
+                                blas_threads=0, preload=False, graceful_timeout=5.0)
+    try:
+        workers = [supervisor._spawn(index) for index in range(2)]
+        assert supervisor._wait_ready(workers, timeout=5.0)
+
+        # A crashed worker is reaped and its slot refilled
+        os.kill(workers[0].pid, signal.SIGKILL)
+        children = settle(supervisor, 2, workers[0].pid)
+        assert sorted(child.index for child in children) == [0, 1]
+
+        # Graceful restart: the crashed old worker's slot is served by the new generation
+        crashed = min(supervisor._children)
+        supervisor._restart()
+        children = settle(supervisor, 2, crashed)
+        assert {child.generation for child in children} == {1}
+
+        # Failed restart: the current workers stay and the crashed one is respawned
+        crashed = min(supervisor._children)
+        supervisor.failing_generation = 2
+        supervisor._restart()
+        supervisor.failing_generation = None
+        assert [worker.pid for worker in supervisor._crashed] == [crashed]
+        children = settle(supervisor, 2, crashed)
+        assert sorted(child.index for child in children) == [0, 1]
+        assert {child.generation for child in children} == {1, 2}
+    finally:
+        supervisor._stopping = True
+        supervisor._stop()
+    assert not supervisor._children
+
+    print("✅ Supervisor respawning working!")
+
+
+def test_columnar_formats():
+    """Arrow IPC and MessagePack batches decode to the same matrix and errors as JSON."""
+    print("\n" + "="*60)
+    print("Testing columnar wire formats")
+    print("="*60)
+
+    features = sample_domain(n_rows=500, seed=6)
+    features[7, 0] = 500.0  # Out of range age
+    records = [dict(zip(FEATURE_ORDER, row.tolist())) for row in features]
+    expected, expected_indices, expected_errors = build_feature_matrix(records)
+    assert list(expected_errors) == [7]
+
+    # An int beyond float64 or an element that is not an object fails its row only
+    payload = {"records": [records[0], dict(records[1], age=10 ** 400), 5, records[3]]}
+    batch = HeartDiseaseBatchInput.model_validate_json(json.dumps(payload))
+    matrix, indices, errors = build_feature_matrix(batch.records)
+    assert indices.tolist() == [0, 3] and sorted(errors) == [1, 2]
+    assert errors[1][0]["loc"] == ("age",) and errors[2][0]["type"] == "model_type"
+    np.testing.assert_array_equal(matrix, features[[0, 3]])
+    bodies = {}
+
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        pa = None
+    if pa is not None:
+        def ipc(table) -> bytes:
+            sink = pa.BufferOutputStream()
+            with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+
+        # One column per feature, integer columns as int64
+        bodies["arrow"] = ipc(pa.table({
+            feature: pa.array(features[:, j].astype(np.int64) if INTEGER_FEATURES[j]
+                              else features[:, j])
+            for j, feature in enumerate(FEATURE_ORDER)
+        }))
+        # A fixed-size list column is used in place
+        body = ipc(pa.table({"features": pa.FixedSizeListArray.from_arrays(
+            pa.array(np.delete(features, 7, axis=0).ravel()), len(FEATURE_ORDER)
+        )}))
+        matrix, indices, errors = columnar.read_batch("arrow", body)[1]()
+        assert np.shares_memory(matrix, np.frombuffer(body, dtype=np.uint8)) and not errors
+        assert np.array_equal(matrix, expected)
+
+    try:
+        import msgpack
+    except ImportError:
+        msgpack = None
+    if msgpack is not None:
+        bodies["msgpack"] = msgpack.packb({"columns": {
+            feature: features[:, j].astype("<f8").tobytes() for j, feature in enumerate(FEATURE_ORDER)
+        }})
+
+    predictions, probabilities = predictor.predict_batch(expected)
+    for fmt, body in bodies.items():
+        n_rows, validate = columnar.read_batch(fmt, body)
+        matrix, indices, errors = validate()
+        assert n_rows == len(records) and np.array_equal(matrix, expected)
+        assert np.array_equal(indices, expected_indices)
+        assert errors[7][0]["loc"] == expected_errors[7][0]["loc"]
+
+        # Results come back as columns with invalid rows marked
+        encoded = columnar.write_results(fmt, n_rows, indices, predictions, probabilities, errors)
+        if fmt == "arrow":
+            table = pyarrow.ipc.open_stream(encoded).read_all()
+            probability = table.column("probability").to_numpy(zero_copy_only=False)
+            risk_code = table.column("risk_code").to_pylist()
+            assert table.column("errors")[7].as_py() is not None
+        else:
+            result = msgpack.unpackb(encoded)
+            probability = np.frombuffer(result["probability"], dtype="<f8")
+            risk_code = np.frombuffer(result["risk_code"], dtype=np.int8).tolist()
+            assert len(result["errors"]) == n_rows and risk_code[7] == -1
+            assert [i for i, row_errors in enumerate(result["errors"]) if row_errors] == [7]
+        assert np.isnan(probability[7])
+        assert np.array_equal(probability[expected_indices], probabilities)
+        assert [RISK_LEVELS[risk_code[i]] for i in expected_indices.tolist()] == [
+            predictor._get_risk_level(p) for p in probabilities.tolist()
+        ]
+        print(f"{fmt}: {len(body) / 1e3:.1f} kB request, {len(encoded) / 1e3:.1f} kB response")
+
+    print("✅ Columnar formats working!" if bodies else "⚠️ pyarrow and msgpack not installed")
+
+
+def test_streaming_parsers():
+    """Streamed CSV and NDJSON bodies score like predict_batch, split anywhere."""
+    print("\n" + "="*60)
+    print("Testing streaming parsers")
+    print("="*60)
+
+    features = sample_domain(n_rows=50, seed=3)[-50:]
+    expected_predictions, expected_probabilities = predictor.predict_batch(features)
+    csv_body = ",".join(FEATURE_ORDER) + ",note\r\n" + "".join(
+        ",".join(str(value) for value in row.tolist()) + ",\"caf\u00e9\"\r\n" for row in features
+    ) + "not,a,row\n"
+    ndjson_body = "".join(
+        json.dumps(dict(zip(FEATURE_ORDER, row.tolist()))) + "\n\n" for row in features
+    ) + "{broken"
+
+    for fmt, body in (("csv", csv_body), ("ndjson", ndjson_body)):
+        # Feed the body in odd-sized chunks that split lines and UTF-8 sequences
+        data = body.encode("utf-8")
+        splitter = LineSplitter()
+        lines = []
+        for start in range(0, len(data), 7):
+            lines.extend(splitter.feed(data[start:start + 7]))
+        lines.extend(splitter.close())
+
+        header = parse_csv_header(lines.pop(0)) if fmt == "csv" else None
+        records, parse_errors = parse_lines(lines, fmt, header)
+        matrix, row_indices, errors = validate_records(records, parse_errors)
+        assert len(records) == len(features) + 1
+        assert list(errors) == [len(features)]
+        np.testing.assert_array_equal(matrix, features)
+
+        predictions, probabilities = predictor.predict_batch(matrix)
+        np.testing.assert_array_equal(predictions, expected_predictions)
+        levels = [predictor._get_risk_level(p) for p in probabilities.tolist()]
+        output = format_results(fmt, 100, len(records), row_indices,
+                                predictions, probabilities, levels, errors).splitlines()
+        assert len(output) == len(records)
+        assert output[0].startswith("100,") or output[0].startswith('{"index": 100')
+        assert str(round(float(expected_probabilities[0]), 4)) in output[0]
+        assert "invalid" in output[-1]
+
+    # An overlong line is dropped as it arrives and reported as its own row
+    splitter = LineSplitter(max_line_length=400)
+    lines = splitter.feed(b'{"age": 1}\n' + b"x" * 60)
+    for _ in range(1000):
+        assert splitter.feed(b"y" * 1000) == []
+        assert splitter._length <= 400 + 1000 and not splitter._parts
+    lines += splitter.feed(b"z\r\n" + ndjson_body.splitlines()[0].encode() + b"\n")
+    lines += splitter.feed(b"w" * 500) + splitter.close()
+    assert lines[0] == '{"age": 1}' and lines[1] is None and lines[-1] is None
+    records, parse_errors = parse_lines(lines, "ndjson")
+    assert len(records) == 4 and list(parse_errors) == [1, 3]
+    assert parse_errors[1][0]["type"] == "line_too_long"
+    records, parse_errors = parse_lines([None, "1,2", None], "csv", ["a", "b"])
+    assert records[1] == {} and list(parse_errors) == [0, 2]
+
+    print("✅ Streaming parsers working!")
+
+
+def test_offline_scoring():
+    """Offline scorer keeps input order across workers and resumes after a failure."""
+    print("\n" + "="*60)
+    print("Testing offline scoring")
+    print("="*60)
+
+    features = sample_domain(n_rows=3000, seed=4)[-3000:]
+    expected_predictions, _ = predictor.predict_batch(features)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "patients.csv"
+        with open(source, "w") as f:
+            f.write(",".join(FEATURE_ORDER) + "\n")
+            for i, row in enumerate(features.tolist()):
+                f.write(",".join(str(value) for value in row) + "\n")
+                if i == 10:
+                    f.write("not,a,row\n")
+
+        full = Path(tmp) / "full.csv"
+        assert score.main([str(source), "--out", str(full), "--workers", "2",
+                           "--chunk-size", "256"]) == 0
+        lines = full.read_text().splitlines()
+        assert lines[0] == "index,prediction,probability,risk_level,errors"
+        assert len(lines) == len(features) + 2
+        assert [int(line.split(",")[0]) for line in lines[1:]] == list(range(len(features) + 1))
+        assert "csv_row_invalid" in lines[12]
+        scored = [line.split(",")[1] == "true" for line in lines[1:12] + lines[13:]]
+        assert scored == expected_predictions.tolist()
+
+        # Fail part-way through, then resume from the checkpoint
+        resumed = Path(tmp) / "resumed.csv"
+        original = HeartDiseasePredictor.predict_batch
+        calls = itertools.count()
+
+        def failing_predict_batch(self, matrix):
+            if next(calls) == 5:
+                raise ValueError("simulated failure")
+            return original(self, matrix)
+
+        HeartDiseasePredictor.predict_batch = failing_predict_batch
+        try:
+            assert score.main([str(source), "--out", str(resumed), "--workers", "0",
+                               "--chunk-size", "256", "--checkpoint-interval", "0"]) == 1
+        finally:
+            HeartDiseasePredictor.predict_batch = original
+        checkpoint = json.loads((Path(tmp) / "resumed.csv.checkpoint").read_text())
+        print(f"Checkpoint: {checkpoint['rows']} rows, byte {checkpoint['position']}")
+        assert checkpoint["rows"] == 5 * 256
+
+        assert score.main([str(source), "--out", str(resumed), "--workers", "0",
+                           "--chunk-size", "1000", "--resume"]) == 0
+        assert resumed.read_bytes() == full.read_bytes()
+        assert not (Path(tmp) / "resumed.csv.checkpoint").exists()
+
+    print("✅ Offline scoring working!")
+
+
+def test_model_registry():
+    """Candidates load side by side, route by header or weight, and shadow off-path."""
+    print("\n" + "="*60)
+    print("Testing model registry and shadow scoring")
+    print("="*60)
+
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+
+    features = sample_domain(n_rows=400, seed=7)
+    labels, _ = predictor.predict_batch(features)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # A logistic candidate trained on the primary's labels, and an export of the primary
+        candidate = LogisticRegression(max_iter=1000).fit(
+            ml_model.get_scaler().transform(features), labels.astype(int)
+        )
+        joblib.dump(candidate, tmp / "logreg.pkl")
+        shutil.copy(settings.scaler_path, tmp / "scaler.pkl")
+        export_artifacts(ml_model.get_model(), ml_model.get_scaler(), tmp / "exported",
+                         ml_model.get_fingerprint())
+        (tmp / "registry.json").write_text(json.dumps({"primary": "knn", "models": [
+            {"name": "logreg", "model_path": "logreg.pkl", "scaler_path": "scaler.pkl",
+             "weight": 0.25},
+            {"name": "knn-export", "exported_dir": "exported", "shadow": True}
+        ]}))
+
+        registry = ModelRegistry(tmp / "registry.json")
+        registry.load()
+        assert registry.get("knn-export").version == predictor.version
+        assert registry.route("logreg").name == "logreg" and registry.route("knn") is None
+        try:
+            registry.route("missing")
+            assert False, "Unknown model was routed"
+        except UnknownModelError:
+            pass
+        random.seed(0)
+        routed = [registry.route() for _ in range(4000)]
+        share = sum(model is not None for model in routed) / len(routed)
+        print(f"Weighted split: {share:.1%} to logreg (configured 25%)")
+        assert 0.22 < share < 0.28 and {model.name for model in routed if model} == {"logreg"}
+        assert [model.name for model in registry.shadows("knn")] == ["knn-export"]
+        assert registry.shadows("knn-export") == []
+
+        # Process workers serve the parent's candidates, even if the registry
+        # file has become unreadable since
+        (tmp / "broken.json").write_text("{not json")
+        serving, path = model_registry.snapshot, model_registry.path
+        model_registry.activate(registry.snapshot)
+        model_registry.path = tmp / "broken.json"
+
+        async def score_in_worker():
+            executor = InferenceExecutor("process", max_workers=1, max_queue=0)
+            try:
+                return await executor.run(registry.get("logreg"), "predict_batch",
+                                          features[:20], model="logreg")
+            finally:
+                executor.shutdown()
+
+        try:
+            worker_predictions, worker_probabilities = asyncio.run(score_in_worker())
+        finally:
+            model_registry.activate(serving)
+            model_registry.path = path
+        expected_predictions, expected_probabilities = registry.get("logreg").predict_batch(
+            features[:20]
+        )
+        assert np.array_equal(worker_predictions, expected_predictions)
+        assert np.array_equal(worker_probabilities, expected_probabilities)
+
+        # Shadow results: the export agrees with the primary row for row
+        scorer = ShadowScorer(registry, workers=1, max_queue=8,
+                              sink=SQLiteShadowSink(tmp / "shadow.sqlite3"))
+        predictions, probabilities = predictor.predict_batch(features[:100])
+        assert scorer.submit("knn", predictor.version, features[:100], predictions,
+                             probabilities)
+        assert scorer.drain()
+        stats = scorer.stats()["models"]["knn-export"]["knn"]
+        print(f"Shadow agreement: {stats}")
+        assert stats["rows"] == 100 and stats["label_agreement"] == 1.0
+        assert stats["max_abs_probability_diff"] == 0.0
+        summary = scorer.sink.summary()[f"knn-export@{predictor.version}"]["knn"]
+        assert summary["rows"] == 100 and summary["label_agreement"] == 1.0
+
+        # Under load (every inference worker busy) shadow work is dropped
+        pending = inference_executor._pending
+        inference_executor._pending = inference_executor.max_workers
+        try:
+            assert not scorer.submit("knn", predictor.version, features[:1], predictions[:1],
+                                     probabilities[:1])
+        finally:
+            inference_executor._pending = pending
+        assert scorer.stats()["dropped"]["load"] == 1
+        scorer.shutdown()
+
+        # Single-row jobs arriving together are scored in one batch
+        scorer = ShadowScorer(registry, workers=1, max_queue=8, batch_wait_ms=200.0)
+        for i in range(3):
+            assert scorer.submit("knn", predictor.version, features[i:i + 1],
+                                 predictions[i:i + 1], probabilities[i:i + 1])
+        assert scorer.drain()
+        stats = scorer.stats()["models"]["knn-export"]["knn"]
+        assert stats["requests"] == 3 and stats["batches"] == 1 and stats["rows"] == 3
+        scorer.shutdown()
+
+    # With the worker busy and the queue full, jobs are dropped instead of waiting
+    release = threading.Event()
+
+    class SlowPredictor:
+        version = "slow"
+
+        def predict_batch(self, rows):
+            release.wait(5.0)
+            return np.zeros(len(rows), dtype=bool), np.zeros(len(rows))
+
+    class SlowRegistry:
+        def shadows(self, served=None):
+            return [RegisteredModel("slow", SlowPredictor(), 0.0, True, "-")]
+
+    scorer = ShadowScorer(SlowRegistry(), workers=1, max_queue=1)
+    args = ("knn", predictor.version, features[:1], predictions[:1], probabilities[:1])
+    try:
+        assert scorer.submit(*args)
+        while scorer.stats()["queued"]:  # Wait for the worker to pick it up
+            time.sleep(0.001)
+        assert scorer.submit(*args) and not scorer.submit(*args)
+        assert scorer.stats()["dropped"]["queue_full"] == 1
+    finally:
+        release.set()
+        assert scorer.drain()
+        scorer.shutdown()
+    assert scorer.stats()["models"]["slow"]["knn"]["requests"] == 2
+
+    print("✅ Model registry and shadow scoring working!")
+
+
+def main():
+    """Run all tests."""
+    test_single_pass_parity()
+    test_compiled_engine_parity()
+    test_exported_artifacts_parity()
+    test_slim_engine()
+    test_lookup_table()
+    test_neighbor_index()
+    test_compact_knn_parity()
+    test_micro_batching_parity()
+    test_inference_overload()
+    test_prediction_cache()
+    test_shared_cache()
+    test_http_cache()
+    test_admission_control()
+    test_profiling()
+    test_hot_reload()
+    test_startup_warm_up()
+    test_metrics()
+    test_supervisor()
+    test_streaming_parsers()
+    test_columnar_formats()
+    test_offline_scoring()
+    test_model_registry()
+
+    print("\n" + "="*60)
+    print("✅ ALL PREDICTOR TESTS PASSED!")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()